@@ -0,0 +1,262 @@
+# ==========================================
+# 無介面告警引擎：排程讀取訊號快照 (signal_api.py 產生的 JSON)，以宣告式規則表一次向量化評估
+# 只在狀態改變時通知 (觸發 / 解除)；規則狀態寫入 data/alert_state.json，重啟後不會重複發送
+#   python alerts.py once [--build] [--refresh]            評估一次
+#   python alerts.py run --every 300 [--build]              常駐排程
+#   python alerts.py rules                                  列出展開後的規則
+#   python alerts.py status                                 目前觸發中的告警
+# 規則檔 data/alert_rules.json (MARKET_ALERT_RULES 可改)，沒有時使用內建規則；
+# 通知目的地 MARKET_ALERT_SINKS=stdout,file:data/alerts.jsonl,webhook:https://...
+# ==========================================
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import watchlists
+from signal_api import DEFAULT_SNAPSHOT_PATH, SnapshotFile, make_snapshot, write_snapshot
+from signals import ROTATION_BULL_SCORE, SHORT_RATE_ALERT
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+RULES_PATH = os.path.join(DATA_DIR, "alert_rules.json")
+STATE_PATH = os.path.join(DATA_DIR, "alert_state.json")
+DEFAULT_SINKS = "stdout,file:" + os.path.join(DATA_DIR, "alerts.jsonl")
+SEVERITY_ICON = {"critical": "🚨", "warning": "⚠️", "info": "ℹ️"}
+
+# 規則欄位：
+#   signal: 訊號路徑 (compute_signals 結果攤平，例如 "short_rate.rate"、"tw_lights.score")；布林值視為 1 / 0
+#   或 ticker / tickers + field: 指標矩陣欄位 (price / bias / rsi / ma60 / ret20 ...)；tickers 可寫 watchlists.json 的清單 / 分組名稱，每檔展開成一條
+#   op: < <= > >= == !=；右邊為 value (數字) 或 ref (同一檔的另一個欄位，例如 price < ma60)
+#   min_bars: 該檔 K 棒數不足時視為未知 (維持原狀態)
+DEFAULT_RULES = [
+    {"id": "ai_bias_alarm", "name": "AI 資金全面翻負", "signal": "ai_bias.avg_bias", "op": "<", "value": 0, "severity": "critical"},
+    {"id": "tw_lights_defensive", "name": "台股四燈 0~1 燈 (保守防禦)", "signal": "tw_lights.score", "op": "<=", "value": 1, "severity": "warning"},
+    {"id": "carry_trade_unwind", "name": "日圓跌破季線 (Carry Trade 平倉警戒)", "signal": "carry_trade.warning", "op": "==", "value": 1, "severity": "critical"},
+    {"id": "short_rate_tight", "name": f"短端利率 > {SHORT_RATE_ALERT}%", "signal": "short_rate.rate", "op": ">", "value": SHORT_RATE_ALERT, "severity": "warning"},
+    {"id": "credit_risk_off", "name": "高收益債落後投資級債 (信用緊縮)", "signal": "breadth_credit.credit.a_wins", "op": "==", "value": 0, "severity": "warning"},
+    {"id": "breadth_narrow", "name": "等權重落後市值權重 (廣度變窄)", "signal": "breadth_credit.breadth.a_wins", "op": "==", "value": 0, "severity": "info"},
+    {"id": "rotation_defensive", "name": f"QQQ 宏觀分數 < {ROTATION_BULL_SCORE} (分散避險)", "signal": "rotation.leader_score", "op": "<", "value": ROTATION_BULL_SCORE, "severity": "info"},
+    {"id": "semi_below_ma60", "name": "半導體跌破季線", "tickers": "assets_semi_tickers", "field": "price", "op": "<", "ref": "ma60", "min_bars": 61, "severity": "info"},
+    {"id": "ai_overheated", "name": "AI 權值 RSI 過熱", "tickers": "assets_ai_risk", "field": "rsi", "op": ">", "value": 80, "severity": "info"},
+]
+
+OPS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal, "==": np.equal, "!=": np.not_equal}
+
+
+def load_rules(path=None):
+    path = path or os.environ.get("MARKET_ALERT_RULES", RULES_PATH)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f: return json.load(f)
+    return DEFAULT_RULES
+
+
+def expand_rules(rules):
+    # 宣告式規則 → 每列一條的規則表 (tickers 展開成逐檔規則，id 加上 ":代號")
+    rows = []
+    for r in rules:
+        if r.get("op") not in OPS: raise ValueError(f"規則 {r.get('id')} 的 op 不支援: {r.get('op')}")
+        if ("value" in r) == ("ref" in r): raise ValueError(f"規則 {r.get('id')} 需要 value 或 ref 其中一個")
+        base = {"id": r["id"], "name": r.get("name", r["id"]), "severity": r.get("severity", "warning"), "op": r["op"],
+                "value": float(r["value"]) if "value" in r else np.nan, "ref": r.get("ref"), "min_bars": r.get("min_bars", 0),
+                "signal": None, "ticker": None, "field": None}
+        if "signal" in r:
+            rows.append(dict(base, signal=r["signal"]))
+            continue
+        tickers = r.get("tickers", [r["ticker"]] if "ticker" in r else [])
+        if isinstance(tickers, str): tickers = watchlists.current().members(tickers)
+        for t in dict.fromkeys(tickers):
+            rows.append(dict(base, id=f"{r['id']}:{t}", ticker=t, field=r["field"]))
+    table = pd.DataFrame(rows, columns=["id", "name", "severity", "signal", "ticker", "field", "op", "value", "ref", "min_bars"])
+    if table["id"].duplicated().any(): raise ValueError(f"規則 id 重複: {sorted(set(table['id'][table['id'].duplicated()]))}")
+    return table.set_index("id")
+
+
+def flatten_signals(signals, prefix=""):
+    # 巢狀訊號 → {"a.b.c": 數值}；清單 (成分股明細) 略過，布林轉 1 / 0，None 轉 NaN
+    flat = {}
+    for k, v in (signals or {}).items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict): flat.update(flatten_signals(v, key + "."))
+        elif isinstance(v, bool): flat[key] = float(v)
+        elif isinstance(v, (int, float)): flat[key] = float(v)
+        elif v is None: flat[key] = np.nan
+    return flat
+
+
+def evaluate(table, snap):
+    # 全部規則一次評估：先以索引把左右兩邊的數值取成向量，再依運算子分組比較
+    # 回傳 DataFrame[lhs, rhs, active]；active 為 NaN 代表資料不足 (不改變狀態)
+    flat = pd.Series(flatten_signals(snap.get("signals")), dtype=float)
+    ind = pd.DataFrame.from_dict(snap.get("indicators") or {}, orient="index")
+    ind = ind.apply(pd.to_numeric, errors="coerce").astype(float) if not ind.empty else pd.DataFrame(columns=["n"], dtype=float)
+    values = ind.to_numpy()
+    n = len(table)
+
+    def cell(rows, cols):
+        ok = (rows >= 0) & (cols >= 0)
+        out = np.full(n, np.nan)
+        out[ok] = values[rows[ok], cols[ok]]
+        return out
+
+    is_signal = table["signal"].notna().to_numpy()
+    rows = ind.index.get_indexer(table["ticker"].fillna(""))
+    lhs = np.where(is_signal, flat.reindex(table["signal"].fillna("")).to_numpy(), cell(rows, ind.columns.get_indexer(table["field"].fillna(""))))
+    rhs = np.where(table["ref"].notna(), cell(rows, ind.columns.get_indexer(table["ref"].fillna(""))), table["value"].to_numpy())
+    if "n" in ind.columns:
+        bars = cell(rows, np.full(n, ind.columns.get_loc("n")))
+        lhs = np.where(~is_signal & ~(bars >= table["min_bars"].to_numpy()), np.nan, lhs)
+    active = np.full(n, np.nan)
+    known = ~np.isnan(lhs) & ~np.isnan(rhs)
+    ops = table["op"].to_numpy()
+    for op, fn in OPS.items():
+        m = known & (ops == op)
+        if m.any(): active[m] = fn(lhs[m], rhs[m])
+    return pd.DataFrame({"lhs": lhs, "rhs": rhs, "active": active}, index=table.index)
+
+
+def _describe(rule, lhs, rhs):
+    if pd.notna(rule["signal"]) and rule["op"] in ("==", "!="): return rule["name"]     # 布林訊號只顯示名稱
+    who = f"{watchlists.current().names.get(rule['ticker'], rule['ticker'])} " if pd.notna(rule["ticker"]) else ""
+    right = f"{rule['ref']} {rhs:,.2f}" if pd.notna(rule["ref"]) else f"{rhs:,.2f}"
+    return f"{rule['name']}：{who}{lhs:,.2f} {rule['op']} {right}"
+
+
+class AlertState:
+    # {規則 id: {active, since, value}}，加上最後評估的快照時間；原子寫入
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.rules, self.generated_at, self.as_of = {}, None, None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f: data = json.load(f)
+            self.rules, self.generated_at, self.as_of = data.get("rules", {}), data.get("generated_at"), data.get("as_of")
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"generated_at": self.generated_at, "as_of": self.as_of, "rules": self.rules}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+def transitions(table, result, state, snap, now=None):
+    # 與上次狀態比較，只回傳改變的規則 (未評估過且目前觸發 → 也算觸發)；同時更新 state
+    now = now or datetime.now(timezone.utc).isoformat()
+    known = result["active"].notna()
+    active = result["active"].fillna(0).astype(bool)
+    prev = pd.Series({k: v["active"] for k, v in state.rules.items()}, dtype=bool).reindex(table.index, fill_value=False)
+    changed = known & (active != prev)
+    events = []
+    for rid in table.index[changed]:
+        rule, act = table.loc[rid], bool(active[rid])
+        lhs, rhs = float(result.at[rid, "lhs"]), float(result.at[rid, "rhs"])
+        events.append({"rule": rid, "name": rule["name"], "severity": rule["severity"], "event": "trigger" if act else "clear",
+                       "ticker": rule["ticker"] if pd.notna(rule["ticker"]) else None, "value": lhs, "threshold": rhs, "as_of": snap.get("as_of"), "at": now,
+                       "message": f"{SEVERITY_ICON.get(rule['severity'], '')} {_describe(rule, lhs, rhs)}" if act
+                       else f"✅ 解除 {_describe(rule, lhs, rhs)}"})
+    fresh = set(table.index[changed])
+    for rid, act, lhs in zip(table.index[known], active[known], result["lhs"][known]):
+        if rid in fresh or rid not in state.rules: state.rules[rid] = {"active": bool(act), "since": now, "value": float(lhs)}
+        else: state.rules[rid]["value"] = float(lhs)
+    state.generated_at, state.as_of = snap.get("generated_at"), snap.get("as_of")
+    return events
+
+
+class StdoutSink:
+    def send(self, events):
+        for e in events: print(e["message"], flush=True)
+
+
+class FileSink:
+    # 一行一筆 JSON，方便其他程式 tail
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, events):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for e in events: f.write(json.dumps(e, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    # Slack / Discord / 自架服務共用的最小格式：{"text": 摘要, "events": 明細}
+    def __init__(self, url, timeout=5):
+        self.url, self.timeout = url, timeout
+
+    def send(self, events):
+        body = json.dumps({"text": "\n".join(e["message"] for e in events), "events": events}, ensure_ascii=False).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json; charset=utf-8"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp: resp.read()
+
+
+def sinks_from_spec(spec=None):
+    spec = spec or os.environ.get("MARKET_ALERT_SINKS", DEFAULT_SINKS)
+    sinks = []
+    for s in filter(None, (p.strip() for p in spec.split(","))):
+        kind, _, arg = s.partition(":")
+        if kind == "stdout": sinks.append(StdoutSink())
+        elif kind == "file": sinks.append(FileSink(arg))
+        elif kind == "webhook": sinks.append(WebhookSink(arg))
+        else: raise ValueError(f"不支援的通知目的地: {s}")
+    return sinks
+
+
+def notify(sinks, events):
+    # 單一目的地失敗不影響其他目的地
+    for sink in sinks:
+        try: sink.send(events)
+        except Exception as e: print(f"通知失敗 ({type(sink).__name__}): {e}", file=sys.stderr)
+
+
+def run_once(table, state, sinks, source, build=False, refresh=False):
+    # source: SnapshotFile；build=True 時先重算快照 (並寫回檔案，API 同步看到)
+    if build: write_snapshot(make_snapshot(refresh=refresh), source.path)
+    snap = source.current()
+    if snap is None: raise RuntimeError(f"找不到快照 {source.path}，請先執行 signal_api.py snapshot 或加上 --build")
+    if snap.get("generated_at") == state.generated_at: return []     # 同一份快照不重複評估
+    events = transitions(table, evaluate(table, snap), state, snap)
+    if events: notify(sinks, events)
+    state.save()
+    return events
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="規則告警 (狀態改變才通知)")
+    parser.add_argument("cmd", choices=["once", "run", "rules", "status"])
+    parser.add_argument("--rules", default=None)
+    parser.add_argument("--state", default=STATE_PATH)
+    parser.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_PATH)
+    parser.add_argument("--sinks", default=None, help="逗號分隔：stdout / file:路徑 / webhook:網址")
+    parser.add_argument("--build", action="store_true", help="每次評估前先由本地價格庫重算快照")
+    parser.add_argument("--refresh", action="store_true", help="搭配 --build：先補價格庫增量 (需連網)")
+    parser.add_argument("--every", type=int, default=300, help="run 模式的間隔秒數")
+    args = parser.parse_args(argv)
+    table = expand_rules(load_rules(args.rules))
+    state = AlertState(args.state)
+    if args.cmd == "rules":
+        print(table.drop(columns=["min_bars"]).to_string())
+        return
+    if args.cmd == "status":
+        active = {k: v for k, v in state.rules.items() if v["active"]}
+        print(f"快照 {state.as_of}，觸發中 {len(active)} 條")
+        for k, v in sorted(active.items()): print(f"  {k}  自 {v['since']}  數值 {v['value']}")
+        return
+    sinks, source = sinks_from_spec(args.sinks), SnapshotFile(args.snapshot)
+    while True:
+        try:
+            events = run_once(table, state, sinks, source, args.build, args.refresh)
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {len(table)} 條規則，{len(events)} 則通知", file=sys.stderr)
+        except Exception as e:
+            if args.cmd == "once": raise
+            print(f"評估失敗: {e}", file=sys.stderr)
+        if args.cmd == "once": return
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# ==========================================
+# 回測引擎：把各分頁「只看最後一根」的規則攤開到每一個歷史交易日，一次向量化算完 (日期 × 代號)
+# 指標定義與 indicators.compute_indicator_matrix 完全相同 (逐檔以自己的有效 K 棒計算)，最後一列即為儀表板現值
+# ==========================================
+import numpy as np
+import pandas as pd
+
+import watchlists
+from indicators import _align_right
+from signals import ROTATION_BULL_SCORE
+
+HORIZONS = (5, 20, 60)
+FIELDS = ("price", "ma20", "ma60", "bias", "rsi", "ret20", "ret60", "score", "n")
+
+
+def _rolling_mean(a, window):
+    # 沿時間軸的移動平均 (cumsum 差分)；前 window-1 列為 NaN，窗口內含 NaN 時結果為 NaN
+    out = np.full(a.shape, np.nan)
+    if len(a) < window: return out
+    c = np.cumsum(np.vstack([np.zeros((1, a.shape[1])), a]), axis=0)
+    out[window - 1:] = (c[window:] - c[:-window]) / window
+    return out
+
+
+def _shift(a, k):
+    out = np.full(a.shape, np.nan)
+    if k < len(a): out[k:] = a[:len(a) - k]
+    return out
+
+
+def indicator_history(close_df, rsi_period=14):
+    # 回傳 {欄位: 日期 × 代號 DataFrame}；休市日沿用前一個交易日的值 (當天打開儀表板看到的就是它)
+    close_df = close_df.loc[:, ~close_df.columns.duplicated()]
+    values = close_df.to_numpy(dtype=float)
+    aligned, n_valid = _align_right(values)
+    rows = len(aligned)
+    # 靠右對齊後第 i 列是該檔的第 (i - 起點 + 1) 根有效 K 棒
+    count = np.arange(1, rows + 1)[:, None] - (rows - n_valid)[None, :]
+    count = np.maximum(count, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price = aligned
+        ma20 = np.where(count >= 20, _rolling_mean(np.nan_to_num(price), 20), np.nan)
+        ma20 = np.where(ma20 == 0, price, ma20)
+        ma60 = np.where(count >= 60, _rolling_mean(np.nan_to_num(price), 60), np.nan)
+        bias = (price - ma20) / ma20 * 100
+        delta = np.nan_to_num(np.diff(price, axis=0, prepend=np.nan))
+        gain = _rolling_mean(np.maximum(delta, 0), rsi_period)
+        loss = _rolling_mean(np.maximum(-delta, 0), rsi_period)
+        rsi = np.where(count >= rsi_period, 100 - (100 / (1 + gain / loss)), np.nan)
+        # 與 compute_indicator_matrix 相同：資料列數不足 rsi_period + 1 時整欄 NaN
+        if rows <= rsi_period: rsi[:] = np.nan
+        ret20 = np.where(count > 20, price / _shift(price, 19) - 1, np.nan)
+        ret60 = np.where(count > 60, price / _shift(price, 59) - 1, np.nan)
+    q_mom = np.nan_to_num(ret60 * 100, nan=0.0)
+    score = (40 * (bias > 0) + 30 * (q_mom > 0) + 30 * (rsi > 50)).astype(float)
+    score[count == 0] = np.nan
+    # 放回原本的日期位置 (_align_right 的逆排列)，再把休市日往前補值
+    order = np.argsort(~np.isnan(values), axis=0, kind="stable")
+    out = {}
+    count = np.where(count > 0, count, np.nan)
+    for name, arr in zip(FIELDS, (price, ma20, ma60, bias, rsi, ret20, ret60, score, count)):
+        back = np.empty_like(arr)
+        np.put_along_axis(back, order, arr, axis=0)
+        out[name] = pd.DataFrame(back, index=close_df.index, columns=close_df.columns).ffill()
+    out["n"] = out["n"].fillna(0).astype(np.int64)
+    return out
+
+
+def _col(hist, field, ticker):
+    frame = hist[field]
+    return frame[ticker] if ticker in frame.columns else pd.Series(np.nan, index=frame.index)
+
+
+def rule_ai_alarm(hist, tickers=None):
+    # Tab 1：科技權值平均乖離 < 0 (1 = 警報)；未指定清單時用目前的 watchlists.json
+    if tickers is None: tickers = watchlists.current().lists["assets_ai_risk"]
+    cols = [t for t in tickers if t in hist["bias"].columns]
+    avg = hist["bias"][cols].mean(axis=1)
+    return (avg < 0).astype(float).where(avg.notna())
+
+
+def rule_tw_lights(hist):
+    # Tab 2：四燈分數 0~4 (半導體漲、內資漲、美元跌、美債殖利率跌)；需 RSI 可算，內資缺資料時改看富邦中小
+    def light(ticker, up):
+        bias, ok = _col(hist, "bias", ticker), _col(hist, "rsi", ticker).notna()
+        return ((bias > 0) if up else (bias < 0)).astype(float).where(ok)
+    domestic = light("^TWOII", True).combine_first(light("00733.TW", True))
+    lights = pd.concat([light("SOXX", True), domestic, light("DX-Y.NYB", False), light("^TNX", False)], axis=1)
+    return lights.sum(axis=1).where(lights.notna().any(axis=1))
+
+
+def rule_rotation_bull(hist, leader="QQQ", bull_score=ROTATION_BULL_SCORE):
+    # Tab 5：QQQ 宏觀分數 ≥ 60 為牛市攻擊
+    score = _col(hist, "score", leader).where(_col(hist, "rsi", leader).notna())
+    return (score >= bull_score).astype(float).where(score.notna())
+
+
+def rule_carry_warning(hist, ticker="JPY=X"):
+    # Tab 3：USD/JPY 跌破季線 = 套利平倉警戒
+    price, ma60 = _col(hist, "price", ticker), _col(hist, "ma60", ticker)
+    return (price < ma60).astype(float).where(_col(hist, "n", ticker) >= 61)
+
+
+# 名稱 → (規則, 驗證標的, 判斷為「看多」的狀態)；規則輸出為浮點 (0/1 或燈數)，NaN = 數據不足
+RULES = {
+    "ai_alarm": (rule_ai_alarm, "^IXIC", lambda s: s == 0),
+    "tw_lights": (rule_tw_lights, "^TWII", lambda s: s >= 3),
+    "rotation_bull": (rule_rotation_bull, "QQQ", lambda s: s == 1),
+    "carry_warning": (rule_carry_warning, "^GSPC", lambda s: s == 0),
+}
+RULE_NAMES = {"ai_alarm": "💀 AI 平均離差翻負", "tw_lights": "🇹🇼 台股四燈分數",
+              "rotation_bull": "🔄 QQQ 宏觀分數 ≥ 60", "carry_warning": "🚀 日圓套利平倉警戒"}
+
+
+def _max_drawdown(equity):
+    if equity.empty: return np.nan
+    return float((equity / equity.cummax() - 1).min())
+
+
+def evaluate_rule(state, target_close, bullish, horizons=HORIZONS):
+    # state：每日訊號狀態；target_close：驗證標的收盤價 (只用它自己的交易日)
+    px = target_close.dropna()
+    state = state.reindex(px.index, method="ffill")
+    valid = state.notna()
+    fwd = pd.DataFrame({h: px.shift(-h) / px - 1 for h in horizons})
+    by_state = []
+    for value in sorted(state[valid].unique()):
+        on = valid & (state == value)
+        bull = bool(bullish(pd.Series([value])).iloc[0])
+        row = {"狀態": value, "判讀": "看多" if bull else "看空", "天數": int(on.sum())}
+        for h in horizons:
+            r = fwd.loc[on, h].dropna()
+            row[f"{h}日平均報酬(%)"] = r.mean() * 100 if len(r) else np.nan
+            # 命中率：看多狀態之後上漲、看空狀態之後下跌的比例
+            row[f"{h}日命中率(%)"] = ((r > 0) if bull else (r < 0)).mean() * 100 if len(r) else np.nan
+        by_state.append(row)
+    # 策略：前一天收盤為看多狀態就持有標的隔日報酬，否則空手 (訊號用收盤價 → 隔天才能進場，避免偷看)
+    daily = px.pct_change().fillna(0)
+    position = (valid & bullish(state)).astype(float).shift(1).fillna(0)
+    start = valid.idxmax() if valid.any() else px.index[-1]
+    strat = (1 + daily * position).loc[start:].cumprod()
+    hold = (1 + daily).loc[start:].cumprod()
+    summary = {
+        "樣本天數": int(valid.sum()), "持有比例(%)": float(position.loc[start:].mean() * 100) if len(strat) else np.nan,
+        "切換次數": int(position.diff().abs().loc[start:].sum()),
+        "策略報酬(%)": float((strat.iloc[-1] - 1) * 100) if len(strat) else np.nan,
+        "買進持有報酬(%)": float((hold.iloc[-1] - 1) * 100) if len(hold) else np.nan,
+        "策略最大回撤(%)": _max_drawdown(strat) * 100, "買進持有最大回撤(%)": _max_drawdown(hold) * 100,
+    }
+    return {"by_state": pd.DataFrame(by_state), "summary": summary,
+            "equity": pd.DataFrame({"策略": strat, "買進持有": hold})}
+
+
+def run_backtest(close_df, rules=RULES, horizons=HORIZONS):
+    # 回傳 {規則: {"state", "target", "by_state", "summary", "equity"}}；標的缺資料的規則略過
+    hist = indicator_history(close_df)
+    results = {}
+    for name, (rule, target, bullish) in rules.items():
+        if target not in close_df.columns or close_df[target].notna().sum() < 2: continue
+        state = rule(hist)
+        res = evaluate_rule(state, close_df[target], bullish, horizons)
+        res.update(state=state, target=target)
+        results[name] = res
+    return results
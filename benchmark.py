@@ -0,0 +1,149 @@
+# ==========================================
+# 離線效能基準：以合成行情 (synthetic.py，固定種子) 量測各分頁核心運算在不同清單規模 / 歷史長度下的耗時、吞吐量與峰值記憶體
+#   python benchmark.py                                     預設 100 / 1,000 / 10,000 檔 × 1 / 5 / 20 年
+#   python benchmark.py --tickers 100 1000 --years 1 5 --json out.json
+#   python benchmark.py --compare out.json                  與上一次的結果比較 (優化前後)
+# 預設全部組合都跑 (10,000 檔 × 20 年約需數 GB 記憶體)；記憶體不夠時加 --max-cells 5e7 之類，超過 (日期 × 檔數) 的組合
+# 會略過，並以 skipped 列留在結果 (JSON / 摘要) 中，不會默默消失
+# ==========================================
+import argparse
+import gc
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from indicators import RowIndex, calculate_rsi, compute_indicator_matrix, format_indicator_table
+from relative_strength import compute_rs, rs_view
+from signals import ai_average_bias
+from synthetic import make_ohlcv, synthetic_fundamentals
+from valuation import dcf_intrinsic_value, screen_valuations
+
+LOOKUPS = 100          # get_data_from_cache：每次重跑各分頁約查表數十次 (每份快照建一次表與索引，攤在這些查表上)
+WATCHLIST_SIZE = 20
+
+
+def _case_inputs(n_tickers, years, seed):
+    close = make_ohlcv(n_tickers=n_tickers, years=years, seed=seed, fields=["Close"])["Close"]
+    ind = compute_indicator_matrix(close)
+    rng = np.random.default_rng(seed)
+    watch = list(rng.choice(close.columns, size=min(WATCHLIST_SIZE, close.shape[1]), replace=False))
+    return close, ind, watch
+
+
+def _lookups(ind, watch):
+    # 與儀表板相同：建顯示表 + 代號索引 (build_indicator_table / get_row_index)，再查表 LOOKUPS 次
+    rows = RowIndex(format_indicator_table(ind))
+    return [rows.rows(watch) for _ in range(LOOKUPS)]
+
+
+def _rs_tab(close, tickers, bench):
+    # Tab 4：多週期 RS 全表 (build_rs_table) + 取清單排序 (rs_view)
+    return rs_view(compute_rs(close, benchmark=bench), tickers, 60)
+
+
+def cases(close, ind, watch, funds):
+    # 名稱 → (函數, 單位數)；單位 = 這次呼叫處理的 K 棒數或檔數，用來算吞吐量
+    bars = int(close.notna().to_numpy().sum())
+    tickers = list(close.columns)
+    bench = close.notna().sum().idxmax()       # 資料最完整的一檔當基準
+    eps = np.array([f["info"]["trailingEps"] for f in funds.values()])
+    return {
+        "calculate_rsi": (lambda: calculate_rsi(close), bars, "K棒"),
+        "indicator_matrix": (lambda: compute_indicator_matrix(close), bars, "K棒"),
+        "get_data_from_cache": (lambda: _lookups(ind, watch), LOOKUPS, "次查表"),
+        "tab1_bias": (lambda: ai_average_bias(ind, tickers=tickers), len(tickers), "檔"),
+        "tab4_rs_table": (lambda: _rs_tab(close, tickers, bench), len(tickers), "檔"),
+        "dcf_vectorized": (lambda: dcf_intrinsic_value(eps, 0.1, 0.03, 0.1), len(eps), "檔"),
+        "valuation_screen": (lambda: screen_valuations(funds), len(funds), "檔"),
+    }
+
+
+def _time(fn, repeat):
+    # 每次量測前清垃圾、量測中停用 GC；取中位數 (比平均穩定)
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            runs.append(time.perf_counter() - start)
+        finally: gc.enable()
+    return float(np.median(runs)), float(min(runs))
+
+
+def _peak_mb(fn):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally: tracemalloc.stop()
+
+
+def run(sizes=(100, 1000, 10000), years=(1, 5, 20), repeat=3, seed=0, max_cells=None, only=None):
+    results = []
+    for n in sizes:
+        funds = synthetic_fundamentals([f"T{i}" for i in range(n)], seed)
+        for y in years:
+            if max_cells and n * y * 365 > max_cells:
+                print(f"略過 {n} 檔 × {y} 年 (超過 --max-cells {max_cells:g})")
+                results.append({"case": "*", "tickers": n, "years": y, "skipped": f"超過 --max-cells {max_cells:g}"})
+                continue
+            inputs = _case_inputs(n, y, seed)
+            for name, (fn, units, unit) in cases(*inputs, funds).items():
+                if only and name not in only: continue
+                if name in ("dcf_vectorized", "valuation_screen") and y != years[0]: continue   # 與歷史長度無關
+                median, best = _time(fn, repeat)
+                results.append({"case": name, "tickers": n, "years": y, "rows": len(inputs[0]),
+                                "median_s": median, "best_s": best, "throughput": units / median if median else float("inf"),
+                                "unit": unit, "peak_mb": _peak_mb(fn)})
+                r = results[-1]
+                print(f"{name:<20} {n:>6} 檔 {y:>3} 年  {median * 1000:>10.2f} ms  {r['throughput']:>14,.0f} {unit}/s  {r['peak_mb']:>8.1f} MB")
+            del inputs
+            gc.collect()
+    return results
+
+
+def compare(results, baseline):
+    # 以 (case, tickers, years) 對齊，ratio > 1 代表比基準快
+    base = {(r["case"], r["tickers"], r["years"]): r for r in baseline}
+    rows = []
+    for r in results:
+        b = base.get((r["case"], r["tickers"], r["years"]))
+        if b and not r.get("skipped") and not b.get("skipped"): rows.append({"case": r["case"], "tickers": r["tickers"], "years": r["years"],
+                           "基準(ms)": b["median_s"] * 1000, "本次(ms)": r["median_s"] * 1000,
+                           "加速倍數": b["median_s"] / r["median_s"] if r["median_s"] else float("inf"),
+                           "記憶體變化(MB)": r["peak_mb"] - b["peak_mb"]})
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="離線效能基準 (合成行情)")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-cells", type=float, default=None, help="日期 × 檔數上限，超過的組合略過 (預設不限；10,000 檔 × 20 年約 7e7)")
+    parser.add_argument("--only", nargs="+", help="只跑指定項目")
+    parser.add_argument("--json", help="結果寫成 JSON (之後可用 --compare 比較)")
+    parser.add_argument("--compare", help="與先前的 JSON 結果比較")
+    args = parser.parse_args(argv)
+    results = run(args.tickers, args.years, args.repeat, args.seed, args.max_cells, args.only)
+    skipped = [r for r in results if r.get("skipped")]
+    if skipped: print("\n略過的組合：" + "、".join(f"{r['tickers']} 檔 × {r['years']} 年" for r in skipped))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                       "machine": platform.machine(), "seed": args.seed, "results": results}, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: baseline = json.load(f)["results"]
+        print(compare(results, baseline).round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
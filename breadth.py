@@ -0,0 +1,176 @@
+# ==========================================
+# 全市場廣度引擎：讀本地清單 (上市 / 上櫃約 1,800 檔，可再加 S&P 500 成分股)，逐塊從價格庫讀收盤價計算
+# 每塊只留下「每日計數」與「每檔最新值」，記憶體與重算時間只跟塊大小有關，不隨清單長度膨脹
+#   python breadth.py refresh [--universe data/universe.csv]   補齊清單內所有代號的日K (排程用)
+#   python breadth.py summary                                  印出最新一天的廣度
+# ==========================================
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import watchlists
+from backtest import _rolling_mean, _shift
+from indicators import _align_right, _tail_mean, compute_indicator_matrix
+from signals import high_price_thermometer
+
+UNIVERSE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "universe.csv")
+MARKETS = {"TWSE": "上市", "TPEx": "上櫃", "SP500": "S&P 500", "US": "美股", "OTHER": "其他"}
+MA_WINDOWS = (20, 60, 200)
+HIGH_LOW_WINDOW = 252      # 52 週新高 / 新低
+CHUNK_SIZE = 300
+BREADTH_PERIOD = "2y"      # MA200 + 52 週高低點需要兩年日K
+
+
+def market_of(ticker):
+    if ticker.endswith(".TWO"): return "TPEx"
+    if ticker.endswith(".TW"): return "TWSE"
+    return "OTHER" if "." in ticker else "US"
+
+
+def load_universe(path=None):
+    # CSV 欄位：ticker,name[,market]；market 省略時依代號後綴判斷 (.TW 上市 / .TWO 上櫃 / 無後綴 美股)
+    # 沒有清單檔時退回觀察清單中的個股 / ETF，介面照常運作
+    path = path or os.environ.get("MARKET_UNIVERSE", UNIVERSE_PATH)
+    if os.path.exists(path):
+        df = pd.read_csv(path, dtype=str).dropna(subset=["ticker"])
+        df["ticker"] = df["ticker"].str.strip()
+        if "name" not in df.columns: df["name"] = df["ticker"]
+        if "market" not in df.columns: df["market"] = None
+        df["market"] = df["market"].fillna(df["ticker"].map(market_of))
+        df["name"] = df["name"].fillna(df["ticker"])
+    else:
+        wl = watchlists.current()
+        tickers = [t for t in wl.all_tickers if not (t.startswith("^") or "=" in t or t.endswith("-USD"))]
+        df = pd.DataFrame({"ticker": tickers, "name": [wl.names.get(t, t) for t in tickers],
+                           "market": [market_of(t) for t in tickers]})
+    return df.drop_duplicates("ticker").set_index("ticker")[["name", "market"]]
+
+
+def _chunk_stats(close):
+    # 一塊 (日期 × 數百檔) → (每日計數, 每檔最新值)；均線與高低點以各檔自己的有效 K 棒計算
+    close = close.loc[:, ~close.columns.duplicated()]
+    values = close.to_numpy(dtype=float)
+    aligned, n_valid = _align_right(values)
+    rows = len(aligned)
+    count = np.maximum(np.arange(1, rows + 1)[:, None] - (rows - n_valid)[None, :], 0)
+    filled = np.nan_to_num(aligned)
+    flags = {}
+    with np.errstate(invalid="ignore"):
+        for w in MA_WINDOWS:
+            ma = np.where(count >= w, _rolling_mean(filled, w), np.nan)
+            flags[f"above{w}"] = aligned > ma
+            flags[f"n{w}"] = count >= w
+        delta = np.where(count >= 2, aligned - _shift(aligned, 1), np.nan)
+        flags["adv"], flags["dec"], flags["unch"] = delta > 0, delta < 0, delta == 0
+        full = count >= HIGH_LOW_WINDOW
+        roll = pd.DataFrame(aligned).rolling(HIGH_LOW_WINDOW)
+        flags["new_high"] = full & (aligned >= roll.max().to_numpy())
+        flags["new_low"] = full & (aligned <= roll.min().to_numpy())
+        flags["n_hl"] = full
+        flags["traded"] = count >= 1
+    # 放回原本日期位置後逐日加總 (休市的代號當天不計入)
+    order = np.argsort(~np.isnan(values), axis=0, kind="stable")
+    daily = {}
+    for k, v in flags.items():
+        back = np.empty_like(v)
+        np.put_along_axis(back, order, v, axis=0)
+        daily[k] = back.sum(axis=1)
+    daily = pd.DataFrame(daily, index=close.index)
+
+    latest = compute_indicator_matrix(close)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        latest["ma200"] = _tail_mean(aligned, n_valid, 200)
+        tail, ok = aligned[-HIGH_LOW_WINDOW:], n_valid >= HIGH_LOW_WINDOW
+        latest["high52"] = np.where(ok, np.nanmax(tail, axis=0, initial=-np.inf), np.nan)
+        latest["low52"] = np.where(ok, np.nanmin(tail, axis=0, initial=np.inf), np.nan)
+    mask = ~np.isnan(values)
+    last_row = rows - 1 - np.argmax(mask[::-1], axis=0)
+    latest["last_date"] = np.where(n_valid > 0, close.index[last_row], pd.NaT)
+    return daily, latest
+
+
+def compute_breadth(universe, load_close, chunk_size=CHUNK_SIZE):
+    # load_close(tickers) → 日期 × 代號收盤價；同市場的代號放同一塊 (交易日曆一致)
+    daily, latest = {}, []
+    for market, group in universe.groupby("market", sort=False):
+        tickers = list(group.index)
+        for i in range(0, len(tickers), chunk_size):
+            close = load_close(tickers[i:i + chunk_size])
+            close = close.dropna(axis=1, how="all") if close is not None else None
+            if close is None or close.empty: continue
+            d, l = _chunk_stats(close)
+            daily[market] = d if market not in daily else daily[market].add(d, fill_value=0)
+            latest.append(l)
+    latest = pd.concat(latest) if latest else pd.DataFrame()
+    if not latest.empty: latest = latest.join(universe, how="left")
+    return {"daily": daily, "latest": latest}
+
+
+def combine_markets(daily, markets=None):
+    # 多個市場的每日計數相加 (全部 / 只看上市 ...)
+    frames = [daily[m] for m in (markets or daily) if m in daily]
+    if not frames: return pd.DataFrame()
+    total = frames[0]
+    for f in frames[1:]: total = total.add(f, fill_value=0)
+    return total.sort_index()
+
+
+def breadth_lines(counts):
+    # 每日計數 → 站上均線比例、騰落線、新高新低
+    if counts.empty: return pd.DataFrame()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = pd.DataFrame({f"站上MA{w}(%)": counts[f"above{w}"] / counts[f"n{w}"].replace(0, np.nan) * 100 for w in MA_WINDOWS})
+    out["上漲家數"], out["下跌家數"] = counts["adv"], counts["dec"]
+    out["騰落線"] = (counts["adv"] - counts["dec"]).cumsum()
+    out["創新高"], out["創新低"] = counts["new_high"], counts["new_low"]
+    out["新高-新低"] = counts["new_high"] - counts["new_low"]
+    return out
+
+
+def aggregate_by_market(latest):
+    # 最新一天依市場彙總
+    if latest.empty: return pd.DataFrame()
+    df = latest.assign(**{f"_a{w}": (latest["price"] > latest[f"ma{w}"]).where(latest[f"ma{w}"].notna()) for w in MA_WINDOWS})
+    df["_hi"] = (df["price"] >= df["high52"]).where(df["high52"].notna())
+    df["_lo"] = (df["price"] <= df["low52"]).where(df["low52"].notna())
+    g = df.groupby("market")
+    out = pd.DataFrame({"檔數": g.size()})
+    for w in MA_WINDOWS: out[f"站上MA{w}(%)"] = (g[f"_a{w}"].mean() * 100).round(1)
+    out["平均乖離(%)"] = g["bias"].mean().round(2)
+    out["52週新高"] = g["_hi"].sum().astype(int)
+    out["52週新低"] = g["_lo"].sum().astype(int)
+    out.index = [MARKETS.get(m, m) for m in out.index]
+    return out
+
+
+def thousand_club(latest):
+    # 全市場千金股 (上市 + 上櫃，股價 ≥ 1000)：與千金股溫度計相同定義，只是名單不再寫死
+    if latest.empty: return {"club_count": 0, "members": []}
+    tw = latest[latest["market"].isin(["TWSE", "TPEx"])]
+    return high_price_thermometer(tw, tickers=list(tw.index))
+
+
+def main(argv=None):
+    from market_data import download_concurrent, provider_from_env
+    from price_store import PriceStore
+    parser = argparse.ArgumentParser(description="全市場廣度")
+    parser.add_argument("cmd", choices=["refresh", "summary"])
+    parser.add_argument("--universe", default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    universe = load_universe(args.universe)
+    store = PriceStore()
+    if args.cmd == "refresh":
+        provider = provider_from_env()
+        failed = store.refresh(list(universe.index), lambda batch, start: download_concurrent(provider, batch, start), period=BREADTH_PERIOD)
+        print(f"{len(universe)} 檔更新完成，失敗 {len(failed)} 檔")
+        return
+    res = compute_breadth(universe, lambda c: store.load_field(c, "Close", BREADTH_PERIOD), args.chunk_size)
+    print(breadth_lines(combine_markets(res["daily"])).tail(1).T.to_string())
+    print(aggregate_by_market(res["latest"]).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# ==========================================
+# 趨勢圖資料：多解析度序列 (日 / 週 / 月) + LTTB 降採樣，不論區間多長送到瀏覽器的點數都有上限
+# 疊加線 (MA20 / MA60 / RSI) 取自 backtest.indicator_history 的整段指標 (與儀表板現值同定義)，每份快照只算一次
+# ==========================================
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backtest import indicator_history
+
+RESOLUTIONS = {"日": None, "週": "W-FRI", "月": "ME"}
+OVERLAYS = ("ma20", "ma60", "rsi")
+MAX_POINTS = 600
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets：保留視覺上最重要的轉折點，回傳被選中的位置 (含頭尾)
+    n = len(y)
+    if n_out >= n or n_out < 3: return np.arange(n)
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.int64)     # 中間 n_out-2 個桶的邊界
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()                          # 下一桶的平均點
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def downsample(frame, column="price", max_points=MAX_POINTS):
+    # 以主線 (價格) 選點，疊加線取同樣的日期，各線對齊不會錯位
+    if len(frame) <= max_points: return frame
+    x = frame.index.asi8.astype(float)
+    return frame.iloc[lttb(x, frame[column].to_numpy(dtype=float), max_points)]
+
+
+class SeriesStore:
+    # 一份收盤價快照 → 各檔各解析度的 [price, ma20, ma60, rsi]；逐檔用到才切出來並保留 (cache_resource 全站共用)
+    def __init__(self, close_df):
+        close_df = close_df.loc[:, ~close_df.columns.duplicated()]
+        self.close = close_df
+        hist = indicator_history(close_df)
+        self.overlays = {f: hist[f] for f in OVERLAYS}
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def has(self, ticker):
+        return ticker in self.close.columns
+
+    def frame(self, ticker, resolution="日"):
+        key = (ticker, resolution)
+        hit = self._frames.get(key)
+        if hit is not None: return hit
+        if not self.has(ticker): return pd.DataFrame(columns=["price", *OVERLAYS], dtype=float)
+        price = self.close[ticker]
+        traded = price.notna()      # 休市日不畫 (indicator_history 已往前補值)
+        df = pd.DataFrame({"price": price, **{f: v[ticker] for f, v in self.overlays.items()}})[traded].astype(float)
+        rule = RESOLUTIONS[resolution]
+        if rule: df = df.resample(rule).last().dropna(subset=["price"])
+        with self._lock: self._frames[key] = df
+        return df
+
+    def pick_resolution(self, ticker, start=None, end=None, max_points=MAX_POINTS):
+        # 自動：區間內日K點數在上限內就用日K，否則週K、再不行月K (之後仍會 LTTB 壓到上限)
+        for res in RESOLUTIONS:
+            if len(self.frame(ticker, res).loc[start:end]) <= max_points: return res
+        return list(RESOLUTIONS)[-1]
+
+    def window(self, ticker, start=None, end=None, resolution=None, max_points=MAX_POINTS, benchmark=None):
+        # 區間 + 解析度 → 最多 max_points 點；benchmark 指定時加一欄「相對大盤」(區間起點 = 100)
+        res = resolution or self.pick_resolution(ticker, start, end, max_points)
+        df = self.frame(ticker, res).loc[start:end]
+        if benchmark and self.has(benchmark) and not df.empty:
+            b = self.frame(benchmark, "日")["price"]
+            bench = b.reindex(b.index.union(df.index)).ffill().reindex(df.index)
+            rel = df["price"] / bench
+            first = rel.first_valid_index()
+            df = df.assign(relative=rel / rel.loc[first] * 100 if first is not None else np.nan)
+        return downsample(df, "price", max_points), res
@@ -0,0 +1,191 @@
+# ==========================================
+# 跨資產滾動相關：每個窗口保留 N 維和與 N×N 交叉乘積和，新 K 棒進來只做一次外積加減 (O(N²))，不必重算整段歷史
+# 結果等同 pandas rolling(window).corr() (窗口內有缺值的配對為 NaN)，另提供分群排序與相關性飆升的型態判斷
+# ==========================================
+import threading
+
+import numpy as np
+import pandas as pd
+
+WINDOWS = (20, 60)
+RESYNC_EVERY = 250     # 每 N 次更新由緩衝重算一次累計和，避免浮點誤差累積
+SPIKE_ABS = 0.6        # 平均相關 ≥ 0.6 = 資產同漲同跌
+SPIKE_Z = 2.0          # 或高於自身一年均值 2 個標準差
+CLUSTER_CUT = 0.5      # 分群門檻：群內平均距離 (1 - 相關) ≤ 0.5
+KEY_PAIRS = [("HYG", "LQD"), ("RSP", "SPY"), ("AUDJPY=X", "^GSPC"), ("BTC-USD", "QQQ"), ("GLD", "UUP"), ("^TWII", "^SOX")]
+
+
+def prepare_returns(close_df, ffill_limit=5):
+    # 各市場交易日不同：收盤價先往前補 (最多 ffill_limit 天)，休市日報酬視為 0；對數報酬
+    close = close_df.loc[:, ~close_df.columns.duplicated()].sort_index().ffill(limit=ffill_limit)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rets = np.log(close).diff().iloc[1:]
+    return rets.dropna(how="all")
+
+
+class RollingCorrelation:
+    def __init__(self, tickers, window):
+        self.tickers = pd.Index(tickers)
+        self.window = window
+        n = len(self.tickers)
+        self.buf = np.zeros((window, n))            # 窗口內的報酬 (缺值存 0)，第 i 列放在 i % window
+        self.valid = np.zeros((window, n), dtype=bool)
+        self.size = 0                               # 已放入的列數 (不封頂)
+        self.sx = np.zeros(n)
+        self.sxx = np.zeros((n, n))
+        self.count = np.zeros(n, dtype=np.int64)    # 窗口內有效報酬數；= window 才算得出相關
+        self.updates = 0
+        self.last_key = ""
+        self.prev_close = np.full(n, np.nan)        # 最後一列報酬的基準收盤價 (前一日)
+        self.last_close = np.full(n, np.nan)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_close_frame(cls, close_df, window, key_format="%Y-%m-%d"):
+        # 用歷史建立狀態，同時回傳每日的平均相關 (型態判斷用)
+        rets = prepare_returns(close_df)
+        state = cls(rets.columns, window)
+        history = state.extend(rets.to_numpy(dtype=float), rets.index)
+        close = close_df.loc[:, ~close_df.columns.duplicated()].reindex(columns=state.tickers).sort_index().ffill()
+        if len(close) >= 2:
+            state.last_close, state.prev_close = close.iloc[-1].to_numpy(float), close.iloc[-2].to_numpy(float)
+            state.last_key = pd.Timestamp(close.index[-1]).strftime(key_format)
+        return state, history
+
+    def _add(self, x, v, sign):
+        self.sx += sign * x
+        self.sxx += sign * np.outer(x, x)
+        self.count += sign * v
+
+    def push(self, row):
+        with self.lock: self._push(np.asarray(row, dtype=float))
+
+    def _push(self, row):
+        v = ~np.isnan(row)
+        x = np.where(v, row, 0.0)
+        slot = self.size % self.window
+        if self.size >= self.window: self._add(self.buf[slot], self.valid[slot], -1)   # 移出最舊一列
+        self.buf[slot], self.valid[slot] = x, v
+        self._add(x, v, 1)
+        self.size += 1
+        self.updates += 1
+        if self.updates % RESYNC_EVERY == 0: self.resync()
+
+    def replace_last(self, row):
+        # 盤中：同一天的報酬一直變動，覆蓋最後一列
+        with self.lock: self._replace_last(np.asarray(row, dtype=float))
+
+    def _replace_last(self, row):
+        if self.size == 0: return self._push(row)
+        slot = (self.size - 1) % self.window
+        self._add(self.buf[slot], self.valid[slot], -1)
+        v = ~np.isnan(row)
+        self.buf[slot], self.valid[slot] = np.where(v, row, 0.0), v
+        self._add(self.buf[slot], v, 1)
+        self.updates += 1
+
+    def resync(self):
+        rows = min(self.size, self.window)
+        buf = self.buf if rows == self.window else self.buf[:rows]
+        valid = self.valid if rows == self.window else self.valid[:rows]
+        self.sx, self.sxx, self.count = buf.sum(axis=0), buf.T @ buf, valid.sum(axis=0)
+
+    def _corr(self):
+        ok = self.count == self.window
+        mean = self.sx / self.window
+        cov = self.sxx / self.window - np.outer(mean, mean)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sd = np.sqrt(np.clip(np.diag(cov), 0, None))
+            corr = np.clip(cov / np.outer(sd, sd), -1, 1)
+        ok &= sd > 0
+        corr[~ok, :] = np.nan
+        corr[:, ~ok] = np.nan
+        np.fill_diagonal(corr, np.where(ok, 1.0, np.nan))
+        return corr
+
+    def matrix(self):
+        with self.lock: return pd.DataFrame(self._corr(), index=self.tickers, columns=self.tickers)
+
+    def extend(self, rows, index):
+        # 逐列推進並記錄每天的平均相關；每列 O(N²)，整段歷史一次掃完
+        stats = np.full((len(rows), 3), np.nan)
+        iu = np.triu_indices(len(self.tickers), k=1)
+        with self.lock:
+            for i, row in enumerate(rows):
+                self._push(row)
+                pairs = self._corr()[iu]
+                pairs = pairs[~np.isnan(pairs)]
+                if len(pairs): stats[i] = pairs.mean(), (pairs > 0.7).mean() * 100, len(pairs)
+        return pd.DataFrame(stats, index=index, columns=["平均相關", "高相關配對(%)", "配對數"])
+
+    def update_prices(self, keys, prices):
+        # 盤中增量：keys / prices 為以代號為索引的當地交易日鍵 (streaming.latest_bars) 與最新價，keys 也可以是單一日期字串
+        # 這一列的日期 = 最新的鍵；只有當地交易日就是這一天的代號更新價格，其餘 (還停在前一交易日的市場) 視為休市、報酬 0
+        # 日期鍵變新 → 新增一列報酬；同一天 → 覆蓋最後一列。判斷與套用在同一把鎖內完成，不會把同一天推兩列或覆蓋錯列
+        px = pd.Series(prices, dtype=float).reindex(self.tickers).to_numpy()
+        if isinstance(keys, str): keys = pd.Series(keys, index=self.tickers)
+        keys = pd.Series(keys, dtype=object).reindex(self.tickers).fillna("").to_numpy()
+        key = max(keys[~np.isnan(px)], default="")
+        px = np.where(keys == key, px, np.nan)
+        with self.lock:
+            if not key or key < self.last_key: return False
+            new_day = key > self.last_key
+            if new_day: self.prev_close, self.last_key = self.last_close.copy(), key
+            self.last_close = np.where(np.isnan(px), self.last_close, px)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                row = np.log(self.last_close / self.prev_close)
+            if new_day: self._push(row)
+            else: self._replace_last(row)
+        return True
+
+
+def regime(history, lookback=250, spike_abs=SPIKE_ABS, spike_z=SPIKE_Z):
+    # 平均相關與自身歷史比較：飆升 (同漲同跌、分散失效) / 正常 / 分散
+    avg = history["平均相關"]
+    mean = avg.rolling(lookback, min_periods=20).mean()
+    sd = avg.rolling(lookback, min_periods=20).std()
+    z = (avg - mean) / sd
+    spike = (avg >= spike_abs) | (z >= spike_z)
+    label = np.where(spike, "🚨 相關性飆升", np.where(z <= -1, "🟢 分散", "🟡 正常"))
+    out = pd.DataFrame({"平均相關": avg, "z": z, "飆升": spike, "型態": label}, index=history.index)
+    return out[avg.notna()]
+
+
+def cluster_order(corr, cut=CLUSTER_CUT):
+    # 平均連結 (average linkage) 階層分群，距離 = 1 - 相關；回傳 (熱圖排序, {代號: 群號})
+    corr = corr.dropna(how="all").dropna(axis=1, how="all")
+    tickers = list(corr.index)
+    if len(tickers) < 2: return tickers, {t: 0 for t in tickers}
+    dist = 1 - corr.to_numpy(dtype=float)
+    dist = np.where(np.isnan(dist), 1.0, dist)
+    np.fill_diagonal(dist, np.inf)
+    members = {i: [i] for i in range(len(tickers))}
+    labels = None
+    while len(members) > 1:
+        keys = list(members)
+        sub = dist[np.ix_(keys, keys)]
+        a, b = np.unravel_index(np.argmin(sub), sub.shape)
+        a, b = keys[a], keys[b]
+        if labels is None and dist[a, b] > cut:
+            labels = {tickers[m]: c for c, group in enumerate(members.values()) for m in group}
+        na, nb = len(members[a]), len(members[b])
+        merged = (na * dist[a] + nb * dist[b]) / (na + nb)
+        dist[a], dist[:, a] = merged, merged
+        dist[a, a] = np.inf
+        dist[b], dist[:, b] = np.inf, np.inf
+        members[a] = members[a] + members.pop(b)
+    order = [tickers[i] for i in next(iter(members.values()))]
+    if labels is None: labels = {t: 0 for t in tickers}
+    return order, labels
+
+
+def pair_table(matrices, pairs=KEY_PAIRS, names=None):
+    # matrices: {窗口: 相關矩陣}；重點配對在不同窗口下的相關
+    names = names or {}
+    rows = []
+    for a, b in pairs:
+        row = {"配對": f"{names.get(a, a)} / {names.get(b, b)}"}
+        for w, m in matrices.items():
+            row[f"{w}日相關"] = round(m.loc[a, b], 2) if a in m.index and b in m.index and pd.notna(m.loc[a, b]) else None
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,92 @@
+# ==========================================
+# 基本面快取：依代號保存 info 欄位與財報，TTL 到期重抓、超過容量以 LRU 淘汰，並可背景批次預抓
+# ==========================================
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from perf import span
+
+# 估值模型用得到的 info 欄位 (只留這些，避免整包 info 佔記憶體)
+INFO_FIELDS = [
+    "longName", "currentPrice", "trailingEps", "trailingPE", "pegRatio", "bookValue",
+    "earningsGrowth", "returnOnEquity", "payoutRatio", "quoteType",
+]
+
+
+def load_fundamentals(ticker):
+    import yfinance as yf
+    stock = yf.Ticker(ticker)
+    with span("external_call", target="yfinance.info"): info = stock.info or {}
+    try:
+        with span("external_call", target="yfinance.financials"): financials = stock.financials
+    except Exception: financials = pd.DataFrame()
+    return {"info": {k: info.get(k) for k in INFO_FIELDS if k in info},
+            "financials": financials if financials is not None else pd.DataFrame()}
+
+
+class FundamentalsCache:
+    def __init__(self, maxsize=256, ttl=6 * 3600, loader=load_fundamentals, max_workers=4):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.loader = loader
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()      # 代號 → (抓取時間, 數據)
+        self._inflight = {}             # 代號 → Event，同一檔同時只抓一次
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fundamentals")
+
+    def _fresh(self, ticker, now):
+        entry = self._data.get(ticker)
+        if entry and now - entry[0] < self.ttl:
+            self._data.move_to_end(ticker)
+            return entry[1]
+        return None
+
+    def get(self, ticker):
+        while True:
+            with self._lock:
+                value = self._fresh(ticker, time.time())
+                if value is not None:
+                    self.hits += 1
+                    return value
+                waiter = self._inflight.get(ticker)
+                if waiter is None:
+                    self.misses += 1
+                    waiter = self._inflight[ticker] = threading.Event()
+                    break
+            # 別的執行緒 (例如背景預抓) 正在抓同一檔 → 等它完成再回頭讀快取 (對方失敗就換自己抓)
+            waiter.wait()
+        try:
+            value = self.loader(ticker)
+            with self._lock:
+                self._data[ticker] = (time.time(), value)
+                self._data.move_to_end(ticker)
+                while len(self._data) > self.maxsize: self._data.popitem(last=False)
+            return value
+        finally:
+            with self._lock: self._inflight.pop(ticker, None)
+            waiter.set()
+
+    def prefetch(self, tickers):
+        # 背景預抓，不阻塞畫面；失敗的代號等使用者真的查詢時再抓
+        def warm(t):
+            try: self.get(t)
+            except Exception: pass
+        return [self._pool.submit(warm, t) for t in dict.fromkeys(tickers)]
+
+    def get_many(self, tickers):
+        # 並行取多檔 (多半已被預抓命中)，抓不到的略過
+        def safe_get(t):
+            try: return t, self.get(t)
+            except Exception: return t, None
+        return {t: v for t, v in self._pool.map(safe_get, dict.fromkeys(tickers)) if v is not None}
+
+    def invalidate(self, ticker=None):
+        with self._lock:
+            if ticker is None: self._data.clear()
+            else: self._data.pop(ticker, None)
@@ -0,0 +1,101 @@
+# ==========================================
+# 指標引擎：一次向量化計算整個價格矩陣的 MA / 乖離 / RSI / 動能，不依賴 Streamlit
+# ==========================================
+import numpy as np
+import pandas as pd
+
+
+def calculate_rsi(series, period=14):
+    delta = series.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+
+def _align_right(values):
+    # 每欄有效值推到底部、NaN 推到頂端 → 等同逐檔 dropna 後靠右對齊 (各市場休市日不同)
+    mask = ~np.isnan(values)
+    order = np.argsort(mask, axis=0, kind="stable")
+    return np.take_along_axis(values, order, axis=0), mask.sum(axis=0)
+
+
+def _tail_mean(aligned, n_valid, window):
+    if len(aligned) < window: return np.full(aligned.shape[1], np.nan)
+    return np.where(n_valid >= window, aligned[-window:].mean(axis=0), np.nan)
+
+
+def _tail_return(aligned, n_valid, lookback):
+    # 與 series.iloc[-lookback] 相同的定義 (需多於 lookback 根 K 棒)
+    if len(aligned) < lookback: return np.full(aligned.shape[1], np.nan)
+    base = aligned[-lookback]
+    return np.where(n_valid > lookback, (aligned[-1] - base) / base, np.nan)
+
+
+def compute_indicator_matrix(close_df, rsi_period=14):
+    # 全市場指標引擎：一次向量化算完每一欄的 現價/MA20/MA60/乖離/RSI/季動能/20日與60日報酬
+    close_df = close_df.loc[:, ~close_df.columns.duplicated()]
+    aligned, n_valid = _align_right(close_df.to_numpy(dtype=float))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price = aligned[-1] if len(aligned) else np.full(len(close_df.columns), np.nan)
+        ma20 = _tail_mean(aligned, n_valid, 20)
+        ma20 = np.where(ma20 == 0, price, ma20)
+        ma60 = _tail_mean(aligned, n_valid, 60)
+        bias = (price - ma20) / ma20 * 100
+        rsi = np.full(len(price), np.nan)
+        if len(aligned) > rsi_period:
+            delta = np.diff(aligned[-(rsi_period + 1):], axis=0)
+            gain = np.where(delta > 0, delta, 0).mean(axis=0)
+            loss = np.where(delta < 0, -delta, 0).mean(axis=0)
+            rsi = np.where(n_valid >= rsi_period, 100 - (100 / (1 + gain / loss)), np.nan)
+        ret20 = _tail_return(aligned, n_valid, 20)
+        ret60 = _tail_return(aligned, n_valid, 60)
+    q_mom = np.nan_to_num(ret60 * 100, nan=0.0)
+    score = 40 * (bias > 0) + 30 * (q_mom > 0) + 30 * (rsi > 50)
+    return pd.DataFrame({
+        "price": price, "ma20": ma20, "ma60": ma60, "bias": bias, "rsi": rsi,
+        "q_mom": q_mom, "ret20": ret20, "ret60": ret60, "score": score, "n": n_valid
+    }, index=close_df.columns)
+
+
+def format_indicator_table(ind, names=None):
+    # 指標矩陣 → 各分頁共用的中文顯示表
+    names = names or {}
+    # RSI 無法計算 (數據不足) 的標的不列入表格，與舊版逐檔邏輯一致
+    ok = ind[(ind["n"] > 0) & ind["rsi"].notna()]
+    rsi_status = np.where(ok["rsi"] > 70, "🔥過熱", np.where(ok["rsi"] < 30, "❄️超賣", "☁️"))
+    table = pd.DataFrame({
+        "代號": ok.index, "資產名稱": [names.get(t, t) for t in ok.index],
+        "趨勢 (月線)": np.where(ok["bias"] > 0, "🔴強勢", "🟢弱勢"),
+        "RSI訊號": [f"{s} ({int(r)})" for s, r in zip(rsi_status, ok["rsi"])],
+        "季動能 (3個月)": [f"🔴 +{round(m, 2)}%" if m > 0 else f"🟢 {round(m, 2)}%" for m in ok["q_mom"]],
+        "宏觀分數": ok["score"].astype(int).values, "現價": ok["price"].round(2).values, "乖離率": ok["bias"].values
+    }, index=ok.index)
+    return table
+
+
+class RowIndex:
+    # 代號 → 列位置的預先索引 (每份快照建一次)：各分頁取列只做 dict 查詢 + 一次 take，不隨全市場檔數變慢
+    def __init__(self, table):
+        self.table = table
+        self.positions = {t: i for i, t in enumerate(table.index)}
+        self._columns = {c: table[c].to_numpy() for c in table.columns}
+
+    def __contains__(self, ticker):
+        return ticker in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def empty(self):
+        return not self.positions
+
+    def rows(self, tickers):
+        # 依清單順序取出列 (清單內沒有數據的代號略過)
+        pos = [p for p in map(self.positions.get, tickers) if p is not None]
+        return self.table.iloc[pos].reset_index(drop=True)
+
+    def value(self, ticker, column, default=None):
+        p = self.positions.get(ticker)
+        return default if p is None else self._columns[column][p]
@@ -1,8 +1,32 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
+import numpy as np
+import altair as alt
+import os
 import pytz
 from datetime import datetime
+from price_store import PriceStore
+from market_data import download_concurrent, provider_from_env
+from shared_cache import SharedCache, backend_from_env, snapshot_key
+from market_snapshot import MarketSnapshot
+from backtest import RULE_NAMES, RULES, rule_ai_alarm, run_backtest
+from breadth import (
+    BREADTH_PERIOD, MARKETS, UNIVERSE_PATH, aggregate_by_market, breadth_lines, combine_markets, compute_breadth,
+    load_universe, thousand_club,
+)
+from perf import metrics, span, timed
+from relative_strength import HOME as RS_HOME, HORIZONS as RS_HORIZONS, compute_rs, rs_view
+from chart_series import MAX_POINTS, RESOLUTIONS, SeriesStore
+from correlation import WINDOWS as CORR_WINDOWS, RollingCorrelation, cluster_order, pair_table, regime
+from fundamentals import FundamentalsCache
+import watchlists
+from indicators import RowIndex, compute_indicator_matrix, format_indicator_table
+from signals import (
+    ai_average_bias, breadth_and_credit, carry_trade_status, high_price_thermometer, rotation_scores,
+    short_rate, tw_four_lights,
+)
+from streaming import StreamingIndicatorState, latest_bars
+from valuation import dcf_intrinsic_value, dcf_monte_carlo, dcf_sensitivity_grid, get_smart_growth_rate, screen_valuations
 
 # ==========================================
 # 1. 系統設定
@@ -40,130 +64,244 @@ with st.expander("📖 新手指南：操盤手心法與判讀 (點擊展開)"):
 # 2. 核心函數與設定
 # ==========================================
 
-@st.cache_data(ttl=3600)
+# 觀察清單熱更新：每次重跑檢查 watchlists.json，有改就換新 (下載清單改變 → 快取鍵改變 → 自動補抓新代號)
+try: wl = watchlists.current()
+except (OSError, ValueError) as e:
+    st.error(f"觀察清單設定檔無法載入 (修正後重新整理即可)：{type(e).__name__}: {e}")
+    st.stop()
+if watchlists.last_error: st.sidebar.warning(f"觀察清單設定有誤，沿用上一版：{watchlists.last_error}")
+name_map, benchmark_ticker, all_needed_tickers = wl.names, wl.benchmark, wl.all_tickers
+assets_ai_risk, assets_tw_strategy, assets_semi_tickers = wl.lists["assets_ai_risk"], wl.lists["assets_tw_strategy"], wl.lists["assets_semi_tickers"]
+assets_rotation, assets_high_price, cnn_tickers = wl.lists["assets_rotation"], wl.lists["assets_high_price"], wl.lists["cnn_tickers"]
+assets_radar, assets_macro = wl.groups["assets_radar"], wl.groups["assets_macro"]
+
+data_provider = provider_from_env()
+
+@st.cache_resource
+def get_shared_cache():
+    # 跨副本共用快照 (預設 data/shared_cache，可用 MARKET_CACHE_DIR 指到共用磁碟)
+    cache = SharedCache(backend_from_env(), ttl=3600)
+    # 舊快照 (別的副本正在更新) 也算命中：沒有觸發下載
+    metrics.register_collector("shared_snapshot", lambda: [
+        ("app_cache_hits_total", {"cache": "shared_snapshot"}, cache.hits + cache.stale),
+        ("app_cache_misses_total", {"cache": "shared_snapshot"}, cache.refreshes),
+        ("app_cache_stale_total", {"cache": "shared_snapshot"}, cache.stale)])
+    return cache
+
+shared_cache = get_shared_cache()
+
+def local_snapshot(tickers, period, store=None):
+    store = store or PriceStore()
+    with span("data_fetch", stage="price_store_load"): frame = store.load(tickers, period=period)
+    return MarketSnapshot.from_frame(frame)
+
+def refresh_snapshot(tickers, period):
+    # 先並行補本地價格庫的增量，再從磁碟讀；回傳 (精簡快照, 下載失敗代號)，部分失敗不影響其他分頁
+    # 整批更新失敗直接往外丟：共用快取繼續給上一份快照，不會把失敗結果存起來
+    store = PriceStore()
+    with span("data_fetch", stage="price_store_refresh"):
+        failed = store.refresh(tickers, lambda batch, start: download_concurrent(data_provider, batch, start), period=period)
+    return local_snapshot(tickers, period, store), failed
+
+@metrics.cache_layer("fetch_data", st.cache_resource(ttl=300, max_entries=8, show_spinner=False))
+def load_snapshot_cached(tickers, period="1y"):
+    # 本行程只快取 5 分鐘，之後改讀共用快照；共用快照過期時全部副本只有一個會去更新，其餘先用舊快照
+    # 快照為唯讀陣列，用 cache_resource 全站共用同一個物件 (重跑不反序列化、不複製)；出錯直接往外丟，不會被快取
+    # 有代號下載失敗的快照只在共用快取放 retry_ttl (5 分鐘)，之後再補抓
+    return shared_cache.get_or_refresh(snapshot_key("snapshot", tickers, period), lambda: refresh_snapshot(tickers, period),
+                                       partial=lambda result: bool(result[1]))
+
 def fetch_data_cached(tickers, period="1y"): # 改為 1y 以計算年線/季線
+    # 更新失敗且共用快取沒有舊快照 (冷啟動)：直接讀本地價格庫、全部標為失敗，不快取，下一次重跑會再試
     try:
-        data = yf.download(tickers, period=period, progress=False)
-        return data
-    except:
-        return pd.DataFrame()
-
-# 建立中英文對照表
-name_map = {
-    "^IXIC": "納斯達克", "SMH": "半導體ETF", "^TWO": "櫃買指數",
-    "NVDA": "輝達", "GOOG": "Google", "MSFT": "微軟",
-    "AAPL": "蘋果", "AMZN": "亞馬遜", "META": "Meta",
-    "TSLA": "特斯拉", "AVGO": "博通",
-    "SOXX": "費半 ETF", "^TWOII": "櫃買(舊)", "00733.TW": "富邦中小", 
-    "DX-Y.NYB": "美元指數", "^TNX": "美債10年",
-    "^SOX": "費城半導體", "BTC-USD": "比特幣", "HG=F": "銅期貨", "AUDJPY=X": "澳幣/日圓",
-    "GC=F": "黃金", "JPY=X": "美元/日圓", "^VIX": "VIX恐慌",
-    "^TWII": "台灣加權", "0050.TW": "元大台灣50", "^GSPC": "S&P 500", "^N225": "日經225",
-    "HYG": "高收益債", "TLT": "美債20年", "LQD": "投資級債",
-    "RSP": "S&P500 等權重", "SPY": "S&P500",
-    "VTI": "美股全市場", "DBB": "工業金屬", "XLE": "能源",
-    "DBA": "農產品", "DOG": "放空道瓊", "000001.SS": "上證指數",
-    "QQQ": "科技股", "UUP": "美元ETF", "GLD": "黃金ETF",
-    "2330.TW": "台積電", "AMD": "超微", "TSM": "台積電ADR",
-    "5274.TWO": "信驊", "3008.TW": "大立光", "3661.TW": "世芯-KY", 
-    "3529.TWO": "力旺", "6669.TW": "緯穎", "5269.TWO": "祥碩", 
-    "3443.TW": "創意", "2454.TW": "聯發科", "2059.TW": "川湖",
-    "3533.TW": "嘉澤", "3131.TWO": "弘塑", "3653.TW": "健策", 
-    "3293.TWO": "鈊象", "6409.TW": "旭隼", "8454.TW": "富邦媒",
-    "6643.TW": "M31", "6415.TW": "矽力*-KY", "8299.TWO": "群聯", "8464.TW": "億豐"
-}
-
-# 定義資產清單 (加入 JPY=X)
-assets_ai_risk = ["^IXIC", "^SOX", "^TWII", "^TWO", "SMH", "NVDA", "GOOG", "MSFT", "AAPL", "AMZN", "META", "TSLA", "AVGO"]
-assets_tw_strategy = ["SOXX", "^TWOII", "00733.TW", "DX-Y.NYB", "^TNX"]
-assets_radar = {"1. 🚀 領先指標": ["^SOX", "BTC-USD", "HG=F", "AUDJPY=X"], "2. 🛡️ 避險資產": ["DX-Y.NYB", "GC=F", "JPY=X", "^VIX"], "3. 📉 股市現況": ["^TWII", "0050.TW", "^GSPC", "^N225"]}
-assets_semi_tickers = ["SOXX", "2330.TW", "NVDA", "TSM", "AMD", "AVGO", "^TWII"]
-benchmark_ticker = "SPY"
-assets_rotation = ["QQQ", "HYG", "UUP", "BTC-USD", "GLD", "XLE", "DBA"]
-assets_macro = {"1. 🔥 強勢動能觀察": ["VTI", "DBB", "XLE", "GC=F"], "2. ❄️ 弱勢動能觀察": ["DBA", "BTC-USD", "DOG"], "3. 🌏 核心市場": ["^GSPC", "000001.SS", "^TWII", "0050.TW"], "4. 🏦 利率與債券": ["^TNX", "TLT", "LQD"]}
-assets_high_price = ["5274.TWO", "3008.TW", "3661.TW", "3529.TWO", "6669.TW", "5269.TWO", "3443.TW", "2454.TW", "2059.TW", "3533.TW", "3131.TWO", "3653.TW", "3293.TWO", "6409.TW", "8454.TW", "6643.TW", "6415.TW", "2330.TW", "8299.TWO", "8464.TW"]
-cnn_tickers = ["RSP", "SPY", "HYG", "LQD"]
-
-def calculate_rsi(series, period=14):
-    delta = series.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    rs = gain / loss
-    return 100 - (100 / (1 + rs))
-
-def get_data_from_cache(ticker_list, cached_df):
-    results = []
-    if 'Close' in cached_df.columns: data = cached_df['Close']
-    else: data = cached_df
-
-    for ticker in ticker_list:
-        try:
-            if ticker in data.columns:
-                series = data[ticker].dropna()
-                if not series.empty:
-                    price = series.iloc[-1]
-                    ma20 = series.rolling(window=20).mean().iloc[-1]
-                    bias = (price - ma20) / ma20 * 100
-                    trend_status = "🔴強勢" if bias > 0 else "🟢弱勢"
-                    rsi_series = calculate_rsi(series)
-                    rsi = rsi_series.iloc[-1]
-                    rsi_status = "🔥過熱" if rsi > 70 else ("❄️超賣" if rsi < 30 else "☁️")
-                    if len(series) > 60: q_mom = (price - series.iloc[-60]) / series.iloc[-60] * 100
-                    else: q_mom = 0
-                    mom_str = f"🔴 +{round(q_mom, 2)}%" if q_mom > 0 else f"🟢 {round(q_mom, 2)}%"
-                    score = 0
-                    if bias > 0: score += 40
-                    if q_mom > 0: score += 30
-                    if rsi > 50: score += 30
-                    ch_name = name_map.get(ticker, ticker)
-                    results.append({
-                        "代號": ticker, "資產名稱": ch_name, "趨勢 (月線)": trend_status,
-                        "RSI訊號": f"{rsi_status} ({int(rsi)})", "季動能 (3個月)": mom_str,
-                        "宏觀分數": score, "現價": round(price, 2), "乖離率": bias
-                    })
-        except: pass
-    return pd.DataFrame(results)
-
-# 3. 資料下載 (加入 JPY=X)
-all_needed_tickers = list(set(
-    assets_ai_risk + assets_tw_strategy + assets_semi_tickers + [benchmark_ticker] + 
-    assets_rotation + assets_high_price + cnn_tickers + 
-    [t for sublist in assets_radar.values() for t in sublist] +
-    [t for sublist in assets_macro.values() for t in sublist] + 
-    ["^VIX", "^TNX", "ZQ=F", "^IRX", "JPY=X"]
-))
-
-cached_data = fetch_data_cached(all_needed_tickers, period="1y") # 改抓1年，為了算季線(60MA)
-
-# 4. 介面分頁
-tab_ai, tab_tw, tab_risk, tab_semi, tab_rotate, tab_macro, tab_chart, tab_valuation = st.tabs([
-    "💀 AI資金雷達", "🇹🇼 台股戰略", "🚀 風險雷達", "💎 半導體雷達", "🔄 輪動策略", "🌐 資產配置", "📈 趨勢圖", "⚖️ 法人估值"
+        return load_snapshot_cached(tickers, period)
+    except Exception:
+        try: return local_snapshot(tickers, period), list(tickers)
+        except Exception: return MarketSnapshot.from_frame(None), list(tickers)
+
+def tracked_close(snap, tickers):
+    # 快照中屬於目前觀察清單的收盤價 (tickers 由呼叫端傳入並列入快取鍵，清單改了就重建，不依賴快照剛好含哪些代號)
+    close = snap.frame('Close')
+    cols = [t for t in tickers if snap.has(t)]
+    return close if cols == list(close.columns) else close[cols]
+
+@metrics.cache_layer("indicator_table", st.cache_data(ttl=3600, show_spinner=False))
+@timed("compute", stage="indicator_table")
+def build_indicator_table(_snap, snapshot_key, tickers):
+    # 每份數據快照只算一次，各分頁直接取列 (取代逐檔迴圈)；快照本身不雜湊，以 snapshot_key (含清單版本，名稱改了也重建) + 代號當鍵
+    if _snap.empty or 'Close' not in _snap: return pd.DataFrame(), pd.DataFrame()
+    ind = compute_indicator_matrix(tracked_close(_snap, tickers))
+    return ind, format_indicator_table(ind, name_map)
+
+@metrics.cache_layer("backtest", st.cache_data(ttl=3600, show_spinner="回測計算中..."))
+@timed("compute", stage="backtest")
+def build_backtest(_snap, snapshot_key, tickers, ai_tickers):
+    # 同一份數據快照只回測一次；換期間 / 數據更新 / 觀察清單改了才重算
+    if _snap.empty or 'Close' not in _snap: return {}
+    rules = dict(RULES, ai_alarm=(lambda hist: rule_ai_alarm(hist, list(ai_tickers)), *RULES["ai_alarm"][1:]))
+    return run_backtest(tracked_close(_snap, tickers), rules)
+
+@metrics.cache_layer("breadth", st.cache_data(ttl=3600, show_spinner="全市場廣度計算中..."))
+@timed("compute", stage="breadth")
+def build_breadth(universe_path, universe_mtime):
+    # 逐塊讀價格庫計算；清單檔或價格庫更新 (按鈕會清快取) 才重算
+    universe = load_universe(universe_path)
+    store = PriceStore()
+    return universe, compute_breadth(universe, lambda chunk: store.load_field(chunk, "Close", BREADTH_PERIOD))
+
+@metrics.cache_layer("relative_strength", st.cache_data(ttl=3600, show_spinner=False))
+@timed("compute", stage="relative_strength")
+def build_rs_table(_snap, snapshot_key, tickers, benchmark):
+    # 全部代號 × 全部週期一次算完；半導體 / AI / 千金股只是從同一張表選列排序
+    if _snap.empty or 'Close' not in _snap: return pd.DataFrame()
+    return compute_rs(tracked_close(_snap, tickers), benchmark)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_row_index(_table, table_key):
+    # 代號 → 列位置的索引，每張指標表建一次、全站共用
+    return RowIndex(_table)
+
+@timed("compute", stage="get_data_from_cache")
+def get_data_from_cache(ticker_list, rows):
+    # rows 為指標表的 RowIndex；依清單順序取列，O(1) 查詢
+    return rows.rows(ticker_list)
+
+@st.cache_resource
+def get_fundamentals_cache():
+    # 每個行程共用一份基本面快取；基本面跟行情走同一個來源 (回放模式下不連網)
+    cache = FundamentalsCache(maxsize=256, ttl=6 * 3600, loader=data_provider.fundamentals)
+    metrics.register_collector("fundamentals", lambda: [
+        ("app_cache_hits_total", {"cache": "fundamentals"}, cache.hits),
+        ("app_cache_misses_total", {"cache": "fundamentals"}, cache.misses)])
+    return cache
+
+@st.cache_resource(max_entries=1)
+def prefetch_fundamentals(_cache, version, _tickers):
+    # 觀察清單每換一版 (mtime) 背景預抓一次其中的個股/ETF (指數、期貨、匯率沒有財報)；已在快取裡的直接命中
+    return _cache.prefetch([t for t in _tickers if not t.startswith("^") and "=" not in t and not t.endswith("-USD")])
+
+fundamentals_cache = get_fundamentals_cache()
+prefetch_fundamentals(fundamentals_cache, wl.version, wl.all_tickers)
+
+# 3. 資料下載
+with span("data_fetch", stage="fetch_data_cached"):
+    cached_data, failed_tickers = fetch_data_cached(all_needed_tickers, period="1y") # 改抓1年，為了算季線(60MA)
+metrics.set_gauge("app_snapshot_bytes", cached_data.nbytes, period="1y")
+if failed_tickers and set(failed_tickers) >= set(all_needed_tickers):
+    st.warning("⚠️ 行情更新失敗，全部商品沿用本地舊數據 (沒有本地數據的分頁會顯示空白)，稍後重新整理會再試")
+elif failed_tickers:
+    st.caption(f"⚠️ 部分商品下載失敗 (沿用本地舊數據或略過): {', '.join(name_map.get(t, t) for t in sorted(failed_tickers))}")
+data_key, tracked = f"{cached_data.key}|{wl.version}", tuple(all_needed_tickers)   # 下游每份快照的快取鍵都帶觀察清單版本
+ind_matrix, ind_table = build_indicator_table(cached_data, data_key, tracked) # 全市場指標一次算完
+ind_rows = get_row_index(ind_table, data_key)
+
+# ⚡ 盤中即時模式：以日K快照建立串流狀態，之後每 1/5 分鐘只做 O(1) 增量更新
+live_mode = st.sidebar.toggle("⚡ 盤中即時模式", value=False)
+live_interval = st.sidebar.selectbox("即時更新頻率", ["1m", "5m"], disabled=not live_mode)
+live_seconds = 60 if live_interval == "1m" else 300
+
+@metrics.cache_layer("live_state", st.cache_resource(show_spinner=False, max_entries=2))
+def get_live_state(_snap, snapshot_key, tickers):
+    # 同一份日K快照全站共用一個狀態；snapshot_key 換了 (TTL 到期重抓、觀察清單改了) 才重建
+    return StreamingIndicatorState.from_close_frame(tracked_close(_snap, tickers))
+
+@metrics.cache_layer("correlation", st.cache_resource(show_spinner="相關矩陣計算中...", max_entries=2))
+@timed("compute", stage="correlation")
+def get_correlation_states(_snap, snapshot_key, tickers):
+    # 每份日K快照、每個窗口建一次狀態 (含每日平均相關)；盤中模式直接在狀態上做增量更新
+    close = tracked_close(_snap, tickers)
+    return {w: RollingCorrelation.from_close_frame(close, w) for w in CORR_WINDOWS}
+
+def correlation_states():
+    return get_correlation_states(cached_data, data_key, tracked)
+
+@metrics.cache_layer("chart_series", st.cache_resource(show_spinner=False, max_entries=4))
+@timed("compute", stage="chart_series")
+def get_series_store(_snap, snapshot_key, tickers):
+    # 趨勢圖的多解析度序列與疊加指標：每份快照 (每個期間) 只算一次，之後每次重畫只切片 + 降採樣
+    return SeriesStore(tracked_close(_snap, tickers))
+
+if live_mode and not cached_data.empty:
+    live_state = get_live_state(cached_data, data_key, tracked)
+    ind_matrix = live_state.matrix()
+    with span("compute", stage="live_indicator_table"):
+        ind_table = format_indicator_table(ind_matrix, name_map)
+        ind_rows = RowIndex(ind_table)
+    st.session_state["live_seen"] = live_state.updates
+
+    @st.fragment(run_every=live_seconds)
+    def live_poll():
+        # 多個 session 共用同一狀態，poll_due 確保同一時間只有一個 session 去抓分K
+        if live_state.poll_due(live_seconds - 5):
+            try:
+                with span("external_call", target=f"{data_provider.name}.download_intraday"):
+                    frame = data_provider.download_intraday(all_needed_tickers, live_interval)
+                keys, prices = latest_bars(frame)
+                if sum(live_state.update(keys, prices)):
+                    # 有新的分K才同步增量更新相關矩陣 (與指標同一個輪詢，不在每次重畫時更新)
+                    for state, _ in correlation_states().values(): state.update_prices(keys, prices)
+            except Exception as e: st.caption(f"⚠️ 即時報價更新失敗: {e}")
+        if st.session_state.get("live_seen") != live_state.updates:
+            st.rerun(scope="app")
+        st.caption(f"⚡ 盤中即時模式：每 {live_interval} 增量更新指標 (最後輪詢 {datetime.fromtimestamp(live_state.last_poll, tw_tz).strftime('%H:%M:%S') if live_state.last_poll else '---'})")
+    live_poll()
+
+# 4. 介面分頁 (每個分頁是獨立的 st.fragment：分頁內的元件操作只重跑該分頁，不會重算整個儀表板)
+tab_ai, tab_tw, tab_risk, tab_semi, tab_rotate, tab_macro, tab_chart, tab_valuation, tab_backtest, tab_breadth, tab_corr, tab_custom = st.tabs([
+    "💀 AI資金雷達", "🇹🇼 台股戰略", "🚀 風險雷達", "💎 半導體雷達", "🔄 輪動策略", "🌐 資產配置", "📈 趨勢圖", "⚖️ 法人估值", "🧪 訊號回測", "📊 市場廣度", "🔗 相關矩陣", "🗂️ 自訂清單"
 ])
 
+def render_group_tables(groups, columns, per_row):
+    # 分組清單 (watchlists.json 的 groups) → 每組一張表，每列 per_row 張；設定檔加組不用改程式
+    items = list(groups.items())
+    for i in range(0, len(items), per_row):
+        if i: st.divider()
+        for col, (title, tickers) in zip(st.columns(per_row), items[i:i + per_row]):
+            with col:
+                st.write(f"**{title}**")
+                df = get_data_from_cache(tickers, ind_rows)
+                st.dataframe(df[[c for c in columns if c in df.columns]], hide_index=True, use_container_width=True)
+
+# --- 相對強度表 (Tab 1 / 2 / 4 共用)：同一份快照只算一次，各分頁依任一週期排序 ---
+def rs_controls(key, default_horizon=60):
+    # 週期 / 基準選單；回傳 (週期, 相對強度表)。表依快照 + 基準快取，切換週期只重新排序
+    c1, c2 = st.columns([1, 2])
+    horizon = c1.selectbox("排序週期", RS_HORIZONS, index=RS_HORIZONS.index(default_horizon), format_func=lambda h: f"{h} 日", key=f"{key}_rs_horizon")
+    bench = c2.radio("比較基準", [benchmark_ticker, RS_HOME], horizontal=True, key=f"{key}_rs_bench",
+                     format_func=lambda b: "各自本地指數 (上市 → 加權指數、上櫃 → 櫃買指數)" if b == RS_HOME else f"{name_map.get(b, b)} ({b})")
+    return horizon, build_rs_table(cached_data, data_key, tracked, bench)
+
+def rs_frame(view, horizon):
+    # 顯示用：各週期 RS + 選定週期的百分位 / 排名 / 排名變化 (▲ 進步)
+    chg = view[f"rank_chg{horizon}"]
+    return pd.DataFrame({
+        "代號": view.index, "資產名稱": [name_map.get(t, t) for t in view.index], "基準": [name_map.get(b, b) for b in view["benchmark"]],
+        **{f"RS {h}日": view[f"rs{h}"].round(3).to_numpy() for h in RS_HORIZONS},
+        f"{horizon}日漲幅(%)": (view[f"ret{horizon}"] * 100).round(2).to_numpy(),
+        "百分位": view[f"pct{horizon}"].round(0).to_numpy(), "排名": view[f"rank{horizon}"].to_numpy(),
+        "排名變化": ["—" if pd.isna(c) or c == 0 else (f"▲{int(c)}" if c > 0 else f"▼{int(-c)}") for c in chg],
+        "狀態": ["---" if pd.isna(r) else ("🔥 強" if r > 1 else "🐢 弱") for r in view[f"rs{horizon}"]],
+    })
+
+RS_COLUMNS = {"百分位": st.column_config.ProgressColumn("百分位", min_value=0, max_value=100, format="%d")}
+
+def render_rs_expander(tickers, key, title="📈 多週期相對強度 (可依任一週期排序)"):
+    with st.expander(title):
+        horizon, table = rs_controls(key)
+        view = rs_view(table, tickers, horizon) if not table.empty else table
+        if view.empty: st.warning("無數據")
+        else: st.dataframe(rs_frame(view, horizon), column_config=RS_COLUMNS, hide_index=True, use_container_width=True)
+
 # --- Tab 1: AI資金雷達 ---
-with tab_ai:
+@st.fragment
+@timed("tab_render", tab="ai")
+def render_ai_tab():
     st.subheader("💀 AI資金掃描雷達")
     st.info("💡 **核心邏輯**：當 Tech Index 與 Mag 7 巨頭「平均離差」同步小於零，代表 20 兆美元資金撤退。")
-    tech_data = []
-    total_bias = 0
-    count = 0
-    if not cached_data.empty:
-        if 'Close' in cached_data.columns: ai_source = cached_data['Close']
-        else: ai_source = cached_data
-        for t in assets_ai_risk:
-            if t in ai_source.columns:
-                series = ai_source[t].dropna()
-                if not series.empty:
-                    price = series.iloc[-1]
-                    ma20 = series.rolling(window=20).mean().iloc[-1]
-                    if ma20 == 0: ma20 = price
-                    bias = (price - ma20) / ma20 * 100
-                    total_bias += bias
-                    count += 1
-                    status = "🔴 強勢" if bias > 0 else "🟢 弱勢"
-                    tech_data.append({"名稱": name_map.get(t, t), "狀態": status, "乖離率(%)": round(bias, 2), "現價": round(price, 2)})
-            else: tech_data.append({"名稱": name_map.get(t, t), "狀態": "⚠️ N/A", "乖離率(%)": 0, "現價": 0})
-    avg_bias = total_bias / count if count > 0 else 0
+    sig = ai_average_bias(ind_matrix, assets_ai_risk)
+    tech_data = [{"名稱": name_map.get(m["ticker"], m["ticker"]), "狀態": "🔴 強勢" if m["bias"] > 0 else "🟢 弱勢", "乖離率(%)": round(m["bias"], 2), "現價": round(m["price"], 2)} for m in sig["members"]]
+    tech_data += [{"名稱": name_map.get(t, t), "狀態": "⚠️ N/A", "乖離率(%)": 0, "現價": 0} for t in sig["missing"]]
+    avg_bias, count = sig["avg_bias"], sig["count"]
     c1, c2 = st.columns([1, 2])
     with c1:
         if avg_bias < 0:
@@ -173,115 +311,97 @@ with tab_ai:
             st.success("🔴 **多頭支撐**")
             st.metric(label="AI 權值平均離差", value=f"{round(avg_bias, 2)}%", delta=round(avg_bias, 2), delta_color="normal")
         if count > 0:
-            up_count = len([x for x in tech_data if x['乖離率(%)'] > 0])
-            st.metric("多空家數 (強/弱)", f"{up_count} 強 / {count - up_count} 弱", delta_color="off")
+            st.metric("多空家數 (強/弱)", f"{sig['strong']} 強 / {sig['weak']} 弱", delta_color="off")
     with c2:
         st.dataframe(pd.DataFrame(tech_data).sort_values("乖離率(%)", ascending=False), hide_index=True, use_container_width=True)
+    render_rs_expander(assets_ai_risk, "ai")
+
+with tab_ai: render_ai_tab()
 
 # --- Tab 2: 台股戰略 ---
-with tab_tw:
+@st.fragment
+@timed("tab_render", tab="tw")
+def render_tw_tab():
     st.subheader("🇹🇼 台股四大領先指標")
     if not cached_data.empty:
-        df_tw = get_data_from_cache(assets_tw_strategy, cached_data)
-        if not df_tw.empty:
+        tw = tw_four_lights(ind_matrix)
+        if any(tw["lights"].values()):
             c1, c2, c3, c4 = st.columns(4)
-            score_tw = 0 
-            def get_metric(df, ticker):
-                row = df[df['代號'] == ticker]
-                return row.iloc[0] if not row.empty else None
+            lights = tw["lights"]
             with c1:
-                r = get_metric(df_tw, 'SOXX')
+                r = lights["semiconductor"]
                 if r is not None:
-                    good = r['乖離率'] > 0
-                    if good: score_tw += 1
-                    st.metric("1. 半導體 (SOXX)", f"{r['現價']}", f"{round(r['乖離率'], 2)}%", delta_color="normal" if good else "inverse")
+                    st.metric("1. 半導體 (SOXX)", f"{round(r['price'], 2)}", f"{round(r['bias'], 2)}%", delta_color="normal" if r["on"] else "inverse")
             with c2:
-                r = get_metric(df_tw, '^TWOII')
-                name = "2. 內資 (櫃買)"
-                if r is None: r = get_metric(df_tw, '00733.TW'); name = "2. 內資 (富邦中小)"
+                r = lights["domestic"]
                 if r is not None:
-                    good = r['乖離率'] > 0
-                    if good: score_tw += 1
-                    st.metric(name, f"{r['現價']}", f"{round(r['乖離率'], 2)}%", delta_color="normal" if good else "inverse")
+                    name = "2. 內資 (櫃買)" if r["ticker"] == "^TWOII" else "2. 內資 (富邦中小)"
+                    st.metric(name, f"{round(r['price'], 2)}", f"{round(r['bias'], 2)}%", delta_color="normal" if r["on"] else "inverse")
                 else: st.metric("2. 內資", "無數據")
             with c3:
-                r = get_metric(df_tw, 'DX-Y.NYB')
+                r = lights["usd"]
                 if r is not None:
-                    good = r['乖離率'] < 0
-                    if good: score_tw += 1
-                    st.metric("3. 美元 (源頭)", f"{r['現價']}", f"{round(r['乖離率'], 2)}%", delta_color="inverse")
+                    st.metric("3. 美元 (源頭)", f"{round(r['price'], 2)}", f"{round(r['bias'], 2)}%", delta_color="inverse")
             with c4:
-                r = get_metric(df_tw, '^TNX')
+                r = lights["rates"]
                 if r is not None:
-                    good = r['乖離率'] < 0
-                    if good: score_tw += 1
-                    st.metric("4. 美債 (利率)", f"{r['現價']}%", f"{round(r['乖離率'], 2)}%", delta_color="inverse")
+                    st.metric("4. 美債 (利率)", f"{round(r['price'], 2)}%", f"{round(r['bias'], 2)}%", delta_color="inverse")
             st.divider()
+            score_tw = tw["score"]
             if score_tw == 4: st.error("### 🚀 火力全開 (4燈全紅)")
             elif score_tw == 3: st.warning("### 🌤️ 偏多操作 (3燈)")
             elif score_tw == 2: st.info("### ☁️ 多空拉鋸 (2燈)")
             else: st.success("### 🌧️ 保守防禦 (0-1燈)")
             st.divider()
             st.subheader("👑 千金股信心溫度計")
-            df_high_raw = get_data_from_cache(assets_high_price, cached_data)
-            if not df_high_raw.empty:
-                club_members = df_high_raw[df_high_raw['現價'] >= 1000].copy()
-                club_count = len(club_members)
-                if club_count > 0:
-                    strong_members = club_members[club_members['乖離率'] > 0]
-                    strong_count = len(strong_members)
-                    weak_count = club_count - strong_count
-                    strong_pct = strong_count / club_count
-                    avg_club_bias = club_members['乖離率'].mean()
-                    king = club_members.loc[club_members['現價'].idxmax()]
+            if not ind_table.empty:
+                club = high_price_thermometer(ind_matrix, assets_high_price)
+                if club["club_count"] > 0:
+                    club_members = get_data_from_cache([m["ticker"] for m in club["members"]], ind_rows)
                     h1, h2, h3, h4 = st.columns(4)
-                    with h1: st.metric("🏆 股王", f"{king['資產名稱']}", f"${int(king['現價'])}")
-                    with h2: st.metric("💰 千金股家數", f"{club_count} 檔")
-                    with h3: st.metric("📊 多空結構 (強/弱)", f"{strong_count} 強 / {weak_count} 弱", f"佔比 {int(strong_pct*100)}%", delta_color="off")
+                    with h1: st.metric("🏆 股王", f"{name_map.get(club['king']['ticker'], club['king']['ticker'])}", f"${int(club['king']['price'])}")
+                    with h2: st.metric("💰 千金股家數", f"{club['club_count']} 檔")
+                    with h3: st.metric("📊 多空結構 (強/弱)", f"{club['strong']} 強 / {club['weak']} 弱", f"佔比 {int(club['strong_pct']*100)}%", delta_color="off")
                     with h4:
+                        avg_club_bias = club["avg_bias"]
                         if avg_club_bias > 0: st.metric("🔥 族群火力 (平均乖離)", f"+{round(avg_club_bias, 2)}%", "多方控盤", delta_color="normal")
                         else: st.metric("❄️ 族群火力 (平均乖離)", f"{round(avg_club_bias, 2)}%", "信心潰散", delta_color="inverse")
                     st.dataframe(club_members[["資產名稱", "現價", "乖離率", "趨勢 (月線)"]].sort_values("乖離率", ascending=False), hide_index=True, use_container_width=True)
+                    render_rs_expander([m["ticker"] for m in club["members"]], "club")
                 else: st.warning("⚠️ 目前沒有股價大於 1000 元的股票")
             else: st.write("數據讀取中...")
     else: st.error("數據下載失敗")
 
+with tab_tw: render_tw_tab()
+
 # --- Tab 3: 風險雷達 (流動性專區) ---
-with tab_risk:
+@st.fragment
+@timed("tab_render", tab="risk")
+def render_risk_tab():
     st.subheader("🚀 市場風險雷達")
     st.markdown("##### 🌊 流動性劇本監控 (Carry Trade & 資金成本)")
     
     try:
-        if 'Close' in cached_data.columns: risk_data = cached_data['Close']
-        else: risk_data = cached_data
-        
         # 1. USD/JPY 日圓套利指標 (關鍵!)
         jpy_status = "N/A"
         jpy_price = 0
         jpy_ma60 = 0
-        if 'JPY=X' in risk_data.columns:
-            jpy_series = risk_data['JPY=X'].dropna()
-            if len(jpy_series) > 60:
-                jpy_price = jpy_series.iloc[-1]
-                jpy_ma60 = jpy_series.rolling(window=60).mean().iloc[-1]
-                # 邏輯：價格跌破季線(60MA) = 日圓升值 = 套利平倉 = 危險(綠燈)
-                # 價格在季線之上 = 日圓貶值 = 套利持續 = 安全(紅燈)
-                if jpy_price < jpy_ma60:
-                    jpy_status = "🟢 警戒 (日圓升值中)"
-                    jpy_color = "inverse" # 綠色
-                else:
-                    jpy_status = "🔴 安全 (套利持續)"
-                    jpy_color = "normal" # 紅色
+        carry = carry_trade_status(ind_matrix)
+        if carry is not None:
+            jpy_price, jpy_ma60 = carry["price"], carry["ma60"]
+            # 邏輯：價格跌破季線(60MA) = 日圓升值 = 套利平倉 = 危險(綠燈)
+            # 價格在季線之上 = 日圓貶值 = 套利持續 = 安全(紅燈)
+            if carry["warning"]:
+                jpy_status = "🟢 警戒 (日圓升值中)"
+                jpy_color = "inverse" # 綠色
+            else:
+                jpy_status = "🔴 安全 (套利持續)"
+                jpy_color = "normal" # 紅色
         
         # 2. 短端資金成本 (ZQ=F)
-        rate_val = None
-        if 'ZQ=F' in risk_data.columns and not risk_data['ZQ=F'].dropna().empty:
-            future_price = risk_data['ZQ=F'].dropna().iloc[-1]
-            rate_val = round(100 - future_price, 2)
-            source_desc = "由 ZQ=F 反推 (100-價格)"
-        elif '^IRX' in risk_data.columns and not risk_data['^IRX'].dropna().empty:
-            rate_val = round(risk_data['^IRX'].dropna().iloc[-1], 2)
-            source_desc = "代號: ^IRX"
+        rate = short_rate(ind_matrix)
+        rate_val = rate["rate"] if rate else None
+        if rate: source_desc = "由 ZQ=F 反推 (100-價格)" if rate["source"] == "ZQ=F" else "代號: ^IRX"
             
         c1, c2 = st.columns(2)
         with c1:
@@ -292,7 +412,7 @@ with tab_risk:
         with c2:
             if rate_val is not None:
                 st.metric("2. 短端資金成本 (SRF 替代)", f"{rate_val}%", source_desc, delta_color="off")
-                if rate_val > 5.2: st.success("🟢 **資金緊俏**：利率過高，留意系統風險。") # 壞事綠色
+                if rate["tight"]: st.success("🟢 **資金緊俏**：利率過高，留意系統風險。") # 壞事綠色
                 else: st.error("🔴 **資金穩定**：利率處於合理區間。") # 好事紅色
             else:
                 st.metric("2. 短端資金成本", "N/A")
@@ -303,150 +423,150 @@ with tab_risk:
     st.divider()
 
     # 市場廣度 & 信用風險
-    if 'RSP' in risk_data.columns and 'SPY' in risk_data.columns:
-        rsp_series = risk_data['RSP'].dropna()
-        spy_series = risk_data['SPY'].dropna()
-        if not rsp_series.empty and not spy_series.empty:
-            rsp_ret = (rsp_series.iloc[-1] - rsp_series.iloc[-20]) / rsp_series.iloc[-20]
-            spy_ret = (spy_series.iloc[-1] - spy_series.iloc[-20]) / spy_series.iloc[-20]
-            b_msg = "🔴 廣度佳" if rsp_ret > spy_ret else "🟢 廣度差"
-            b_desc = f"RSP({round(rsp_ret*100,2)}%) vs SPY({round(spy_ret*100,2)}%)"
-        else: b_msg, b_desc = "---", "數據不足"
-    else: b_msg, b_desc = "---", "無數據"
-
-    if 'HYG' in risk_data.columns and 'LQD' in risk_data.columns:
-        hyg_series = risk_data['HYG'].dropna()
-        lqd_series = risk_data['LQD'].dropna()
-        if not hyg_series.empty and not lqd_series.empty:
-            hyg_ret = (hyg_series.iloc[-1] - hyg_series.iloc[-20]) / hyg_series.iloc[-20]
-            lqd_ret = (lqd_series.iloc[-1] - lqd_series.iloc[-20]) / lqd_series.iloc[-20]
-            c_msg = "🔴 追逐風險" if hyg_ret > lqd_ret else "🟢 趨避風險"
-            c_desc = f"HYG({round(hyg_ret*100,2)}%) vs LQD({round(lqd_ret*100,2)}%)"
-        else: c_msg, c_desc = "---", "數據不足"
-    else: c_msg, c_desc = "---", "無數據"
+    bc = breadth_and_credit(ind_matrix)
+    pr = bc["breadth"]
+    if pr and not pr.get("insufficient"):
+        b_msg = "🔴 廣度佳" if pr["a_wins"] else "🟢 廣度差"
+        b_desc = f"RSP({round(pr['a_ret']*100,2)}%) vs SPY({round(pr['b_ret']*100,2)}%)"
+    else: b_msg, b_desc = "---", ("無數據" if pr is None else "數據不足")
+
+    pr = bc["credit"]
+    if pr and not pr.get("insufficient"):
+        c_msg = "🔴 追逐風險" if pr["a_wins"] else "🟢 趨避風險"
+        c_desc = f"HYG({round(pr['a_ret']*100,2)}%) vs LQD({round(pr['b_ret']*100,2)}%)"
+    else: c_msg, c_desc = "---", ("無數據" if pr is None else "數據不足")
 
     cb1, cb2 = st.columns(2)
     with cb1: st.info(f"📊 **市場廣度**：**{b_msg}**\n\n{b_desc}")
     with cb2: st.info(f"🦁 **信用風險**：**{c_msg}**\n\n{c_desc}")
 
-    c1, c2, c3 = st.columns(3)
-    with c1: st.write("**1. 領先指標**"); st.dataframe(get_data_from_cache(assets_radar["1. 🚀 領先指標"], cached_data)[["資產名稱", "趨勢 (月線)", "RSI訊號"]], hide_index=True, use_container_width=True)
-    with c2: st.write("**2. 避險資產**"); st.dataframe(get_data_from_cache(assets_radar["2. 🛡️ 避險資產"], cached_data)[["資產名稱", "趨勢 (月線)", "RSI訊號"]], hide_index=True, use_container_width=True)
-    with c3: st.write("**3. 股市現況**"); st.dataframe(get_data_from_cache(assets_radar["3. 📉 股市現況"], cached_data)[["資產名稱", "趨勢 (月線)", "RSI訊號"]], hide_index=True, use_container_width=True)
+    render_group_tables(assets_radar, ["資產名稱", "趨勢 (月線)", "RSI訊號"], per_row=3)
+
+with tab_risk: render_risk_tab()
 
 # --- Tab 4: 半導體雷達 ---
-with tab_semi:
+@st.fragment
+@timed("tab_render", tab="semi")
+def render_semi_tab():
     st.subheader("💎 半導體相對強度雷達")
-    st.markdown(f"邏輯：**半導體漲幅 / 標普500 ({benchmark_ticker}) 漲幅**")
-    if 'Close' in cached_data.columns: data = cached_data['Close']
-    else: data = cached_data
-    if benchmark_ticker in data.columns:
-        bench = data[benchmark_ticker].dropna()
-        if not bench.empty and len(bench) > 60:
-            bench_ret = (bench.iloc[-1] - bench.iloc[-60]) / bench.iloc[-60]
-            res = []
-            for t in assets_semi_tickers:
-                if t in data.columns:
-                    tgt = data[t].dropna()
-                    if not tgt.empty and len(tgt) > 60:
-                        tgt_ret = (tgt.iloc[-1] - tgt.iloc[-60]) / tgt.iloc[-60]
-                        rs = (1 + tgt_ret) / (1 + bench_ret)
-                        status = "🔥 強" if rs > 1 else "🐢 弱"
-                        clr = "background-color: rgba(255, 50, 50, 0.2)" if rs > 1 else "background-color: rgba(50, 255, 50, 0.2)"
-                        res.append({"代號": t, "資產名稱": name_map.get(t,t), "強度 (RS)": round(rs,4), "漲幅": f"{round(tgt_ret*100, 2)}%", "狀態": status, "_c": clr})
-            if res:
-                df_s = pd.DataFrame(res).sort_values("強度 (RS)", ascending=False)
-                sox_row = df_s[df_s['代號'] == 'SOXX']
-                if not sox_row.empty:
-                    s_rs = sox_row['強度 (RS)'].values[0]
-                    st.metric("費半ETF (SOXX) 強度", s_rs, "🚀 跑贏" if s_rs > 1 else "⚠️ 跑輸")
-                st.dataframe(df_s.style.apply(lambda x: [x['_c']]*len(x), axis=1), column_config={"_c":None}, hide_index=True, use_container_width=True)
-            else: st.warning("無數據")
-        else: st.error("基準數據不足")
-    else: st.error("基準數據缺失")
+    st.markdown("邏輯：**(1 + 半導體漲幅) / (1 + 基準漲幅)**，> 1 代表跑贏基準")
+    if cached_data.empty:
+        st.error("基準數據缺失")
+        return
+    horizon, table = rs_controls("semi")
+    view = rs_view(table, assets_semi_tickers, horizon) if not table.empty else table
+    if view.empty or view[f"rs{horizon}"].isna().all():
+        st.error("基準數據不足")
+        return
+    if "SOXX" in view.index and pd.notna(view.loc["SOXX", f"rs{horizon}"]):
+        s_rs = round(view.loc["SOXX", f"rs{horizon}"], 4)
+        st.metric(f"費半ETF (SOXX) {horizon}日強度", s_rs, "🚀 跑贏" if s_rs > 1 else "⚠️ 跑輸")
+    df_s = rs_frame(view, horizon)
+    df_s["_c"] = ["background-color: rgba(255, 50, 50, 0.2)" if r > 1 else "background-color: rgba(50, 255, 50, 0.2)" for r in view[f"rs{horizon}"]]
+    with span("render", tab="semi", part="styled_dataframe"):
+        st.dataframe(df_s.style.apply(lambda x: [x['_c']]*len(x), axis=1), column_config={"_c": None, **RS_COLUMNS}, hide_index=True, use_container_width=True)
+
+with tab_semi: render_semi_tab()
 
 # --- Tab 5: 輪動策略 ---
-with tab_rotate:
+@st.fragment
+@timed("tab_render", tab="rotate")
+def render_rotate_tab():
     st.subheader("🔄 七大資產輪動策略")
-    df_rot = get_data_from_cache(assets_rotation, cached_data)
+    df_rot = get_data_from_cache(assets_rotation, ind_rows)
     if not df_rot.empty:
-        qqq = df_rot[df_rot['代號'] == 'QQQ']
-        if not qqq.empty:
-            sc = qqq['宏觀分數'].values[0]
-            if sc >= 60: st.error(f"### 🐂 牛市攻擊 (分數:{sc})\n建議持有 **科技股**")
+        rot = rotation_scores(ind_matrix, assets_rotation)
+        if rot["leader_score"] is not None:
+            sc = rot["leader_score"]
+            if rot["bull"]: st.error(f"### 🐂 牛市攻擊 (分數:{sc})\n建議持有 **科技股**")
             else: st.success(f"### 🐻 熊市避險 (分數:{sc})\n建議分散至 **債、匯、金**")
         st.dataframe(df_rot[["代號", "資產名稱", "宏觀分數"]].sort_values("宏觀分數", ascending=False), hide_index=True, use_container_width=True)
 
+with tab_rotate: render_rotate_tab()
+
 # --- Tab 6: 宏觀配置 ---
-with tab_macro:
+@st.fragment
+@timed("tab_render", tab="macro")
+def render_macro_tab():
     st.subheader("中長期資產配置")
-    c1, c2 = st.columns(2)
-    with c1: st.dataframe(get_data_from_cache(assets_macro["1. 🔥 強勢動能觀察"], cached_data)[["資產名稱", "季動能 (3個月)"]], hide_index=True, use_container_width=True)
-    with c2: st.dataframe(get_data_from_cache(assets_macro["2. ❄️ 弱勢動能觀察"], cached_data)[["資產名稱", "季動能 (3個月)"]], hide_index=True, use_container_width=True)
-    st.divider()
-    c3, c4 = st.columns(2)
-    with c3: st.dataframe(get_data_from_cache(assets_macro["3. 🌏 核心市場"], cached_data)[["資產名稱", "季動能 (3個月)"]], hide_index=True, use_container_width=True)
-    with c4: st.dataframe(get_data_from_cache(assets_macro["4. 🏦 利率與債券"], cached_data)[["資產名稱", "季動能 (3個月)"]], hide_index=True, use_container_width=True)
+    render_group_tables(assets_macro, ["資產名稱", "季動能 (3個月)"], per_row=2)
+
+with tab_macro: render_macro_tab()
 
 # --- Tab 7: 趨勢圖 ---
-with tab_chart:
+@st.fragment
+@timed("tab_render", tab="chart")
+def render_chart_tab():
     st.subheader("📈 資產趨勢檢視")
     all_keys = list(set(all_needed_tickers))
     opts = [f"{name_map.get(k, k)} ({k})" for k in all_keys]
     sel = st.selectbox("選擇商品：", opts)
-    if sel:
-        code = sel.split("(")[-1].replace(")", "")
-        if 'Close' in cached_data.columns:
-            if code in cached_data['Close'].columns:
-                st.line_chart(cached_data['Close'][code].dropna())
-            else: st.write("無數據")
-        else: st.write("數據格式錯誤")
+    if not sel: return
+    code = sel.split("(")[-1].replace(")", "")
+    c1, c2, c3, c4 = st.columns(4)
+    period = c1.selectbox("期間", ["1y", "2y", "5y", "10y"], key="chart_period")
+    res_opt = c2.selectbox("K 線", ["自動", *RESOLUTIONS], key="chart_res")
+    default_bench = "^TWII" if code.endswith((".TW", ".TWO")) else "^GSPC"
+    bench_opts = ["不比較", "^GSPC", "^TWII", "QQQ", "^SOX"]
+    bench = c3.selectbox("比較基準", bench_opts, index=bench_opts.index(default_bench), key="chart_bench",
+                         format_func=lambda t: name_map.get(t, t))
+    overlays = c4.multiselect("疊加", ["MA20", "MA60", "RSI"], default=["MA20", "MA60"], key="chart_overlays")
+    data = cached_data if period == "1y" else fetch_data_cached(all_needed_tickers, period=period)[0]
+    if 'Close' not in data:
+        st.write("數據格式錯誤")
+        return
+    store = get_series_store(data, f"{period}|{data.key}|{wl.version}", tracked)
+    daily = store.frame(code)
+    if daily.empty:
+        st.write("無數據")
+        return
+    # 縮放：伺服器端依區間重新取點 (區間越短越細)，圖上拖曳 / 滾輪只在已送出的點內縮放
+    first, last = daily.index[0].date(), daily.index[-1].date()
+    start, end = st.slider("區間", min_value=first, max_value=last, value=(first, last), format="YYYY-MM-DD",
+                           key=f"chart_range_{code}_{period}") if first < last else (first, last)
+    with span("compute", stage="chart_window"):
+        view, res = store.window(code, pd.Timestamp(start), pd.Timestamp(end), None if res_opt == "自動" else res_opt,
+                                 MAX_POINTS, None if bench == "不比較" else bench)
+    total = len(store.frame(code, res).loc[pd.Timestamp(start):pd.Timestamp(end)])
+    st.caption(f"{res}K · 顯示 {len(view)} / {total} 點 (上限 {MAX_POINTS})")
+    lines = ["price"] + [c.lower() for c in overlays if c != "RSI"]
+    plot = view.reset_index().rename(columns={view.index.name or "index": "Date"})
+    price = alt.Chart(plot).transform_fold(lines, as_=["線", "值"]).mark_line().encode(
+        x=alt.X("Date:T", title=None), y=alt.Y("值:Q", scale=alt.Scale(zero=False), title=name_map.get(code, code)),
+        color=alt.Color("線:N", scale=alt.Scale(domain=lines), legend=alt.Legend(orient="top", title=None)),
+        strokeDash=alt.condition("datum['線'] == 'price'", alt.value([1, 0]), alt.value([4, 3])),
+        tooltip=[alt.Tooltip("Date:T"), "線:N", alt.Tooltip("值:Q", format=",.2f")]).properties(height=320)
+    charts = [price.interactive(bind_y=False)]
+    if "RSI" in overlays:
+        rsi = alt.Chart(plot).mark_line(color="#9467bd").encode(x=alt.X("Date:T", title=None), y=alt.Y("rsi:Q", scale=alt.Scale(domain=[0, 100]), title="RSI"))
+        bands = alt.Chart(pd.DataFrame({"y": [30, 70]})).mark_rule(strokeDash=[2, 2], color="gray").encode(y="y:Q")
+        charts.append((rsi + bands).properties(height=110))
+    if "relative" in view.columns:
+        rel = alt.Chart(plot).mark_line(color="#d62728").encode(x=alt.X("Date:T", title=None),
+                                                                y=alt.Y("relative:Q", scale=alt.Scale(zero=False), title=f"相對 {name_map.get(bench, bench)}"))
+        base = alt.Chart(pd.DataFrame({"y": [100]})).mark_rule(strokeDash=[2, 2], color="gray").encode(y="y:Q")
+        charts.append((rel + base).properties(height=130))
+    st.altair_chart(alt.vconcat(*charts).resolve_scale(x="shared"), use_container_width=True)
+
+with tab_chart: render_chart_tab()
 
 # --- Tab 8: 法人估值模型 ---
-with tab_valuation:
+@st.fragment
+@timed("tab_render", tab="valuation")
+def render_valuation_tab():
     st.subheader("⚖️ 法人機構估值模型")
     st.caption("這不是預測股價，這是計算公司的「合理價格」。請輸入代號 (如 NVDA, 2330.TW)")
     col_input, col_info = st.columns([1, 3])
     with col_input: val_ticker = st.text_input("輸入股票代號", value="2330.TW").upper()
     
-    def get_smart_growth_rate(stock_info, stock_obj):
-        rates = {}
-        analyst_growth = stock_info.get('earningsGrowth', None)
-        if analyst_growth: rates['分析師預估'] = analyst_growth
-        roe = stock_info.get('returnOnEquity', None)
-        payout = stock_info.get('payoutRatio', 0)
-        if roe:
-            sgr = roe * (1 - (payout if payout else 0))
-            rates['SGR模型(內在驅動)'] = sgr
-        try:
-            financials = stock_obj.financials
-            if not financials.empty and 'Total Revenue' in financials.index:
-                revenues = financials.loc['Total Revenue']
-                if len(revenues) >= 3:
-                    cagr = (revenues.iloc[0] / revenues.iloc[2]) ** (1/3) - 1
-                    rates['歷史3年CAGR'] = cagr
-        except: pass
-        suggested_rate = 0.15
-        source_msg = "無數據，使用預設值"
-        if '分析師預估' in rates:
-            suggested_rate = rates['分析師預估']
-            source_msg = "依據：分析師預期 (Analyst)"
-        elif 'SGR模型(內在驅動)' in rates:
-            suggested_rate = rates['SGR模型(內在驅動)']
-            source_msg = "依據：SGR 模型 (ROE推算)"
-        elif '歷史3年CAGR' in rates:
-            suggested_rate = rates['歷史3年CAGR']
-            source_msg = "依據：過去營收慣性 (CAGR)"
-        return suggested_rate * 100, rates, source_msg
-
     if val_ticker:
         try:
-            stock = yf.Ticker(val_ticker)
-            info = stock.info
+            fund = fundamentals_cache.get(val_ticker)
+            info = fund["info"]
             current_price = info.get('currentPrice', 0)
             eps_ttm = info.get('trailingEps', 0)
             pe_ratio = info.get('trailingPE', 0)
-            smart_growth, growth_details, growth_source = get_smart_growth_rate(info, stock)
+            smart_growth, growth_details, growth_source = get_smart_growth_rate(info, fund["financials"])
             raw_peg = info.get('pegRatio', 0)
             if (raw_peg is None or raw_peg == 0) and pe_ratio:
                 peg_display = round(pe_ratio / smart_growth, 2)
@@ -505,18 +625,228 @@ with tab_valuation:
                 g_rate_term = d3.number_input("永續成長率 (%)", value=3.0) / 100
                 discount_rate = st.slider("折現率 (WACC) %", 5.0, 20.0, 10.0) / 100
             if base_eps > 0:
-                future_values = []
-                for i in range(1, 6):
-                    future_values.append(base_eps * ((1 + g_rate_5y) ** i) / ((1 + discount_rate) ** i))
-                terminal_val = (base_eps * ((1 + g_rate_5y) ** 5) * (1 + g_rate_term)) / (discount_rate - g_rate_term)
-                terminal_discounted = terminal_val / ((1 + discount_rate) ** 5)
-                intrinsic_value = sum(future_values) + terminal_discounted
+                intrinsic_value = float(dcf_intrinsic_value(base_eps, g_rate_5y, g_rate_term, discount_rate))
                 dcf_upside = (intrinsic_value - current_price) / current_price * 100
                 final_col1, final_col2 = st.columns(2)
                 with final_col1: st.metric("DCF 內在價值", f"${round(intrinsic_value, 2)}")
                 with final_col2:
                     if intrinsic_value > current_price: st.metric("潛在報酬", f"+{round(dcf_upside, 2)}%", "🟢 低估", delta_color="normal")
                     else: st.metric("潛在報酬", f"{round(dcf_upside, 2)}%", "🔴 高估", delta_color="inverse")
+                st.markdown("#### 🎲 敏感度矩陣與蒙地卡羅情境")
+                st.caption("不再手動來回拉桿：左圖一次列出 WACC × 永續成長率 的所有組合；右側以成長率 (分析師/SGR/CAGR 的分歧度)、WACC、永續成長率隨機抽樣 10 萬組情境。")
+                h1, h2 = st.columns([3, 2])
+                with h1:
+                    grid = dcf_sensitivity_grid(base_eps, g_rate_5y, np.arange(0.05, 0.2001, 0.01), np.arange(0.0, 0.0501, 0.005))
+                    heat = grid.stack(future_stack=True).rename("內在價值").dropna().reset_index()
+                    st.altair_chart(alt.Chart(heat).mark_rect().encode(
+                        x="永續成長率(%):O", y=alt.Y("WACC(%):O", sort="descending"),
+                        color=alt.Color("內在價值:Q", scale=alt.Scale(scheme="redyellowgreen", domainMid=current_price)),
+                        tooltip=["WACC(%)", "永續成長率(%)", alt.Tooltip("內在價值:Q", format=",.2f")]), use_container_width=True)
+                with h2:
+                    mc = dcf_monte_carlo(base_eps, g_rate_5y, g_rate_term, discount_rate, list(growth_details.values()))
+                    pct = mc["percentiles"]
+                    win_rate = (mc["values"] > current_price).mean() * 100
+                    p1, p2, p3 = st.columns(3)
+                    p1.metric("悲觀 P5", f"${round(pct[5], 2)}")
+                    p2.metric("中位數 P50", f"${round(pct[50], 2)}")
+                    p3.metric("樂觀 P95", f"${round(pct[95], 2)}")
+                    st.metric("情境中高於現價的機率", f"{round(win_rate, 1)}%", f"成長率標準差 {round(mc['growth_sd'] * 100, 2)}%", delta_color="off")
+                    lo, hi = np.percentile(mc["values"], [1, 99])
+                    counts, edges = np.histogram(mc["values"], bins=40, range=(lo, hi))
+                    st.bar_chart(pd.Series(counts, index=np.round(edges[:-1], 1), name="情境數"))
             else: st.error("虧損公司不適用 DCF")
         except Exception as e: st.error(f"無法取得數據: {e}")
-            
+    st.divider()
+    render_valuation_screener()
+
+@st.fragment
+@timed("tab_render", tab="valuation_screener")
+def render_valuation_screener():
+    st.markdown("### 4. 全清單估值快篩 (PEG / Graham / DCF)")
+    st.caption("同一套模型一次跑完千金股、AI 權值與半導體清單；三個模型各投一票 (便宜 +1 / 昂貴 -1)，點欄位標題即可排序。")
+    s1, s2 = st.columns(2)
+    scr_wacc = s1.slider("快篩折現率 (WACC) %", 5.0, 20.0, 10.0, key="scr_wacc") / 100
+    scr_term = s2.slider("快篩永續成長率 (%)", 0.0, 5.0, 3.0, key="scr_term") / 100
+    universe = [t for t in dict.fromkeys(assets_high_price + assets_ai_risk + assets_semi_tickers) if not t.startswith("^")]
+    df_val = screen_valuations(fundamentals_cache.get_many(universe), scr_wacc, scr_term, names=name_map)
+    if df_val.empty: st.warning("基本面數據讀取中或無法取得")
+    else:
+        v1, v2, v3 = st.columns(3)
+        v1.metric("🟢 低估", f"{(df_val['評等'] == '🟢 低估').sum()} 檔")
+        v2.metric("🟡 合理", f"{(df_val['評等'] == '🟡 合理').sum()} 檔")
+        v3.metric("🔴 高估", f"{(df_val['評等'] == '🔴 高估').sum()} 檔")
+        st.dataframe(df_val, hide_index=True, use_container_width=True)
+
+with tab_valuation: render_valuation_tab()
+
+# --- Tab 9: 訊號回測 ---
+@st.fragment
+@timed("tab_render", tab="backtest")
+def render_backtest_tab():
+    st.subheader("🧪 訊號歷史回測")
+    st.info("💡 把各分頁的判讀規則套用到每一個歷史交易日：看多狀態持有驗證標的、其餘空手 (收盤出訊號、隔日進場)。")
+    period = st.selectbox("回測期間", ["1y", "2y", "5y", "10y"], index=2, key="bt_period")
+    data = cached_data if period == "1y" else fetch_data_cached(all_needed_tickers, period=period)[0]
+    results = build_backtest(data, f"{period}|{data.key}|{wl.version}", tracked, tuple(assets_ai_risk))
+    if not results:
+        st.error("數據不足，無法回測")
+        return
+    summary = pd.DataFrame({RULE_NAMES.get(k, k): dict(v["summary"], 驗證標的=name_map.get(v["target"], v["target"])) for k, v in results.items()}).T
+    st.dataframe(summary, use_container_width=True)
+    rule = st.selectbox("規則明細", list(results), format_func=lambda k: RULE_NAMES.get(k, k), key="bt_rule")
+    res = results[rule]
+    st.markdown(f"**各狀態之後的報酬與命中率** (驗證標的：{name_map.get(res['target'], res['target'])})")
+    st.dataframe(res["by_state"].round(2), hide_index=True, use_container_width=True)
+    st.markdown("**淨值曲線**")
+    st.line_chart(res["equity"])
+
+with tab_backtest: render_backtest_tab()
+
+# --- Tab 10: 全市場廣度 ---
+@st.fragment
+@timed("tab_render", tab="breadth")
+def render_breadth_tab():
+    st.subheader("📊 全市場廣度")
+    universe_path = os.environ.get("MARKET_UNIVERSE", UNIVERSE_PATH)
+    mtime = os.path.getmtime(universe_path) if os.path.exists(universe_path) else None
+    if mtime is None: st.caption(f"ℹ️ 找不到清單檔 {universe_path} (欄位 ticker,name,market)，暫以觀察清單中的個股代替")
+    if st.button("🔄 更新全市場數據 (首次約需數分鐘)", key="breadth_refresh"):
+        universe = load_universe(universe_path)
+        with st.spinner(f"下載 {len(universe)} 檔日K..."):
+            failed = PriceStore().refresh(list(universe.index), lambda batch, start: download_concurrent(data_provider, batch, start), period=BREADTH_PERIOD)
+        build_breadth.clear()
+        if failed: st.caption(f"⚠️ {len(failed)} 檔下載失敗：{', '.join(failed[:20])}{' ...' if len(failed) > 20 else ''}")
+    universe, res = build_breadth(universe_path, mtime)
+    latest = res["latest"]
+    if latest.empty:
+        st.warning(f"價格庫中還沒有清單內 {len(universe)} 檔的數據，請先按上方按鈕更新")
+        return
+    markets = st.multiselect("市場", list(res["daily"]), default=list(res["daily"]), format_func=lambda m: MARKETS.get(m, m), key="breadth_markets")
+    lines = breadth_lines(combine_markets(res["daily"], markets))
+    if lines.empty:
+        st.info("請至少選擇一個市場")
+        return
+    last = lines.iloc[-1]
+    b1, b2, b3, b4, b5 = st.columns(5)
+    b1.metric("站上 MA20", f"{last['站上MA20(%)']:.1f}%", f"{last['站上MA20(%)'] - lines['站上MA20(%)'].iloc[-2]:.1f}" if len(lines) > 1 else None)
+    b2.metric("站上 MA60", f"{last['站上MA60(%)']:.1f}%")
+    b3.metric("站上 MA200", f"{last['站上MA200(%)']:.1f}%" if pd.notna(last['站上MA200(%)']) else "數據不足")
+    b4.metric("上漲 / 下跌", f"{int(last['上漲家數'])} / {int(last['下跌家數'])}")
+    b5.metric("52週新高 / 新低", f"{int(last['創新高'])} / {int(last['創新低'])}")
+    c1, c2 = st.columns(2)
+    with c1: st.markdown("**站上均線比例 (%)**"); st.line_chart(lines[["站上MA20(%)", "站上MA60(%)", "站上MA200(%)"]].dropna(how="all"))
+    with c2: st.markdown("**騰落線**"); st.line_chart(lines["騰落線"])
+    st.markdown("**依市場彙總**")
+    st.dataframe(aggregate_by_market(latest[latest["market"].isin(markets)]), use_container_width=True)
+
+    st.divider()
+    club = thousand_club(latest)
+    st.markdown(f"**👑 全市場千金股：{club['club_count']} 檔**")
+    if club["club_count"] > 0:
+        k1, k2, k3 = st.columns(3)
+        k1.metric("🏆 股王", f"{universe['name'].get(club['king']['ticker'], club['king']['ticker'])}", f"${int(club['king']['price'])}")
+        k2.metric("📊 多空結構 (強/弱)", f"{club['strong']} 強 / {club['weak']} 弱", f"佔比 {int(club['strong_pct']*100)}%", delta_color="off")
+        k3.metric("🔥 平均乖離", f"{round(club['avg_bias'], 2)}%")
+
+    st.divider()
+    st.markdown("**個股明細**")
+    f1, f2, f3 = st.columns([2, 1, 1])
+    only_club = f1.checkbox("只看千金股", key="breadth_club")
+    sort_by = f2.selectbox("排序", ["乖離率", "現價", "宏觀分數"], key="breadth_sort")
+    page_size = f3.selectbox("每頁", [50, 100, 200], key="breadth_page_size")
+    view = latest[latest["market"].isin(markets)]
+    if only_club: view = view.loc[[m["ticker"] for m in club["members"]]]
+    view = pd.DataFrame({
+        "代號": view.index, "名稱": view["name"].values, "市場": view["market"].map(MARKETS).values,
+        "現價": view["price"].round(2).values, "乖離率": view["bias"].round(2).values, "宏觀分數": view["score"].values,
+        "MA60": view["ma60"].round(2).values, "MA200": view["ma200"].round(2).values,
+        "距52週高(%)": ((view["price"] / view["high52"] - 1) * 100).round(2).values,
+    }).sort_values(sort_by, ascending=False, na_position="last")
+    pages = max(1, -(-len(view) // page_size))
+    page = st.number_input(f"頁次 (共 {pages} 頁、{len(view)} 檔)", min_value=1, max_value=pages, value=1, key="breadth_page")
+    st.dataframe(view.iloc[(page - 1) * page_size: page * page_size], hide_index=True, use_container_width=True)
+
+with tab_breadth: render_breadth_tab()
+
+# --- Tab 11: 跨資產相關矩陣 ---
+@st.fragment
+@timed("tab_render", tab="corr")
+def render_corr_tab():
+    st.subheader("🔗 跨資產滾動相關")
+    st.info("💡 **核心邏輯**：平均相關突然飆向 1 代表資產同漲同跌、分散失效，通常出現在流動性事件前後。")
+    if cached_data.empty:
+        st.error("數據下載失敗")
+        return
+    states = correlation_states()     # 盤中模式的增量更新在 live_poll 裡做
+    window = st.radio("窗口", list(CORR_WINDOWS), format_func=lambda w: f"{w} 日", horizontal=True, key="corr_window")
+    state, history = states[window]
+    corr = state.matrix()
+    reg = regime(history)
+    if not reg.empty:
+        last = reg.iloc[-1]
+        r1, r2, r3 = st.columns(3)
+        r1.metric("平均相關", f"{last['平均相關']:.2f}", f"{last['平均相關'] - reg['平均相關'].iloc[-min(len(reg), 6)]:+.2f} (5日)", delta_color="inverse")
+        r2.metric("相對一年均值", f"{last['z']:+.1f} σ" if pd.notna(last["z"]) else "---")
+        with r3:
+            if last["飆升"]: st.success(f"### {last['型態']}")   # 壞事綠色
+            elif last["型態"] == "🟢 分散": st.error(f"### {last['型態']}")
+            else: st.info(f"### {last['型態']}")
+        st.line_chart(reg[["平均相關"]])
+    st.markdown("**重點配對**")
+    st.dataframe(pair_table({w: s.matrix() for w, (s, _) in states.items()}, names=name_map), hide_index=True, use_container_width=True)
+    order, labels = cluster_order(corr)
+    if len(order) > 1:
+        st.markdown(f"**相關熱圖** (依分群排序，共 {len(set(labels.values()))} 群)")
+        shown = [f"{name_map.get(t, t)} ({t})" for t in order]
+        heat = corr.loc[order, order].set_axis(shown, axis=0).set_axis(shown, axis=1).stack().rename("相關").reset_index()
+        heat.columns = ["資產A", "資產B", "相關"]
+        st.altair_chart(alt.Chart(heat).mark_rect().encode(
+            x=alt.X("資產B:N", sort=shown, axis=alt.Axis(labels=False, title=None)), y=alt.Y("資產A:N", sort=shown, title=None),
+            color=alt.Color("相關:Q", scale=alt.Scale(scheme="redblue", domain=[-1, 1], reverse=True)),
+            tooltip=["資產A", "資產B", alt.Tooltip("相關:Q", format=".2f")]).properties(height=max(400, 12 * len(order))), use_container_width=True)
+        groups = pd.Series(labels).groupby(lambda t: labels[t]).apply(lambda g: "、".join(name_map.get(t, t) for t in g.index))
+        sizes = pd.Series(labels).value_counts()
+        clusters = pd.DataFrame({"檔數": sizes, "成員": groups}).sort_values("檔數", ascending=False)
+        st.dataframe(clusters[clusters["檔數"] > 1], hide_index=True, use_container_width=True)
+
+with tab_corr: render_corr_tab()
+
+# --- Tab 12: 自訂清單 (watchlists.json 的 panels) ---
+@st.fragment
+@timed("tab_render", tab="custom")
+def render_custom_tab():
+    st.subheader("🗂️ 自訂清單")
+    st.caption(f"面板與清單來自 {os.path.basename(wl.path)}，存檔後重新整理即套用 (不必重啟)。")
+    if not wl.panels:
+        st.info("設定檔的 panels 為空：加入 {\"title\": ..., \"tickers\": [...] 或 \"lists\": [...], \"columns\": [...]} 即可新增面板")
+        return
+    for panel in wl.panels:
+        st.markdown(f"#### {panel['title']}")
+        df = get_data_from_cache(panel["tickers"], ind_rows)
+        missing = [t for t in panel["tickers"] if t not in ind_rows]
+        if df.empty:
+            st.warning("無數據")
+            continue
+        cols = [c for c in panel.get("columns", df.columns) if c in df.columns]
+        if panel.get("sort") in df.columns: df = df.sort_values(panel["sort"], ascending=False)
+        st.dataframe(df[cols], hide_index=True, use_container_width=True)
+        if missing: st.caption(f"無數據：{', '.join(name_map.get(t, t) for t in missing)}")
+
+with tab_custom: render_custom_tab()
+
+# ==========================================
+# 5. 效能面板：網址加 ?admin=1 (或設定 MARKET_ADMIN=1) 才顯示；量測結果定期寫到 data/metrics.prom (MARKET_METRICS_FILE 可改)
+# ==========================================
+metrics.export_if_due()
+if st.query_params.get("admin") == "1" or os.environ.get("MARKET_ADMIN") == "1":
+    with st.expander("🛠️ 效能面板 (本行程累計)", expanded=False):
+        spans = pd.DataFrame(metrics.span_table())
+        if not spans.empty:
+            st.markdown("**耗時 (依累計時間排序)**")
+            st.dataframe(spans.round(2), hide_index=True, use_container_width=True)
+        caches = pd.DataFrame(metrics.cache_table())
+        if not caches.empty:
+            st.markdown("**快取命中**")
+            st.dataframe(caches.round(1), hide_index=True, use_container_width=True)
+        if st.button("📤 立即匯出 Prometheus 指標", key="metrics_export"):
+            st.caption(f"已寫入 {metrics.export()}")
@@ -0,0 +1,140 @@
+# ==========================================
+# 行情下載器：依交易所分批、執行緒池並行、每批重試，單一壞代號不再拖垮整個儀表板
+# ==========================================
+import os
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from perf import metrics, span
+
+# frame: yfinance 格式寬表 (Price, Ticker)；failed: 沒抓到數據的代號
+DownloadResult = namedtuple("DownloadResult", ["frame", "failed"])
+
+
+class DataProvider:
+    # 行情來源介面：download(tickers, start) → yfinance 格式寬表，整批失敗時直接丟例外；fundamentals(ticker) → 基本面
+    name = "base"
+
+    def download(self, tickers, start):
+        raise NotImplementedError
+
+    def download_intraday(self, tickers, interval="1m"):
+        # 盤中即時模式用：當日分K，格式同 download
+        raise NotImplementedError
+
+    def fundamentals(self, ticker):
+        # 單檔基本面 {"info": {...}, "financials": DataFrame}，格式同 fundamentals.load_fundamentals
+        raise NotImplementedError
+
+
+class YFinanceProvider(DataProvider):
+    name = "yfinance"
+
+    def download(self, tickers, start):
+        import yfinance as yf
+        data = yf.download(list(tickers), start=start, progress=False)
+        if not isinstance(data.columns, pd.MultiIndex) and len(tickers) == 1:
+            data.columns = pd.MultiIndex.from_product([data.columns, list(tickers)])
+        return data
+
+    def download_intraday(self, tickers, interval="1m"):
+        import yfinance as yf
+        data = yf.download(list(tickers), period="1d", interval=interval, progress=False)
+        if not isinstance(data.columns, pd.MultiIndex) and len(tickers) == 1:
+            data.columns = pd.MultiIndex.from_product([data.columns, list(tickers)])
+        return data
+
+    def fundamentals(self, ticker):
+        from fundamentals import load_fundamentals
+        return load_fundamentals(ticker)
+
+
+class ReplayProvider(DataProvider):
+    # 離線回放：讀本地存檔 (pickle / 兩層表頭 CSV) 或直接給 DataFrame，可指定要模擬失敗的代號
+    name = "replay"
+
+    def __init__(self, source, fail=()):
+        if isinstance(source, pd.DataFrame): frame = source
+        elif str(source).endswith(".csv"): frame = pd.read_csv(source, header=[0, 1], index_col=0, parse_dates=True)
+        else: frame = pd.read_pickle(source)
+        self.frame = frame.sort_index()
+        self.fail = set(fail)
+
+    def download(self, tickers, start):
+        bad = self.fail.intersection(tickers)
+        if bad: raise RuntimeError(f"replay: 模擬下載失敗 {sorted(bad)}")
+        have = [t for t in tickers if t in self.frame.columns.get_level_values(1)]
+        frame = self.frame.loc[self.frame.index >= pd.Timestamp(start)]
+        return frame.loc[:, frame.columns.get_level_values(1).isin(have)]
+
+    def download_intraday(self, tickers, interval="1m"):
+        # 回放檔沒有分K，以最後一根K棒當作盤中最新價
+        return self.download(tickers, self.frame.index[-1]) if len(self.frame) else pd.DataFrame()
+
+    def fundamentals(self, ticker):
+        # 回放檔沒有財報，改用合成基本面；以代號當種子，同一檔每次結果相同
+        from synthetic import synthetic_fundamentals
+        return synthetic_fundamentals([ticker], seed=zlib.crc32(ticker.encode()))[ticker]
+
+
+def provider_from_env():
+    # 設定 MARKET_DATA_REPLAY=檔案路徑 即可完全離線執行儀表板 (行情與基本面都不連網)
+    path = os.environ.get("MARKET_DATA_REPLAY")
+    return ReplayProvider(path) if path else YFinanceProvider()
+
+
+def exchange_of(ticker):
+    if ticker.startswith("^"): return "INDEX"
+    if "=" in ticker: return "=" + ticker.rsplit("=", 1)[-1]   # =X 外匯、=F 期貨
+    if ticker.endswith("-USD"): return "CRYPTO"
+    if "." in ticker: return ticker.rsplit(".", 1)[-1]         # TW / TWO / SS / NYB
+    return "US"
+
+
+def shard_tickers(tickers, batch_size=25):
+    # 同交易所放同一批 (交易日曆一致、失敗也互不牽連)，再按 batch_size 切塊
+    groups = {}
+    for t in dict.fromkeys(tickers): groups.setdefault(exchange_of(t), []).append(t)
+    return [g[i:i + batch_size] for _, g in sorted(groups.items()) for i in range(0, len(g), batch_size)]
+
+
+def _missing(frame, tickers):
+    if frame is None or frame.empty or "Close" not in frame.columns.get_level_values(0): return list(tickers)
+    close = frame["Close"]
+    return [t for t in tickers if t not in close.columns or close[t].isna().all()]
+
+
+def _fetch_batch(provider, batch, start, retries, backoff):
+    for attempt in range(retries + 1):
+        try:
+            with span("external_call", target=f"{provider.name}.download"): frame = provider.download(batch, start)
+            return DownloadResult(frame, _missing(frame, batch))
+        except Exception:
+            metrics.inc("app_download_retries_total", provider=provider.name)
+            if attempt < retries: time.sleep(backoff * (2 ** attempt))
+    if len(batch) == 1: return DownloadResult(pd.DataFrame(), list(batch))
+    # 整批重試仍失敗 → 拆成單檔各抓一次，把壞代號隔離出來
+    parts = [_fetch_batch(provider, [t], start, 0, backoff) for t in batch]
+    return _merge(parts)
+
+
+def _merge(parts):
+    frames = [p.frame for p in parts if p.frame is not None and not p.frame.empty]
+    failed = [t for p in parts for t in p.failed]
+    if not frames: return DownloadResult(pd.DataFrame(), failed)
+    frame = pd.concat(frames, axis=1).sort_index()
+    frame = frame.loc[:, ~frame.columns.duplicated()]
+    if failed: frame = frame.loc[:, ~frame.columns.get_level_values(1).isin(failed)]
+    return DownloadResult(frame, failed)
+
+
+def download_concurrent(provider, tickers, start, batch_size=25, max_workers=4, retries=2, backoff=1.0):
+    batches = shard_tickers(tickers, batch_size)
+    if not batches: return DownloadResult(pd.DataFrame(), [])
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+        parts = list(pool.map(lambda b: _fetch_batch(provider, b, start, retries, backoff), batches))
+    return _merge(parts)
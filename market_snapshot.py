@@ -0,0 +1,105 @@
+# ==========================================
+# 精簡行情快照：只留儀表板真的會讀的欄位 (預設只有收盤價)，float32、同一組日期，唯讀陣列
+# 放進 st.cache_resource 全站共用同一個物件，重跑時不再像 st.cache_data 那樣反序列化複製整份 OHLCV
+# 取欄 / 取單檔都是零複製的 view；計算時各模組自行 to_numpy(dtype=float) 轉回 float64
+# ==========================================
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_FIELDS = ("Close",)
+DTYPE = np.float32
+
+
+def _freeze(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+class MarketSnapshot:
+    def __init__(self, index, tickers, data):
+        # data: {欄位: (日期 × 代號) float32 陣列}，以 Fortran 順序存放 → 單檔整段歷史在記憶體中連續
+        self.index = pd.DatetimeIndex(index, name="Date")
+        self.tickers = pd.Index(tickers, name="Ticker")
+        self._data = {f: _freeze(np.asfortranarray(v, dtype=DTYPE)) for f, v in data.items()}
+        self._positions = {t: i for i, t in enumerate(self.tickers)}   # 代號 → 欄位序號，O(1) 查詢
+        self._key = None
+
+    @classmethod
+    def from_frame(cls, frame, fields=SNAPSHOT_FIELDS):
+        # yf.download / PriceStore.load 的 (Price, Ticker) 寬表 → 快照；沒抓到的欄位略過
+        if frame is None or frame.empty or not isinstance(frame.columns, pd.MultiIndex):
+            return cls(pd.DatetimeIndex([]), [], {f: np.empty((0, 0)) for f in fields})
+        frame = frame.sort_index()
+        frame = frame.loc[~frame.index.duplicated(keep="last")]
+        prices = frame.columns.get_level_values(0)
+        tickers = pd.Index(frame.columns.get_level_values(1)).unique()
+        data = {}
+        for f in fields:
+            if f not in prices: continue
+            part = frame[f]
+            part = part.loc[:, ~part.columns.duplicated()].reindex(columns=tickers)
+            data[f] = part.to_numpy(dtype=DTYPE)
+        return cls(frame.index, tickers, data)
+
+    def __getstate__(self):
+        return {"index": self.index, "tickers": self.tickers, "data": self._data, "key": self._key}
+
+    def __setstate__(self, state):
+        # 從共用快照 (pickle) 讀回時重新設為唯讀
+        self.__init__(state["index"], state["tickers"], state["data"])
+        self._key = state.get("key")
+
+    @property
+    def empty(self):
+        return len(self.index) == 0 or len(self.tickers) == 0 or not self._data
+
+    @property
+    def fields(self):
+        return list(self._data)
+
+    @property
+    def shape(self):
+        return len(self.index), len(self.tickers)
+
+    @property
+    def nbytes(self):
+        return sum(v.nbytes for v in self._data.values())
+
+    @property
+    def key(self):
+        # 下游 cache_resource / cache_data 的鍵：最後日期 + 內容雜湊 (排序後的代號、日期、各欄數值)
+        # 換代號 (數量不變)、同一天盤中重抓數值變了都會換鍵；第一次用到才算 (1,000 檔 × 5 年約 30 毫秒)，之後沿用並隨 pickle 保存
+        if self._key is None:
+            h = hashlib.blake2b(digest_size=12)
+            order = np.argsort(np.asarray(self.tickers, dtype=str), kind="stable")
+            h.update("\0".join(self.tickers[order]).encode("utf-8"))
+            h.update(self.index.asi8.tobytes())
+            for f in sorted(self._data):
+                h.update(f.encode("utf-8"))
+                h.update(np.ascontiguousarray(self._data[f][:, order]).tobytes())
+            self._key = f"{self.index[-1].date() if len(self.index) else ''}|{h.hexdigest()}"
+        return self._key
+
+    def __contains__(self, field):
+        return field in self._data
+
+    def __getitem__(self, field):
+        return self.frame(field)
+
+    def values(self, field="Close"):
+        return self._data[field]
+
+    def frame(self, field="Close"):
+        # 日期 × 代號 DataFrame，直接包住唯讀陣列 (不複製)
+        return pd.DataFrame(self._data[field], index=self.index, columns=self.tickers, copy=False)
+
+    def column(self, ticker, field="Close"):
+        # 單檔整段歷史；找不到代號回傳 None
+        i = self._positions.get(ticker)
+        if i is None or field not in self._data: return None
+        return pd.Series(self._data[field][:, i], index=self.index, name=ticker, copy=False)
+
+    def has(self, ticker):
+        return ticker in self._positions
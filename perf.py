@@ -0,0 +1,173 @@
+# ==========================================
+# 效能量測：熱路徑計時 (span)、各層快取命中計數，輸出成 Prometheus 文字格式 (node_exporter textfile 可直接收)
+# 整個行程共用一份 (Streamlit 重跑腳本不會重新 import 模組)，不依賴 Streamlit
+# ==========================================
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "metrics.prom")
+WINDOW = 512                    # 滑動窗口：每個 span 只保留最近 N 筆耗時算分位數 (反映近況，不是全期間抽樣)
+QUANTILES = (0.5, 0.95, 0.99)   # 面板與 Prometheus 輸出共用
+
+
+def _labels(labels):
+    if not labels: return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def _quantile(recent, p):
+    # recent：已排序的最近耗時；最近秩法 (nearest rank)
+    return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else float("nan")
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = {}            # (名稱, 標籤) → [次數, 總秒數, 最大值, 最近 N 筆]
+        self._counters = {}         # (名稱, 標籤) → 數值
+        self._gauges = {}
+        self._collectors = {}       # 名稱 → fn()，匯出時才去讀各物件自己的計數器 (例如 FundamentalsCache.hits)
+        self.last_export = 0.0
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            s = self._spans.get(key)
+            if s is None: s = self._spans[key] = [0, 0.0, 0.0, deque(maxlen=WINDOW)]
+            s[0] += 1
+            s[1] += seconds
+            s[2] = max(s[2], seconds)
+            s[3].append(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock: self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock: self._gauges[self._key(name, labels)] = value
+
+    def register_collector(self, name, fn):
+        # fn() → [(指標名稱, 標籤 dict, 數值)]，同名重複註冊會覆蓋 (Streamlit 重跑時不會越註冊越多)
+        with self._lock: self._collectors[name] = fn
+
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try: yield
+        except Exception:
+            self.inc("app_span_errors_total", span=name, **labels)
+            raise
+        finally: self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        def deco(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels): return fn(*args, **kwargs)
+            return wrapper
+        return deco
+
+    def cache_layer(self, name, cache):
+        # cache：st.cache_data(...) / st.cache_resource(...) 之類的裝飾器。外層計請求數、內層 (真的執行時) 計未命中數
+        def deco(fn):
+            @functools.wraps(fn)
+            def miss(*args, **kwargs):
+                self.inc("app_cache_misses_total", cache=name)
+                return fn(*args, **kwargs)
+            cached = cache(miss)
+
+            @functools.wraps(fn)
+            def call(*args, **kwargs):
+                self.inc("app_cache_requests_total", cache=name)
+                return cached(*args, **kwargs)
+            if hasattr(cached, "clear"): call.clear = cached.clear
+            return call
+        return deco
+
+    def _collected(self):
+        rows = []
+        for fn in list(self._collectors.values()):
+            try: rows += list(fn())
+            except Exception: pass
+        return rows
+
+    def span_table(self):
+        # 面板用：[{span, 標籤, 次數, 平均/分位數/最大 (毫秒)}]
+        with self._lock: items = [(k, s[0], s[1], s[2], sorted(s[3])) for k, s in self._spans.items()]
+        rows = []
+        for (name, labels), count, total, peak, recent in items:
+            rows.append({"span": name, "標籤": ", ".join(f"{k}={v}" for k, v in labels), "次數": count, "平均(ms)": total / count * 1000,
+                         **{f"p{round(p * 100)}(ms)": _quantile(recent, p) * 1000 for p in QUANTILES},
+                         "最大(ms)": peak * 1000, "累計(s)": total})
+        return sorted(rows, key=lambda r: r["累計(s)"], reverse=True)
+
+    def cache_table(self):
+        # 面板用：每層快取的請求 / 未命中 / 命中率
+        with self._lock: counters = dict(self._counters)
+        layers = {}
+        for (name, labels), v in counters.items():
+            d = dict(labels)
+            if "cache" not in d: continue
+            if name == "app_cache_requests_total": layers.setdefault(d["cache"], {})["請求"] = v
+            elif name == "app_cache_misses_total": layers.setdefault(d["cache"], {})["未命中"] = v
+        for name, labels, v in self._collected():
+            if name in ("app_cache_hits_total", "app_cache_misses_total") and "cache" in labels:
+                layer = layers.setdefault(labels["cache"], {})
+                layer["命中" if name == "app_cache_hits_total" else "未命中"] = v
+        rows = []
+        for cache, d in sorted(layers.items()):
+            misses = d.get("未命中", 0)
+            hits = d.get("命中", d.get("請求", misses) - misses)
+            total = hits + misses
+            rows.append({"快取": cache, "命中": hits, "未命中": misses, "命中率(%)": hits / total * 100 if total else float("nan")})
+        return rows
+
+    def to_prometheus(self):
+        with self._lock:
+            spans = [(k, s[0], s[1], sorted(s[3])) for k, s in self._spans.items()]
+            counters, gauges = dict(self._counters), dict(self._gauges)
+        lines = ["# HELP app_span_seconds 熱路徑耗時 (秒)", "# TYPE app_span_seconds summary"]
+        for (name, labels), count, total, recent in sorted(spans):
+            base = dict(labels, span=name)
+            for p in QUANTILES:
+                if recent: lines.append(f"app_span_seconds{_labels(dict(base, quantile=p))} {_quantile(recent, p):.6f}")
+            lines.append(f"app_span_seconds_sum{_labels(base)} {total:.6f}")
+            lines.append(f"app_span_seconds_count{_labels(base)} {count}")
+        series = {}
+        for (name, labels), v in counters.items(): series.setdefault((name, "counter"), []).append((dict(labels), v))
+        for (name, labels), v in gauges.items(): series.setdefault((name, "gauge"), []).append((dict(labels), v))
+        for name, labels, v in self._collected():
+            series.setdefault((name, "counter" if name.endswith("_total") else "gauge"), []).append((labels, v))
+        for (name, kind), samples in sorted(series.items()):
+            lines.append(f"# TYPE {name} {kind}")
+            lines += [f"{name}{_labels(labels)} {v}" for labels, v in samples]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path=None):
+        # 先寫暫存檔再 rename，抓取端不會讀到寫一半的檔案；暫存檔名含行程與執行緒編號，同時匯出不會互踩
+        path = path or os.environ.get("MARKET_METRICS_FILE", DEFAULT_METRICS_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: f.write(self.to_prometheus())
+        os.replace(tmp, path)
+        self.last_export = time.time()
+        return path
+
+    def export_if_due(self, interval=15, path=None):
+        if time.time() - self.last_export < interval: return None
+        try: return self.export(path)
+        except OSError: return None
+
+
+metrics = Metrics()
+span = metrics.span
+timed = metrics.timed
@@ -0,0 +1,166 @@
+# ==========================================
+# 本地價格庫 (SQLite)：以 (代號, 日期) 為鍵保存日K，更新時只抓最後一筆之後的增量
+# ==========================================
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "prices.sqlite")
+
+_PERIOD_DAYS = {"d": 1, "wk": 7, "mo": 31, "y": 366}
+
+
+def period_start(period, today=None):
+    # 把 yfinance 的 period 字串 ("6mo", "1y", "5y", "max") 轉成起始日
+    today = today or date.today()
+    if period == "max": return date(1970, 1, 1)
+    if period == "ytd": return date(today.year, 1, 1)
+    for unit, days in _PERIOD_DAYS.items():
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            return today - timedelta(days=int(period[:-len(unit)]) * days)
+    raise ValueError(f"不支援的 period: {period}")
+
+
+def to_long(frame):
+    # yfinance 寬表 (Price, Ticker) → 長表 [ticker, date, Open..Volume]
+    if frame is None or frame.empty: return pd.DataFrame(columns=["ticker", "date"] + FIELDS)
+    fields = [f for f in FIELDS if f in frame.columns.get_level_values(0)]
+    long = frame[fields].stack(level=1, future_stack=True).reset_index()
+    long.columns = ["date", "ticker"] + fields
+    long = long.dropna(subset=["Close"])
+    long["date"] = pd.to_datetime(long["date"]).dt.strftime("%Y-%m-%d")
+    return long.reindex(columns=["ticker", "date"] + FIELDS)
+
+
+def to_wide(long):
+    # 長表 → yfinance 相同的 MultiIndex 寬表，讓既有分頁程式不用改
+    if long.empty: return pd.DataFrame()
+    wide = long.pivot(index="date", columns="ticker", values=FIELDS)
+    wide.index = pd.DatetimeIndex(pd.to_datetime(wide.index), name="Date")
+    wide.columns.names = ["Price", "Ticker"]
+    return wide.sort_index()
+
+
+class PriceStore:
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS bars (
+                ticker TEXT, date TEXT, Open REAL, High REAL, Low REAL, Close REAL, Volume REAL,
+                PRIMARY KEY (ticker, date)) WITHOUT ROWID""")
+            # covered_from: 已下載的最早起始日；fetched_at: 最後一次向網路更新的時間
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (ticker TEXT PRIMARY KEY, covered_from TEXT, fetched_at REAL)")
+
+    def _connect(self):
+        # 每次操作各自連線，Streamlit 多 session 執行緒共用也安全
+        return sqlite3.connect(self.path, timeout=30)
+
+    def upsert(self, frame):
+        long = to_long(frame)
+        if long.empty: return 0
+        rows = long.astype(object).where(long.notna(), None).itertuples(index=False, name=None)
+        with self._connect() as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO bars VALUES ({','.join('?' * (2 + len(FIELDS)))})", rows)
+        return len(long)
+
+    def mark_fetched(self, tickers, covered_from, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                """INSERT INTO meta VALUES (?, ?, ?) ON CONFLICT(ticker) DO UPDATE SET
+                   covered_from = MIN(covered_from, excluded.covered_from), fetched_at = excluded.fetched_at""",
+                [(t, covered_from, fetched_at) for t in tickers])
+
+    def status(self, tickers):
+        # {代號: (covered_from, fetched_at, 錨點日)}；錨點 = 倒數第二根K棒 (最後一根可能是盤中未收完)
+        marks = ",".join("?" * len(tickers))
+        with self._connect() as conn:
+            meta = {t: (c, f) for t, c, f in conn.execute(f"SELECT * FROM meta WHERE ticker IN ({marks})", tickers)}
+            anchor = dict(conn.execute(
+                f"""SELECT ticker, MAX(date) FROM bars WHERE ticker IN ({marks})
+                    AND date < (SELECT MAX(date) FROM bars b WHERE b.ticker = bars.ticker) GROUP BY ticker""", tickers))
+        return {t: meta.get(t, (None, None)) + (anchor.get(t),) for t in tickers}
+
+    def closes_on(self, tickers, day):
+        marks = ",".join("?" * len(tickers))
+        with self._connect() as conn:
+            return dict(conn.execute(f"SELECT ticker, Close FROM bars WHERE date = ? AND ticker IN ({marks})", [day] + list(tickers)))
+
+    def drop(self, tickers):
+        marks = ",".join("?" * len(tickers))
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM bars WHERE ticker IN ({marks})", tickers)
+            conn.execute(f"DELETE FROM meta WHERE ticker IN ({marks})", tickers)
+
+    def load(self, tickers, period="1y"):
+        start = period_start(period).isoformat()
+        marks = ",".join("?" * len(tickers))
+        with self._connect() as conn:
+            long = pd.read_sql_query(
+                f"SELECT * FROM bars WHERE ticker IN ({marks}) AND date >= ? ORDER BY date", conn,
+                params=list(tickers) + [start])
+        return to_wide(long)
+
+    def load_field(self, tickers, field="Close", period="1y"):
+        # 只讀單一欄位 → 日期 × 代號寬表；全市場逐塊計算時用，不必載入整份 OHLCV
+        if field not in FIELDS: raise ValueError(f"不支援的欄位: {field}")
+        start = period_start(period).isoformat()
+        marks = ",".join("?" * len(tickers))
+        with self._connect() as conn:
+            long = pd.read_sql_query(
+                f"SELECT ticker, date, {field} FROM bars WHERE ticker IN ({marks}) AND date >= ?", conn,
+                params=list(tickers) + [start])
+        if long.empty: return pd.DataFrame(columns=pd.Index(tickers, name="Ticker"), dtype=float)
+        wide = long.pivot(index="date", columns="ticker", values=field).reindex(columns=tickers)
+        wide.index = pd.DatetimeIndex(pd.to_datetime(wide.index), name="Date")
+        wide.columns.name = "Ticker"
+        return wide.sort_index()
+
+    def plan_refresh(self, tickers, period="1y", max_age=3600, now=None):
+        # 回傳 {起始日: [代號...]}：沒資料或回溯不足的抓整段，其餘只從錨點那天開始補
+        now = now or time.time()
+        start = period_start(period).isoformat()
+        plan = {}
+        for t, (covered_from, fetched_at, anchor) in self.status(list(tickers)).items():
+            covered = covered_from is not None and covered_from <= start
+            if covered and fetched_at and now - fetched_at < max_age: continue
+            plan.setdefault(anchor if (covered and anchor) else start, []).append(t)
+        return plan
+
+    def refresh(self, tickers, download, period="1y", max_age=3600):
+        # download(tickers, start) → (yfinance 格式寬表, 失敗代號)；失敗的不標記更新，下次會再抓
+        start = period_start(period).isoformat()
+        failed = []
+        for since, batch in self.plan_refresh(tickers, period, max_age).items():
+            frame, bad = download(batch, since)
+            if since > start:
+                # 錨點收盤價對不上 = 除權息後還原價已改寫 → 該檔整段重抓
+                stale = self._adjusted_since(batch, since, frame)
+                if stale:
+                    full, bad_full = download(stale, start)
+                    self.drop([t for t in stale if t not in bad_full])
+                    self.upsert(full)
+                    self.mark_fetched([t for t in stale if t not in bad_full], start)
+                    failed += bad_full
+                    batch = [t for t in batch if t not in stale]
+                    frame = frame.loc[:, frame.columns.get_level_values(1).isin(batch)]
+            self.upsert(frame)
+            self.mark_fetched([t for t in batch if t not in bad], min(since, start))
+            failed += [t for t in batch if t in bad]
+        return failed
+
+    def _adjusted_since(self, batch, day, frame, tol=1e-4):
+        if frame is None or frame.empty or "Close" not in frame.columns.get_level_values(0): return []
+        fresh = frame["Close"]
+        fresh = fresh[pd.to_datetime(fresh.index).strftime("%Y-%m-%d") == day]
+        if fresh.empty: return []
+        fresh = fresh.iloc[0]
+        stored = self.closes_on(batch, day)
+        return [t for t, old in stored.items()
+                if t in fresh.index and pd.notna(fresh[t]) and abs(fresh[t] - old) > tol * max(abs(old), 1)]
@@ -0,0 +1,78 @@
+# ==========================================
+# 多週期相對強度引擎：全部追蹤代號 × 5/20/60/120/250 根 K 棒，對單一基準或各自的本地指數 (上市 → ^TWII、上櫃 → ^TWO)
+# 一次向量化算完今天與前一個交易日，附百分位排名與排名變化；結果小，依快照快取後各分頁只做選列與排序
+# RS = (1 + 個股漲幅) / (1 + 基準漲幅)，漲幅定義與 indicators._tail_return 相同 (60 根即儀表板的 ret60)
+# ==========================================
+import numpy as np
+import pandas as pd
+
+import watchlists
+from indicators import _align_right
+
+HORIZONS = (5, 20, 60, 120, 250)
+HOME = "home"           # benchmark=HOME → 各檔對自己的本地指數
+
+
+def home_index(ticker, benchmark=None):
+    # 上市 → 加權指數、上櫃 → 櫃買指數，其餘 → benchmark (未指定時用 watchlists.json 的基準)
+    if ticker.endswith(".TWO"): return "^TWO"
+    if ticker.endswith(".TW"): return "^TWII"
+    return benchmark or watchlists.current().benchmark
+
+
+def _returns_asof(values, aligned, n_valid, row, horizons):
+    # 各檔在日曆第 row 列 (含) 以前最後一根 K 棒的 h 根漲幅 → (len(horizons), 檔數)
+    after = (~np.isnan(values[row + 1:])).sum(axis=0) if row + 1 < len(values) else np.zeros(values.shape[1], dtype=np.int64)
+    last = len(aligned) - 1 - after           # 在靠右對齊矩陣中的位置
+    have = n_valid - after                    # 截至該日的 K 棒數
+    cols = np.arange(values.shape[1])
+    out = np.full((len(horizons), values.shape[1]), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for k, h in enumerate(horizons):
+            ok = have > h
+            base = aligned[np.clip(last - h + 1, 0, None), cols]
+            out[k] = np.where(ok, aligned[np.clip(last, 0, None), cols] / base - 1, np.nan)
+    return out
+
+
+def _rs(rets, columns, benchmark):
+    # rets: (週期, 檔數)；每檔對應一個基準欄 (找不到 → NaN)
+    if benchmark == HOME:
+        default = watchlists.current().benchmark
+        bench = [home_index(t, default) for t in columns]
+    else: bench = [benchmark] * len(columns)
+    pos = pd.Index(columns).get_indexer(bench)
+    bench_rets = np.where(pos >= 0, rets[:, np.clip(pos, 0, None)], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (1 + rets) / (1 + bench_rets), bench
+
+
+def compute_rs(close_df, benchmark=None, horizons=HORIZONS):
+    # 回傳以代號為索引的表：rs{h} / ret{h} / pct{h} (0~100，越高越強) / rank{h} (1 = 最強) / rank_chg{h} (> 0 = 比前一日進步)
+    if benchmark is None: benchmark = watchlists.current().benchmark
+    close_df = close_df.loc[:, ~close_df.columns.duplicated()].sort_index()
+    columns = list(close_df.columns)
+    if close_df.empty: return pd.DataFrame(index=pd.Index(columns, name="Ticker"))
+    values = close_df.to_numpy(dtype=float)
+    aligned, n_valid = _align_right(values)
+    rows = len(values)
+    rets_now = _returns_asof(values, aligned, n_valid, rows - 1, horizons)
+    rets_prev = _returns_asof(values, aligned, n_valid, rows - 2, horizons) if rows >= 2 else np.full_like(rets_now, np.nan)
+    rs_now, bench = _rs(rets_now, columns, benchmark)
+    rs_prev, _ = _rs(rets_prev, columns, benchmark)
+    out = {"benchmark": bench}
+    for k, h in enumerate(horizons):
+        now, prev = pd.Series(rs_now[k], index=columns), pd.Series(rs_prev[k], index=columns)
+        rank, rank_prev = now.rank(ascending=False, method="min"), prev.rank(ascending=False, method="min")
+        out[f"rs{h}"] = now
+        out[f"ret{h}"] = rets_now[k]
+        out[f"pct{h}"] = now.rank(pct=True) * 100
+        out[f"rank{h}"] = rank
+        out[f"rank_chg{h}"] = rank_prev - rank
+    return pd.DataFrame(out, index=pd.Index(columns, name="Ticker"))
+
+
+def rs_view(table, tickers, horizon):
+    # 分頁用：取清單內代號，依指定週期的 RS 由強到弱排序 (不重算)
+    rows = table.reindex([t for t in dict.fromkeys(tickers) if t in table.index])
+    return rows.sort_values(f"rs{horizon}", ascending=False, na_position="last")
@@ -0,0 +1,159 @@
+# ==========================================
+# 跨行程共用快取：多個 Streamlit 副本共用同一份快照，同一個鍵同時只有一個行程在更新 (single-flight)
+# 其他行程在新快照寫入前一律拿舊快照，不會重複打 yfinance
+# ==========================================
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+try: import fcntl
+except ImportError: fcntl = None   # Windows：改用 O_EXCL 鎖檔 + 租期
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "shared_cache")
+
+
+class CacheBackend:
+    # 後端介面：get → (value, stored_at) 或 None；set 的 stored_at 預設為現在；try_lock 拿不到鎖回傳 None
+    def get(self, key): raise NotImplementedError
+    def set(self, key, value, stored_at=None): raise NotImplementedError
+    def try_lock(self, key): raise NotImplementedError
+    def unlock(self, handle): raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    # 單行程替身，本機測試 / 無共用磁碟時使用
+    def __init__(self):
+        self._data, self._locks, self._mutex = {}, set(), threading.Lock()
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value, stored_at=None):
+        self._data[key] = (value, time.time() if stored_at is None else stored_at)
+
+    def try_lock(self, key):
+        with self._mutex:
+            if key in self._locks: return None
+            self._locks.add(key)
+            return key
+
+    def unlock(self, handle):
+        with self._mutex: self._locks.discard(handle)
+
+
+class FileCacheBackend(CacheBackend):
+    # 放在副本共用的磁碟 (volume) 上：快照以 pickle 原子寫入 (先寫暫存檔再 rename)，鎖用 flock，持有者當掉時由作業系統自動釋放
+    def __init__(self, root=DEFAULT_CACHE_DIR, lease=600):
+        self.root = root
+        self.lease = lease
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, hashlib.sha1(key.encode("utf-8")).hexdigest() + ext)
+
+    def get(self, key):
+        try:
+            with open(self._path(key, ".pkl"), "rb") as f: return pickle.load(f)
+        except Exception: return None       # 不存在、寫到一半、舊版模組結構讀不回 (AttributeError / ModuleNotFoundError) 都當未命中
+
+    def set(self, key, value, stored_at=None):
+        path = self._path(key, ".pkl")
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f: pickle.dump((value, time.time() if stored_at is None else stored_at), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def try_lock(self, key):
+        path = self._path(key, ".lock")
+        if fcntl is not None:
+            f = open(path, "a+")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return f
+            except OSError:
+                f.close()
+                return None
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try: expired = time.time() - os.path.getmtime(path) > self.lease
+            except FileNotFoundError: expired = True
+            if not expired: return None
+            try: os.remove(path)
+            except FileNotFoundError: pass
+            try: fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError: return None
+        os.close(fd)
+        return path
+
+    def unlock(self, handle):
+        if isinstance(handle, str):
+            try: os.remove(handle)
+            except FileNotFoundError: pass
+        else:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+
+def backend_from_env():
+    # MARKET_CACHE_BACKEND=memory 時只在行程內共用；否則用 MARKET_CACHE_DIR (預設 data/shared_cache)
+    if os.environ.get("MARKET_CACHE_BACKEND") == "memory": return MemoryCacheBackend()
+    return FileCacheBackend(os.environ.get("MARKET_CACHE_DIR", DEFAULT_CACHE_DIR))
+
+
+class SharedCache:
+    def __init__(self, backend, ttl=3600, retry_ttl=300, wait_timeout=120, poll_interval=0.5):
+        self.backend = backend
+        self.ttl = ttl
+        self.retry_ttl = retry_ttl      # 不完整的結果 (部分代號下載失敗) 只保留這麼久，之後重試
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.hits = self.stale = self.refreshes = self.errors = 0
+
+    def _fresh(self, entry):
+        return entry is not None and time.time() - entry[1] < self.ttl
+
+    def get_or_refresh(self, key, compute, partial=None):
+        # compute 出錯：有舊值就回傳舊值 (不寫入)，沒有才往外丟；partial(value) 為真 → 以 retry_ttl 存放
+        entry = self.backend.get(key)
+        if self._fresh(entry):
+            self.hits += 1
+            return entry[0]
+        lock = self.backend.try_lock(key)
+        if lock is None:
+            if entry is not None:
+                # 別人正在更新 → 先給舊快照
+                self.stale += 1
+                return entry[0]
+            # 冷啟動且別人正在抓：等對方寫入，對方中途失敗就換自己來
+            deadline = time.time() + self.wait_timeout
+            while lock is None and time.time() < deadline:
+                time.sleep(self.poll_interval)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+                lock = self.backend.try_lock(key)
+            if lock is None: return compute()
+        try:
+            entry = self.backend.get(key)   # 拿到鎖後再確認一次，可能剛有人寫完
+            if self._fresh(entry):
+                self.hits += 1
+                return entry[0]
+            try: value = compute()
+            except Exception:
+                self.errors += 1
+                if entry is None: raise
+                self.stale += 1
+                return entry[0]
+            stored_at = time.time() - self.ttl + self.retry_ttl if partial and partial(value) else None
+            self.backend.set(key, value, stored_at)
+            self.refreshes += 1
+            return value
+        finally:
+            self.backend.unlock(lock)
+
+
+def snapshot_key(prefix, tickers, period):
+    return f"{prefix}:{period}:{hashlib.sha1(','.join(sorted(set(tickers))).encode()).hexdigest()[:16]}"
@@ -0,0 +1,150 @@
+# ==========================================
+# 無介面訊號服務：不載入 Streamlit，供排程 / 其他程式取用同一套訊號
+#   python signal_api.py snapshot [--refresh] [--out data/signals.json]   從本地價格庫產生快照 (可先補增量)
+#   python signal_api.py serve [--port 8765]                               以 HTTP 提供預先算好的 JSON
+#   python signal_api.py show [--signal tw_lights]                         印出快照
+# 請求路徑只讀記憶體中的快照，不會觸發任何計算或下載；快照檔更新後自動重新載入
+# ==========================================
+import argparse
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlparse
+
+import watchlists
+from market_data import download_concurrent, provider_from_env
+from price_store import PriceStore
+from signals import build_snapshot
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "signals.json")
+
+
+def make_snapshot(tickers=None, period="1y", refresh=False, store=None):
+    if tickers is None: tickers = watchlists.current().all_tickers
+    store = store or PriceStore()
+    failed = []
+    if refresh:
+        provider = provider_from_env()
+        failed = store.refresh(tickers, lambda batch, start: download_concurrent(provider, batch, start), period=period)
+    frame = store.load(tickers, period=period)
+    if frame.empty: raise RuntimeError("本地價格庫沒有數據，請先加上 --refresh")
+    snap = build_snapshot(frame["Close"])
+    snap["failed"] = sorted(failed)
+    return snap
+
+
+def write_snapshot(snap, path=DEFAULT_SNAPSHOT_PATH):
+    # 先寫暫存檔再 rename，服務端不會讀到寫一半的檔案
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(snap, f, ensure_ascii=False, allow_nan=False)
+    os.replace(tmp, path)
+
+
+class SnapshotFile:
+    # 依檔案 mtime 判斷是否重新載入；同時保留序列化後的 bytes，熱路徑只做查表
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH):
+        self.path = path
+        self.data = None
+        self.mtime = None
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def current(self):
+        try: mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError: return None
+        if mtime != self.mtime:
+            with self._lock:
+                if mtime != self.mtime:
+                    with open(self.path, encoding="utf-8") as f: data = json.load(f)
+                    self.data, self.mtime, self._encoded = data, mtime, {}
+        return self.data
+
+    def encoded(self, route):
+        # route → (狀態碼, JSON bytes)，同一份快照同一路徑只序列化一次
+        data = self.current()
+        if data is None: return 503, json.dumps({"error": "尚未產生快照"}, ensure_ascii=False).encode("utf-8")
+        hit = self._encoded.get(route)
+        if hit is None:
+            status, body = resolve(data, route)
+            hit = (status, json.dumps(body, ensure_ascii=False).encode("utf-8"))
+            if status == 200: self._encoded[route] = hit   # 只快取有效路徑，亂打的網址不會撐大記憶體
+        return hit
+
+
+def resolve(snap, route):
+    parts = [unquote(p) for p in route.strip("/").split("/") if p]
+    if parts == ["health"]:
+        return 200, {"status": "ok", "generated_at": snap.get("generated_at"), "as_of": snap.get("as_of")}
+    if parts == ["signals"]:
+        return 200, {k: snap[k] for k in ("generated_at", "as_of", "signals")}
+    if len(parts) == 2 and parts[0] == "signals":
+        if parts[1] in snap["signals"]: return 200, snap["signals"][parts[1]]
+        return 404, {"error": f"未知訊號: {parts[1]}", "available": sorted(snap["signals"])}
+    if len(parts) == 2 and parts[0] == "indicators":
+        if parts[1] in snap["indicators"]: return 200, snap["indicators"][parts[1]]
+        return 404, {"error": f"未知代號: {parts[1]}"}
+    if parts == ["indicators"]:
+        return 200, snap["indicators"]
+    return 404, {"error": "路徑不存在", "routes": ["/health", "/signals", "/signals/<name>", "/indicators", "/indicators/<ticker>"]}
+
+
+def make_handler(source):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, body = source.encoded(urlparse(self.path).path)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args): pass
+
+    return Handler
+
+
+def serve(path=DEFAULT_SNAPSHOT_PATH, host="127.0.0.1", port=8765):
+    server = ThreadingHTTPServer((host, port), make_handler(SnapshotFile(path)))
+    print(f"serving {path} on http://{host}:{server.server_address[1]}")
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally: server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="市場訊號快照 / JSON API")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("snapshot", help="產生訊號快照")
+    p.add_argument("--refresh", action="store_true", help="先補本地價格庫的增量 (需連網或 MARKET_DATA_REPLAY)")
+    p.add_argument("--period", default="1y")
+    p.add_argument("--out", default=DEFAULT_SNAPSHOT_PATH)
+    p = sub.add_parser("serve", help="以 HTTP 提供快照")
+    p.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_PATH)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p = sub.add_parser("show", help="印出快照")
+    p.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_PATH)
+    p.add_argument("--signal", help="只印單一訊號")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "snapshot":
+        snap = make_snapshot(period=args.period, refresh=args.refresh)
+        write_snapshot(snap, args.out)
+        print(f"{args.out}: {len(snap['indicators'])} 檔，資料日 {snap['as_of']}，下載失敗 {len(snap['failed'])} 檔")
+    elif args.cmd == "serve":
+        serve(args.snapshot, args.host, args.port)
+    else:
+        snap = SnapshotFile(args.snapshot).current()
+        if snap is None: sys.exit(f"找不到快照 {args.snapshot}，請先執行 snapshot")
+        status, body = resolve(snap, f"/signals/{quote(args.signal, safe='')}") if args.signal else (200, snap["signals"])
+        if status != 200:
+            print(json.dumps(body, ensure_ascii=False, indent=2), file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(body, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
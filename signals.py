@@ -0,0 +1,160 @@
+# ==========================================
+# 訊號庫：儀表板各分頁的判讀邏輯，純函數、不依賴 Streamlit、import 時不連網
+# 輸入皆為 indicators.compute_indicator_matrix 的結果 (以代號為索引)
+# ==========================================
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import watchlists
+from indicators import compute_indicator_matrix
+
+HIGH_PRICE_THRESHOLD = 1000
+SHORT_RATE_ALERT = 5.2
+ROTATION_BULL_SCORE = 60
+
+
+def _row(ind, ticker, min_bars=1):
+    if ticker not in ind.index: return None
+    row = ind.loc[ticker]
+    return row if row["n"] >= min_bars else None
+
+
+def _default(name):
+    # 未指定清單時用目前的 watchlists.json (熱更新後立即生效)
+    return watchlists.current().lists[name]
+
+
+def ai_average_bias(ind, tickers=None):
+    # Tab 1：科技指數 + 權值股的平均月線乖離；< 0 代表資金全面撤退
+    if tickers is None: tickers = _default("assets_ai_risk")
+    rows = ind.reindex([t for t in tickers if t in ind.index])
+    rows = rows[rows["n"] >= 1]
+    members = [{"ticker": t, "bias": b, "price": p} for t, b, p in zip(rows.index, rows["bias"], rows["price"])]
+    missing = [t for t in tickers if t not in ind.index]
+    biases = rows["bias"].to_numpy(dtype=float)
+    avg = float(biases.mean()) if len(biases) else 0.0
+    strong = int((biases.round(2) > 0).sum())
+    return {"avg_bias": avg, "alarm": avg < 0, "count": len(members), "strong": strong,
+            "weak": len(members) - strong, "members": members, "missing": missing}
+
+
+def tw_four_lights(ind):
+    # Tab 2：半導體 (SOXX) 漲、內資 (櫃買，缺資料改用富邦中小) 漲、美元跌、美債殖利率跌，各亮一燈
+    def light(ticker, want_up, rsi_required=True):
+        row = _row(ind, ticker)
+        if row is None or (rsi_required and pd.isna(row["rsi"])): return None
+        on = row["bias"] > 0 if want_up else row["bias"] < 0
+        return {"ticker": ticker, "price": row["price"], "bias": row["bias"], "on": bool(on)}
+    lights = {"semiconductor": light("SOXX", True),
+              "domestic": light("^TWOII", True) or light("00733.TW", True),
+              "usd": light("DX-Y.NYB", False),
+              "rates": light("^TNX", False)}
+    score = sum(1 for v in lights.values() if v and v["on"])
+    label = {4: "火力全開", 3: "偏多操作", 2: "多空拉鋸"}.get(score, "保守防禦")
+    return {"score": score, "label": label, "lights": lights}
+
+
+def high_price_thermometer(ind, tickers=None, threshold=HIGH_PRICE_THRESHOLD):
+    # Tab 2：股價 ≥ 1000 的千金股中，站上月線的比例與平均乖離
+    if tickers is None: tickers = _default("assets_high_price")
+    rows = ind.reindex([t for t in dict.fromkeys(tickers) if t in ind.index])
+    rows = rows[(rows["n"] > 0) & rows["rsi"].notna() & (rows["price"].round(2) >= threshold)]
+    if rows.empty: return {"club_count": 0, "members": []}
+    strong = int((rows["bias"] > 0).sum())
+    king = rows["price"].idxmax()
+    return {"club_count": len(rows), "strong": strong, "weak": len(rows) - strong,
+            "strong_pct": strong / len(rows), "avg_bias": float(rows["bias"].mean()),
+            "king": {"ticker": king, "price": rows.loc[king, "price"]},
+            "members": [{"ticker": t, "price": r["price"], "bias": r["bias"]} for t, r in rows.iterrows()]}
+
+
+def carry_trade_status(ind, ticker="JPY=X"):
+    # Tab 3：USD/JPY 跌破季線 (60MA) = 日圓升值 = 套利平倉警戒
+    row = _row(ind, ticker, min_bars=61)
+    if row is None: return None
+    return {"price": row["price"], "ma60": row["ma60"], "warning": bool(row["price"] < row["ma60"])}
+
+
+def short_rate(ind, threshold=SHORT_RATE_ALERT):
+    # Tab 3：短端資金成本，優先用聯邦基金期貨反推 (100 - 價格)，否則用 13 週國庫券
+    row = _row(ind, "ZQ=F")
+    if row is not None: rate, source = round(100 - row["price"], 2), "ZQ=F"
+    else:
+        row = _row(ind, "^IRX")
+        if row is None: return None
+        rate, source = round(row["price"], 2), "^IRX"
+    return {"rate": rate, "source": source, "tight": bool(rate > threshold)}
+
+
+def relative_pair(ind, a, b):
+    # 兩檔 20 日報酬比較；缺代號回傳 None，資料不足回傳 {"insufficient": True}
+    if a not in ind.index or b not in ind.index: return None
+    ra, rb = ind.loc[a, "ret20"], ind.loc[b, "ret20"]
+    if pd.isna(ra) or pd.isna(rb): return {"insufficient": True}
+    return {"a": a, "b": b, "a_ret": ra, "b_ret": rb, "a_wins": bool(ra > rb)}
+
+
+def breadth_and_credit(ind):
+    # Tab 3：等權重勝市值權重 = 廣度佳；高收益債勝投資級債 = 追逐風險
+    return {"breadth": relative_pair(ind, "RSP", "SPY"), "credit": relative_pair(ind, "HYG", "LQD")}
+
+
+def semiconductor_rs(ind, tickers=None, benchmark=None):
+    # Tab 4：60 日相對強度 (1 + 個股漲幅) / (1 + 基準漲幅)；基準缺資料回傳 None
+    if tickers is None: tickers = _default("assets_semi_tickers")
+    if benchmark is None: benchmark = watchlists.current().benchmark
+    bench = _row(ind, benchmark, min_bars=61)
+    if bench is None: return None
+    semi = ind.reindex([t for t in tickers if t in ind.index]).dropna(subset=["ret60"])
+    rs = (1 + semi["ret60"]) / (1 + bench["ret60"])
+    rows = [{"ticker": t, "rs": v, "ret60": r} for t, v, r in zip(semi.index, rs, semi["ret60"])]
+    return sorted(rows, key=lambda x: x["rs"], reverse=True)
+
+
+def rotation_scores(ind, tickers=None, leader="QQQ", bull_score=ROTATION_BULL_SCORE):
+    # Tab 5：七大資產宏觀分數；QQQ ≥ 60 分為牛市攻擊，否則分散避險
+    if tickers is None: tickers = _default("assets_rotation")
+    rows = ind.reindex([t for t in tickers if t in ind.index])
+    rows = rows[(rows["n"] > 0) & rows["rsi"].notna()]
+    scores = {t: int(s) for t, s in rows["score"].items()}
+    lead = scores.get(leader)
+    return {"scores": scores, "leader": leader, "leader_score": lead, "bull": None if lead is None else lead >= bull_score}
+
+
+def compute_signals(ind):
+    return {
+        "ai_bias": ai_average_bias(ind),
+        "tw_lights": tw_four_lights(ind),
+        "high_price": high_price_thermometer(ind),
+        "carry_trade": carry_trade_status(ind),
+        "short_rate": short_rate(ind),
+        "breadth_credit": breadth_and_credit(ind),
+        "semiconductor_rs": semiconductor_rs(ind),
+        "rotation": rotation_scores(ind),
+    }
+
+
+def to_jsonable(obj):
+    # numpy / NaN → 原生型別與 null，讓 json.dumps 直接可用
+    if isinstance(obj, dict): return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)): return [to_jsonable(v) for v in obj]
+    if isinstance(obj, (np.bool_, bool)): return bool(obj)
+    if isinstance(obj, (np.integer,)): return int(obj)
+    if isinstance(obj, (np.floating, float)): return None if math.isnan(obj) or math.isinf(obj) else float(obj)
+    if isinstance(obj, (pd.Timestamp, datetime)): return obj.isoformat()
+    return obj
+
+
+def build_snapshot(close_df):
+    # 一份完整的訊號快照 (供 API / 排程 / 告警使用)
+    ind = compute_indicator_matrix(close_df)
+    last_valid = close_df.apply(lambda s: s.last_valid_index())
+    return to_jsonable({
+        "generated_at": datetime.now(timezone.utc),
+        "as_of": close_df.index.max() if len(close_df.index) else None,
+        "signals": compute_signals(ind),
+        "indicators": {t: dict(r, last_bar=last_valid.get(t)) for t, r in ind.iterrows()},
+    })
@@ -0,0 +1,174 @@
+# ==========================================
+# 盤中即時模式：每檔保留固定長度的環狀緩衝與累計和，新 K 棒進來只做 O(1) 更新，不必重算整段歷史
+# 產出欄位與 indicators.compute_indicator_matrix 完全相同，可直接替換給各分頁使用
+# ==========================================
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicators import _align_right
+
+PRICE_WINDOW = 61      # 要回看 series.iloc[-60] 與 MA60，緩衝至少 61 根
+RSI_PERIOD = 14
+RESYNC_EVERY = 500     # 每 N 次更新用緩衝重算一次累計和，避免浮點誤差累積
+
+# 各市場 K 棒的日期以當地時區計算 (同一天的盤中更新 = 覆蓋最後一根日K)
+_EXCHANGE_TZ = {"TW": "Asia/Taipei", "TWO": "Asia/Taipei", "SS": "Asia/Shanghai",
+                "^TWII": "Asia/Taipei", "^TWO": "Asia/Taipei", "^TWOII": "Asia/Taipei", "^N225": "Asia/Tokyo",
+                "000001.SS": "Asia/Shanghai"}
+
+
+def exchange_tz(ticker):
+    if ticker in _EXCHANGE_TZ: return _EXCHANGE_TZ[ticker]
+    if "." in ticker: return _EXCHANGE_TZ.get(ticker.rsplit(".", 1)[-1], "America/New_York")
+    return "America/New_York"
+
+
+class StreamingIndicatorState:
+    def __init__(self, tickers):
+        self.tickers = pd.Index(tickers)
+        n = len(self.tickers)
+        self.closes = np.full((PRICE_WINDOW, n), np.nan)   # 第 i 根K棒放在 i % PRICE_WINDOW
+        self.gains = np.zeros((RSI_PERIOD, n))              # 第 i 根的漲跌放在 i % RSI_PERIOD
+        self.losses = np.zeros((RSI_PERIOD, n))
+        self.count = np.zeros(n, dtype=np.int64)            # 歷史總根數 (不封頂，用來判斷 n > 60 等條件)
+        self.last_key = np.full(n, "", dtype=object)        # 最後一根K棒的日期鍵
+        self.sum20 = np.zeros(n)
+        self.sum60 = np.zeros(n)
+        self.gain_sum = np.zeros(n)
+        self.loss_sum = np.zeros(n)
+        self.updates = 0
+        self.last_poll = 0.0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_close_frame(cls, close_df, key_format="%Y-%m-%d"):
+        # 用批次歷史建立初始狀態：只需要每檔最後 61 根，歷史再長初始化成本也固定
+        close_df = close_df.loc[:, ~close_df.columns.duplicated()]
+        state = cls(close_df.columns)
+        values = close_df.to_numpy(dtype=float)
+        aligned, n_valid = _align_right(values)
+        cols = np.arange(len(state.tickers))
+        for k in range(min(PRICE_WINDOW, len(aligned))):
+            i = n_valid - 1 - k                              # 倒數第 k 根的K棒序號
+            ok = i >= 0
+            state.closes[i[ok] % PRICE_WINDOW, cols[ok]] = aligned[-1 - k, ok]
+            if k < RSI_PERIOD:
+                prev = aligned[-2 - k] if k + 1 < len(aligned) else np.full(len(cols), np.nan)
+                delta = np.where(i >= 1, aligned[-1 - k] - prev, 0.0)
+                state.gains[i[ok] % RSI_PERIOD, cols[ok]] = np.maximum(delta[ok], 0)
+                state.losses[i[ok] % RSI_PERIOD, cols[ok]] = np.maximum(-delta[ok], 0)
+        state.count = n_valid.astype(np.int64)
+        mask = ~np.isnan(values)
+        if len(values):
+            last_row = len(values) - 1 - np.argmax(mask[::-1], axis=0)
+            dates = pd.DatetimeIndex(close_df.index)
+            state.last_key = np.array([dates[r].strftime(key_format) if c else "" for r, c in zip(last_row, n_valid)], dtype=object)
+        state.resync()
+        return state
+
+    def _slot(self, bar, window):
+        return np.mod(bar, window)
+
+    def resync(self):
+        # 由緩衝重算所有累計和 (O(窗口) 而非 O(歷史))
+        n, cols = self.count, np.arange(len(self.tickers))
+        def window_sum(w):
+            bars = n[None, :] - 1 - np.arange(w)[:, None]
+            vals = self.closes[self._slot(bars, PRICE_WINDOW), cols]
+            return np.where(bars >= 0, vals, 0).sum(axis=0)
+        self.sum20, self.sum60 = window_sum(20), window_sum(60)
+        self.gain_sum, self.loss_sum = self.gains.sum(axis=0), self.losses.sum(axis=0)
+
+    def update(self, keys, prices):
+        # keys / prices：以代號為索引的 Series。鍵 > 最後一根 → 新增K棒；鍵相同 → 覆蓋最後一根 (盤中)；較舊則忽略
+        prices = pd.Series(prices, dtype=float).reindex(self.tickers)
+        keys = pd.Series(keys, dtype=object).reindex(self.tickers).fillna("")
+        valid = prices.notna().to_numpy() & (keys.to_numpy() != "")
+        key_arr, px = keys.to_numpy(), prices.to_numpy()
+        with self.lock:
+            push = valid & (key_arr > self.last_key)
+            replace = valid & (key_arr == self.last_key) & (self.count > 0)
+            if replace.any(): self._replace_last(np.flatnonzero(replace), px[replace])
+            if push.any(): self._push(np.flatnonzero(push), px[push])
+            self.last_key[push] = key_arr[push]
+            self.updates += 1
+            if self.updates % RESYNC_EVERY == 0: self.resync()
+        return int(push.sum()), int(replace.sum())
+
+    def _push(self, j, price):
+        n = self.count[j]
+        prev = self.closes[self._slot(n - 1, PRICE_WINDOW), j]
+        delta = np.where(n >= 1, price - prev, 0.0)
+        # 移出窗口的舊K棒 (在覆寫緩衝之前取出)
+        out20 = np.where(n >= 20, self.closes[self._slot(n - 20, PRICE_WINDOW), j], 0)
+        out60 = np.where(n >= 60, self.closes[self._slot(n - 60, PRICE_WINDOW), j], 0)
+        self.sum20[j] += price - out20
+        self.sum60[j] += price - out60
+        k = self._slot(n, RSI_PERIOD)
+        gain, loss = np.maximum(delta, 0), np.maximum(-delta, 0)
+        self.gain_sum[j] += gain - self.gains[k, j]
+        self.loss_sum[j] += loss - self.losses[k, j]
+        self.gains[k, j], self.losses[k, j] = gain, loss
+        self.closes[self._slot(n, PRICE_WINDOW), j] = price
+        self.count[j] = n + 1
+
+    def _replace_last(self, j, price):
+        b = self.count[j] - 1
+        old = self.closes[self._slot(b, PRICE_WINDOW), j]
+        self.sum20[j] += price - old
+        self.sum60[j] += price - old
+        prev = self.closes[self._slot(b - 1, PRICE_WINDOW), j]
+        delta = np.where(b >= 1, price - prev, 0.0)
+        k = self._slot(b, RSI_PERIOD)
+        gain, loss = np.maximum(delta, 0), np.maximum(-delta, 0)
+        self.gain_sum[j] += gain - self.gains[k, j]
+        self.loss_sum[j] += loss - self.losses[k, j]
+        self.gains[k, j], self.losses[k, j] = gain, loss
+        self.closes[self._slot(b, PRICE_WINDOW), j] = price
+
+    def matrix(self):
+        # 與 compute_indicator_matrix 相同欄位；只讀緩衝，成本與歷史長度無關
+        with self.lock:
+            n, cols = self.count, np.arange(len(self.tickers))
+            at = lambda back: self.closes[self._slot(n - 1 - back, PRICE_WINDOW), cols]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                price = np.where(n > 0, at(0), np.nan)
+                ma20 = np.where(n >= 20, self.sum20 / 20, np.nan)
+                ma20 = np.where(ma20 == 0, price, ma20)
+                ma60 = np.where(n >= 60, self.sum60 / 60, np.nan)
+                bias = (price - ma20) / ma20 * 100
+                rsi = np.where(n >= RSI_PERIOD, 100 - (100 / (1 + self.gain_sum / self.loss_sum)), np.nan)
+                ret20 = np.where(n > 20, (price - at(19)) / at(19), np.nan)
+                ret60 = np.where(n > 60, (price - at(59)) / at(59), np.nan)
+            q_mom = np.nan_to_num(ret60 * 100, nan=0.0)
+            score = 40 * (bias > 0) + 30 * (q_mom > 0) + 30 * (rsi > 50)
+            return pd.DataFrame({
+                "price": price, "ma20": ma20, "ma60": ma60, "bias": bias, "rsi": rsi,
+                "q_mom": q_mom, "ret20": ret20, "ret60": ret60, "score": score, "n": n
+            }, index=self.tickers)
+
+    def poll_due(self, interval_sec):
+        with self.lock:
+            if time.time() - self.last_poll < interval_sec: return False
+            self.last_poll = time.time()
+            return True
+
+
+def latest_bars(frame):
+    # 分K寬表 → 每檔最後一筆有效價格與其「當地交易日」鍵
+    if frame is None or frame.empty or "Close" not in frame.columns.get_level_values(0): return pd.Series(dtype=object), pd.Series(dtype=float)
+    close = frame["Close"]
+    idx = pd.DatetimeIndex(close.index)
+    if idx.tz is None: idx = idx.tz_localize("UTC")
+    keys, prices = {}, {}
+    for t in close.columns:
+        s = close[t]
+        pos = s.notna().to_numpy().nonzero()[0]
+        if not len(pos): continue
+        last = pos[-1]
+        prices[t] = float(s.iloc[last])
+        keys[t] = idx[last].tz_convert(exchange_tz(t)).strftime("%Y-%m-%d")
+    return pd.Series(keys, dtype=object), pd.Series(prices, dtype=float)
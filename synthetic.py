@@ -0,0 +1,105 @@
+# ==========================================
+# 合成行情：固定亂數種子產生與 yf.download 相同格式的寬表 (Price, Ticker)，各交易所休市日不同 → 有 NaN 缺口
+# 用途：效能基準 (benchmark.py)、離線回放 (MARKET_DATA_REPLAY)；完全不連網
+#   python synthetic.py --tickers watchlist --years 2 --out data/replay.pkl
+#   python synthetic.py --n-tickers 1000 --years 5 --out data/replay_1000.pkl
+# ==========================================
+import argparse
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from market_data import exchange_of
+
+FIELDS = ["Close", "High", "Low", "Open", "Volume"]     # yfinance 的欄位順序
+HOLIDAY_RATE = 0.03        # 各交易所每年約 7~8 天自己的休市日
+IPO_RATE = 0.05            # 5% 的代號中途才上市 (前段全 NaN)
+TRADING_DAYS = 252
+
+
+def synthetic_tickers(n, seed=0):
+    # 上市 / 上櫃 / 美股 / 指數 / 匯率 / 加密貨幣 混合，比例接近觀察清單
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(["TW", "TWO", "US", "INDEX", "FX", "CRYPTO"], size=n, p=[0.45, 0.25, 0.22, 0.03, 0.03, 0.02])
+    fmt = {"TW": "{:04d}.TW", "TWO": "{:04d}.TWO", "US": "S{:05d}", "INDEX": "^I{:04d}", "FX": "C{:04d}=X", "CRYPTO": "K{:04d}-USD"}
+    return [fmt[k].format(i) for i, k in enumerate(kinds)]
+
+
+def _holidays(exchange, index, rate=HOLIDAY_RATE):
+    # 以交易所名稱決定休市日 (同一交易所的代號休市日一致，重跑結果相同)
+    rng = np.random.default_rng(zlib.crc32(exchange.encode()))
+    return rng.random(len(index)) < rate
+
+
+def make_ohlcv(tickers=None, n_tickers=100, years=1, seed=0, end="2026-10-16", fields=FIELDS, dtype=np.float64):
+    # 回傳 yf.download 格式寬表；同參數 → 完全相同的數據
+    tickers = list(dict.fromkeys(tickers)) if tickers is not None else synthetic_tickers(n_tickers, seed)
+    rng = np.random.default_rng(seed)
+    crypto = [exchange_of(t) == "CRYPTO" for t in tickers]   # 有加密貨幣時日期含週末 (與 yf.download 混抓時相同)
+    index = pd.date_range(end=end, periods=int(years * (365 if any(crypto) else TRADING_DAYS)), freq="D" if any(crypto) else "B", name="Date")
+    weekend = index.dayofweek >= 5
+    n, m = len(index), len(tickers)
+    # 單因子模型：市場共同波動 + 個股波動，各檔報酬有合理的相關性
+    beta = rng.uniform(0.3, 1.5, m).astype(dtype)
+    vol = rng.uniform(0.008, 0.03, m).astype(dtype)
+    market = rng.normal(0.0003, 0.01, (n, 1)).astype(dtype)
+    rets = market * beta + rng.standard_normal((n, m), dtype=np.float32 if dtype == np.float32 else np.float64) * vol
+    exchanges = [exchange_of(t) for t in tickers]
+    start = rng.uniform(5, 1000, m).astype(dtype) * np.where(np.isin(exchanges, ["TW", "TWO"]), 10, 1).astype(dtype)
+    close = start * np.exp(np.cumsum(rets, axis=0, dtype=dtype))
+    del rets
+    # 休市日：同交易所共用一組日期；非加密貨幣週末休市；部分代號中途上市
+    mask = np.zeros((n, m), dtype=bool)
+    for ex in set(exchanges):
+        closed = np.zeros(n, dtype=bool) if ex == "CRYPTO" else _holidays(ex, index) | weekend
+        mask[:, np.flatnonzero(np.asarray(exchanges) == ex)] = closed[:, None]
+    late = rng.random(m) < IPO_RATE
+    mask[:, late] |= np.arange(n)[:, None] < rng.integers(1, max(2, n // 2), late.sum())[None, :]
+    close[mask] = np.nan
+    parts = {}
+    for f in fields:
+        if f == "Close": parts[f] = close
+        elif f == "Open": parts[f] = close * (1 + rng.normal(0, 0.003, (n, m))).astype(dtype)
+        elif f == "High": parts[f] = close * (1 + np.abs(rng.normal(0, 0.006, (n, m)))).astype(dtype)
+        elif f == "Low": parts[f] = close * (1 - np.abs(rng.normal(0, 0.006, (n, m)))).astype(dtype)
+        elif f == "Volume": parts[f] = np.where(mask, np.nan, rng.lognormal(13, 1, (n, m))).astype(dtype)
+    data = np.concatenate([parts[f] for f in fields], axis=1) if len(fields) > 1 else parts[fields[0]]
+    columns = pd.MultiIndex.from_product([list(fields), tickers], names=["Price", "Ticker"])
+    return pd.DataFrame(data, index=index, columns=columns, copy=False)
+
+
+def synthetic_fundamentals(tickers, seed=0):
+    # 與 FundamentalsCache 內容相同格式的假基本面 (估值模型基準用)
+    rng = np.random.default_rng(seed)
+    funds = {}
+    empty = pd.DataFrame()
+    for t, price, eps, growth, roe, bvps in zip(tickers, rng.uniform(10, 1000, len(tickers)), rng.normal(5, 4, len(tickers)),
+                                                 rng.normal(0.1, 0.08, len(tickers)), rng.uniform(0.02, 0.4, len(tickers)),
+                                                 rng.uniform(5, 300, len(tickers))):
+        funds[t] = {"info": {"currentPrice": price, "trailingEps": eps, "trailingPE": price / eps if eps > 0 else None,
+                             "earningsGrowth": growth, "returnOnEquity": roe, "payoutRatio": 0.3, "bookValue": bvps,
+                             "quoteType": "EQUITY", "longName": t},
+                    "financials": empty}
+    return funds
+
+
+def main(argv=None):
+    import watchlists
+    parser = argparse.ArgumentParser(description="產生合成行情 (yf.download 格式)")
+    parser.add_argument("--tickers", default=None, help="'watchlist' = 儀表板觀察清單；或逗號分隔代號")
+    parser.add_argument("--n-tickers", type=int, default=100)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--end", default=pd.Timestamp.today().strftime("%Y-%m-%d"))
+    parser.add_argument("--out", required=True, help=".pkl 或 .csv")
+    args = parser.parse_args(argv)
+    tickers = watchlists.current().all_tickers if args.tickers == "watchlist" else (args.tickers.split(",") if args.tickers else None)
+    frame = make_ohlcv(tickers, args.n_tickers, args.years, args.seed, args.end)
+    if args.out.endswith(".csv"): frame.to_csv(args.out)
+    else: frame.to_pickle(args.out)
+    print(f"{args.out}: {frame.shape[0]} 天 × {frame.columns.get_level_values(1).nunique()} 檔")
+
+
+if __name__ == "__main__":
+    main()
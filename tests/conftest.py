@@ -0,0 +1,5 @@
+# 測試直接 import 專案根目錄的模組 (與儀表板相同的扁平結構)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
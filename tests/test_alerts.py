@@ -0,0 +1,69 @@
+# 告警引擎：狀態改變才通知 (false→true 觸發一次、持續為真不再發)，規則狀態寫檔後重啟仍沿用
+from alerts import AlertState, expand_rules, run_once
+
+RULES = [
+    {"id": "rate_high", "name": "短端利率偏高", "signal": "short_rate.rate", "op": ">", "value": 5, "severity": "warning"},
+    {"id": "below_ma60", "name": "跌破季線", "ticker": "AAPL", "field": "price", "op": "<", "ref": "ma60", "min_bars": 61},
+]
+
+
+class ListSink:
+    def __init__(self):
+        self.events = []
+
+    def send(self, events):
+        self.events += events
+
+
+class MemorySource:
+    # 取代 SnapshotFile：current() 回傳最新一份快照
+    path = "memory"
+
+    def __init__(self):
+        self.snap = None
+
+    def current(self):
+        return self.snap
+
+
+def _snap(i, rate, price=100.0, n=100):
+    return {"generated_at": f"2026-10-{i:02d}T08:00:00+00:00", "as_of": f"2026-10-{i:02d}",
+            "signals": {"short_rate": {"rate": rate, "source": "^IRX", "tight": rate > 5}},
+            "indicators": {"AAPL": {"price": price, "ma60": 110.0, "n": n}}}
+
+
+def _run(table, state, sink, source, snap):
+    source.snap = snap
+    return [(e["rule"], e["event"]) for e in run_once(table, state, [sink], source)]
+
+
+def test_edge_triggered_and_restored_after_restart(tmp_path):
+    path = str(tmp_path / "alert_state.json")
+    table, sink, source = expand_rules(RULES), ListSink(), MemorySource()
+    state = AlertState(path)
+    assert _run(table, state, sink, source, _snap(1, 4.0, price=120)) == []
+    assert _run(table, state, sink, source, _snap(2, 6.0, price=120)) == [("rate_high", "trigger")]
+    assert _run(table, state, sink, source, _snap(3, 6.5, price=120)) == []           # 持續為真 → 不再通知
+    assert _run(table, state, sink, source, _snap(3, 7.0, price=120)) == []           # 同一份快照不重複評估
+
+    # 重啟：從狀態檔讀回，仍為觸發中 → 不重發；轉為假才發「解除」
+    restarted = AlertState(path)
+    assert restarted.rules["rate_high"]["active"] is True
+    assert _run(table, restarted, sink, source, _snap(4, 7.0, price=120)) == []
+    assert _run(table, restarted, sink, source, _snap(5, 4.0, price=120)) == [("rate_high", "clear")]
+    assert [e["event"] for e in sink.events] == ["trigger", "clear"]
+
+
+def test_active_on_first_evaluation_triggers_once(tmp_path):
+    table, sink, source = expand_rules(RULES), ListSink(), MemorySource()
+    state = AlertState(str(tmp_path / "alert_state.json"))
+    assert _run(table, state, sink, source, _snap(1, 4.0, price=100)) == [("below_ma60:AAPL", "trigger")]
+    assert _run(table, state, sink, source, _snap(2, 4.0, price=101)) == []
+
+
+def test_insufficient_bars_keep_previous_state(tmp_path):
+    table, sink, source = expand_rules(RULES), ListSink(), MemorySource()
+    state = AlertState(str(tmp_path / "alert_state.json"))
+    _run(table, state, sink, source, _snap(1, 4.0, price=100))
+    assert _run(table, state, sink, source, _snap(2, 4.0, price=120, n=10)) == []     # K 棒不足 → 未知，不解除
+    assert state.rules["below_ma60:AAPL"]["active"] is True
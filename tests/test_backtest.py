@@ -0,0 +1,25 @@
+# 回測的整段歷史指標：最後一列與儀表板現值 (compute_indicator_matrix) 相同，休市日沿用前一個交易日
+import numpy as np
+
+from backtest import indicator_history
+from indicators import compute_indicator_matrix
+from synthetic import make_ohlcv
+
+CLOSE = make_ohlcv(n_tickers=40, years=1, fields=["Close"])["Close"]
+FIELDS = ("price", "ma20", "ma60", "bias", "rsi", "ret20", "ret60")
+
+
+def test_indicator_history_last_row_matches_matrix():
+    hist = indicator_history(CLOSE)
+    ind = compute_indicator_matrix(CLOSE)
+    for field in FIELDS:
+        np.testing.assert_allclose(hist[field].iloc[-1].to_numpy(), ind[field].to_numpy(), rtol=1e-9, equal_nan=True, err_msg=field)
+
+
+def test_indicator_history_row_matches_truncated_matrix():
+    # 任一天的歷史值 = 只用到那天為止的數據重算
+    hist = indicator_history(CLOSE)
+    day = CLOSE.index[len(CLOSE) // 2]
+    ind = compute_indicator_matrix(CLOSE.loc[:day])
+    for field in FIELDS:
+        np.testing.assert_allclose(hist[field].loc[day].to_numpy(), ind[field].to_numpy(), rtol=1e-9, equal_nan=True, err_msg=field)
@@ -0,0 +1,35 @@
+# 市場廣度：分塊計算與不分塊一致，每日計數與逐檔 pandas 暴力計算一致
+import numpy as np
+import pandas as pd
+
+from breadth import compute_breadth
+from synthetic import make_ohlcv
+
+CLOSE = make_ohlcv(n_tickers=40, years=2, fields=["Close"])["Close"]
+UNIVERSE = pd.DataFrame({"name": CLOSE.columns, "market": "TEST"}, index=pd.Index(CLOSE.columns, name="ticker"))
+
+
+def _load(tickers):
+    return CLOSE[list(tickers)]
+
+
+def test_chunked_matches_unchunked():
+    whole = compute_breadth(UNIVERSE, _load, chunk_size=len(UNIVERSE))
+    chunked = compute_breadth(UNIVERSE, _load, chunk_size=7)
+    pd.testing.assert_frame_equal(chunked["daily"]["TEST"], whole["daily"]["TEST"], check_dtype=False)
+    pd.testing.assert_frame_equal(chunked["latest"].sort_index(), whole["latest"].sort_index())
+
+
+def test_daily_counts_match_brute_force():
+    # 每檔只看自己的有效 K 棒：均線 / 漲跌 / 52 週新高，再放回日期逐日加總
+    daily = compute_breadth(UNIVERSE, _load)["daily"]["TEST"]
+    expected = {k: pd.Series(0, index=CLOSE.index) for k in ("above20", "n20", "above60", "adv", "dec", "new_high", "traded")}
+    for t in CLOSE.columns:
+        s = CLOSE[t].dropna()
+        if s.empty: continue
+        flags = {"above20": s > s.rolling(20).mean(), "n20": s.rolling(20).count() >= 20,
+                 "above60": s > s.rolling(60).mean(), "adv": s.diff() > 0, "dec": s.diff() < 0,
+                 "new_high": s >= s.rolling(252).max(), "traded": s.notna()}
+        for k, v in flags.items(): expected[k] = expected[k].add(v.reindex(CLOSE.index, fill_value=False).astype(int))
+    for k, v in expected.items():
+        np.testing.assert_array_equal(daily[k].to_numpy(), v.to_numpy(), err_msg=k)
@@ -0,0 +1,71 @@
+# 相關矩陣的累加和 (含逐日增量) 與 pandas 直接算的結果一致
+import numpy as np
+import pandas as pd
+
+from correlation import RollingCorrelation, prepare_returns
+from synthetic import make_ohlcv
+
+WINDOW = 20
+
+
+def _close(n_tickers=8, years=1):
+    return make_ohlcv(n_tickers=n_tickers, years=years, fields=["Close"])["Close"]
+
+
+def _reference(rets):
+    # 窗口內任一天缺值的配對 → NaN (與 count == window 的規則相同)
+    return rets.iloc[-WINDOW:].corr(min_periods=WINDOW)
+
+
+def test_matrix_matches_pandas_corr():
+    close = _close()
+    state, _ = RollingCorrelation.from_close_frame(close, WINDOW)
+    rets = prepare_returns(close)
+    np.testing.assert_allclose(state.matrix().to_numpy(), _reference(rets).to_numpy(), atol=1e-9, equal_nan=True)
+
+
+def test_pair_matches_pandas_rolling_corr():
+    close = _close()
+    rets = prepare_returns(close)
+    a, b = rets.columns[rets.notna().all().to_numpy()][:2]
+    state, _ = RollingCorrelation.from_close_frame(close[[a, b]], WINDOW)
+    expected = rets[a].rolling(WINDOW).corr(rets[b]).iloc[-1]
+    assert abs(state.matrix().loc[a, b] - expected) < 1e-9
+
+
+def test_history_mean_matches_pandas():
+    close = _close(years=2)
+    rets = prepare_returns(close)
+    _, history = RollingCorrelation.from_close_frame(close, WINDOW)
+    iu = np.triu_indices(rets.shape[1], k=1)
+    for i in (WINDOW - 1, len(rets) // 2, len(rets) - 1):
+        pairs = rets.iloc[i - WINDOW + 1:i + 1].corr(min_periods=WINDOW).to_numpy()[iu]
+        pairs = pairs[~np.isnan(pairs)]
+        assert abs(history["平均相關"].iloc[i] - pairs.mean()) < 1e-9
+
+
+def test_update_prices_matches_rebuild():
+    # 前一天收盤建狀態 → 盤中先給一個價 (覆蓋最後一列) → 再給收盤價，結果與整段重算相同
+    close = _close()
+    state, _ = RollingCorrelation.from_close_frame(close.iloc[:-1], WINDOW)
+    last = close.index[-1]
+    traded = close.iloc[-1].dropna()
+    keys = pd.Series(last.strftime("%Y-%m-%d"), index=traded.index)
+    assert state.update_prices(keys, traded * 1.02)
+    assert state.update_prices(keys, traded)
+    rebuilt, _ = RollingCorrelation.from_close_frame(close, WINDOW)
+    np.testing.assert_allclose(state.matrix().to_numpy(), rebuilt.matrix().to_numpy(), atol=1e-9, equal_nan=True)
+
+
+def test_update_prices_ignores_markets_still_on_previous_day():
+    close = _close()
+    state, _ = RollingCorrelation.from_close_frame(close, WINDOW)
+    size = state.size
+    nxt = (close.index[-1] + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    keys = pd.Series(nxt, index=close.columns)
+    keys.iloc[0] = close.index[-1].strftime("%Y-%m-%d")
+    before = state.last_close[0]
+    state.update_prices(keys, close.ffill().iloc[-1] * 1.01)
+    assert state.size == size + 1
+    assert state.last_close[0] == before
+    assert state.buf[(state.size - 1) % WINDOW, 0] == 0
@@ -0,0 +1,71 @@
+# 行情下載器：以 ReplayProvider 離線驗證重試、整批失敗拆單檔、壞代號隔離、其他分片不受影響
+import threading
+
+import numpy as np
+import pandas as pd
+
+from market_data import ReplayProvider, download_concurrent, exchange_of, shard_tickers
+from synthetic import make_ohlcv
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "2330.TW", "2317.TW", "6488.TWO", "^GSPC"]
+FRAME = make_ohlcv(TICKERS, years=1)
+START = FRAME.index[0]
+
+
+class CountingReplay(ReplayProvider):
+    # 記錄每次呼叫的批次；flaky 次數內的呼叫一律失敗 (模擬暫時性錯誤)
+    def __init__(self, source, fail=(), flaky=0):
+        super().__init__(source, fail)
+        self.calls, self.flaky, self._lock = [], flaky, threading.Lock()
+
+    def download(self, tickers, start):
+        with self._lock:
+            self.calls.append(tuple(tickers))
+            if len(self.calls) <= self.flaky: raise RuntimeError("replay: 暫時性錯誤")
+        return super().download(tickers, start)
+
+
+def test_shards_group_by_exchange():
+    shards = shard_tickers(TICKERS, batch_size=2)
+    assert sorted(t for s in shards for t in s) == sorted(TICKERS)
+    for s in shards: assert len({exchange_of(t) for t in s}) == 1
+    assert all(len(s) <= 2 for s in shards)
+
+
+def test_transient_failure_is_retried():
+    provider = CountingReplay(FRAME, flaky=1)
+    result = download_concurrent(provider, ["AAPL", "MSFT"], START, retries=2, backoff=0)
+    assert result.failed == []
+    assert provider.calls == [("AAPL", "MSFT"), ("AAPL", "MSFT")]
+    pd.testing.assert_frame_equal(result.frame["Close"][["AAPL", "MSFT"]], FRAME["Close"][["AAPL", "MSFT"]], check_freq=False)
+
+
+def test_failing_ticker_is_isolated():
+    provider = CountingReplay(FRAME, fail={"MSFT"})
+    result = download_concurrent(provider, TICKERS, START, max_workers=3, retries=1, backoff=0)
+    assert result.failed == ["MSFT"]
+    # 壞代號所在的分片：整批重試 (1 + retries 次) 後拆成單檔
+    us_batch = ("AAPL", "MSFT", "NVDA")
+    assert provider.calls.count(us_batch) == 2
+    assert {("AAPL",), ("MSFT",), ("NVDA",)} <= set(provider.calls)
+    # 其他分片只抓一次、數據完整
+    close = result.frame["Close"]
+    assert "MSFT" not in close.columns
+    for t in set(TICKERS) - {"MSFT"}:
+        np.testing.assert_array_equal(close[t].reindex(FRAME.index).to_numpy(), FRAME["Close"][t].to_numpy())
+    assert sum(1 for c in provider.calls if c == ("2330.TW", "2317.TW")) == 1
+
+
+def test_unknown_ticker_reported_without_retry():
+    provider = CountingReplay(FRAME)
+    result = download_concurrent(provider, ["AAPL", "ZZZZ"], START, retries=2, backoff=0)
+    assert result.failed == ["ZZZZ"]
+    assert provider.calls == [("AAPL", "ZZZZ")]
+    assert list(result.frame["Close"].columns) == ["AAPL"]
+
+
+def test_every_batch_failing_returns_empty_frame():
+    provider = CountingReplay(FRAME, fail=set(TICKERS))
+    result = download_concurrent(provider, TICKERS, START, retries=0, backoff=0)
+    assert sorted(result.failed) == sorted(TICKERS)
+    assert result.frame.empty
@@ -0,0 +1,89 @@
+# 本地價格庫：以錨點增量補抓、還原價改寫時整段重抓、WAL 模式重新開啟後數據仍在
+import sqlite3
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore, period_start
+from synthetic import make_ohlcv
+
+TICKERS = ["AAPL", "2330.TW"]
+HISTORY = make_ohlcv(TICKERS, years=1, end=date.today().isoformat())
+
+
+def _downloader(frame, calls, bad=()):
+    # 與 download_concurrent 相同介面：(寬表, 失敗代號)，並記錄每次的 (代號, 起始日)
+    def download(batch, since):
+        calls.append((tuple(batch), since))
+        part = frame.loc[frame.index >= pd.Timestamp(since), frame.columns.get_level_values(1).isin(batch)]
+        return part.loc[:, ~part.columns.get_level_values(1).isin(bad)], [t for t in batch if t in bad]
+    return download
+
+
+def _assert_close_equal(store, frame):
+    got = store.load(TICKERS, "1y")["Close"]
+    expected = frame["Close"].loc[got.index[0]:].dropna(how="all")
+    np.testing.assert_array_equal(got.reindex(index=expected.index, columns=TICKERS).to_numpy(), expected[TICKERS].to_numpy())
+
+
+def test_incremental_refresh_starts_at_anchor(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.sqlite"))
+    first = HISTORY.iloc[:-5].copy()
+    first.iloc[-1, first.columns.get_loc(("Close", "AAPL"))] *= 1.01       # 最後一根是盤中價，之後會被覆蓋
+    calls = []
+    assert store.refresh(TICKERS, _downloader(first, calls), max_age=0) == []
+    assert calls == [(tuple(TICKERS), period_start("1y").isoformat())]
+    anchors = {t: a for t, (_, _, a) in store.status(TICKERS).items()}
+    calls.clear()
+    assert store.refresh(TICKERS, _downloader(HISTORY, calls), max_age=0) == []
+    # 每檔從自己的倒數第二根K棒 (錨點) 開始補，不重抓整段
+    assert sorted((t, since) for batch, since in calls for t in batch) == sorted(anchors.items())
+    _assert_close_equal(store, HISTORY)
+
+
+def test_fresh_store_is_not_refetched(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.sqlite"))
+    calls = []
+    store.refresh(TICKERS, _downloader(HISTORY, calls))
+    store.refresh(TICKERS, _downloader(HISTORY, calls))
+    assert len(calls) == 1
+
+
+def test_adjusted_close_change_reloads_full_history(tmp_path):
+    # 除權息後整段還原價下修 → 錨點收盤價對不上 → 該檔整段重抓，另一檔仍只補增量
+    store = PriceStore(str(tmp_path / "prices.sqlite"))
+    store.refresh(TICKERS, _downloader(HISTORY.iloc[:-5], []), max_age=0)
+    adjusted = HISTORY.copy()
+    cols = adjusted.columns.get_level_values(1) == "AAPL"
+    adjusted.iloc[:-3, cols] = adjusted.iloc[:-3, cols] * 0.98
+    calls = []
+    assert store.refresh(TICKERS, _downloader(adjusted, calls), max_age=0) == []
+    start = period_start("1y").isoformat()
+    assert (("AAPL",), start) in calls
+    assert not any(since == start and "2330.TW" in batch for batch, since in calls)
+    _assert_close_equal(store, adjusted)
+
+
+def test_failed_ticker_is_not_marked_fetched(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.sqlite"))
+    calls = []
+    assert store.refresh(TICKERS, _downloader(HISTORY, calls, bad={"2330.TW"})) == ["2330.TW"]
+    status = store.status(TICKERS)
+    assert status["AAPL"][0] is not None and status["2330.TW"][0] is None
+    calls.clear()
+    store.refresh(TICKERS, _downloader(HISTORY, calls))
+    assert calls == [(("2330.TW",), period_start("1y").isoformat())]
+
+
+def test_wal_store_reopens_with_data(tmp_path):
+    path = str(tmp_path / "prices.sqlite")
+    store = PriceStore(path)
+    store.refresh(TICKERS, _downloader(HISTORY, []))
+    reader = PriceStore(path)                       # 另一個連線 / 重新開啟
+    with sqlite3.connect(path) as conn: assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    _assert_close_equal(reader, HISTORY)
+    store.upsert(HISTORY.iloc[-1:])                 # 寫入後另一個實例立即讀得到
+    assert reader.status(TICKERS) == store.status(TICKERS)
+    del store, reader
+    _assert_close_equal(PriceStore(path), HISTORY)
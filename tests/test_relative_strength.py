@@ -0,0 +1,34 @@
+# 多週期 RS：60 根的 RS 與 signals.semiconductor_rs (指標表的 ret60) 相同，排名變化與前一日的表一致
+import numpy as np
+import pandas as pd
+
+from indicators import compute_indicator_matrix
+from relative_strength import compute_rs, home_index
+from signals import semiconductor_rs
+from synthetic import make_ohlcv
+
+CLOSE = make_ohlcv(n_tickers=40, years=1, fields=["Close"])["Close"]
+
+
+def test_rs60_matches_semiconductor_rs():
+    ind = compute_indicator_matrix(CLOSE)
+    bench = CLOSE.notna().sum().idxmax()
+    tickers = list(CLOSE.columns)
+    expected = {r["ticker"]: r["rs"] for r in semiconductor_rs(ind, tickers=tickers, benchmark=bench)}
+    table = compute_rs(CLOSE, benchmark=bench)
+    got = table["rs60"].dropna()
+    assert set(got.index) == set(expected)
+    np.testing.assert_allclose(got.to_numpy(), [expected[t] for t in got.index], rtol=1e-12)
+
+
+def test_rank_change_matches_previous_day():
+    bench = CLOSE.notna().sum().idxmax()
+    now, prev = compute_rs(CLOSE, benchmark=bench), compute_rs(CLOSE.iloc[:-1], benchmark=bench)
+    expected = prev["rank20"] - now["rank20"]
+    pd.testing.assert_series_equal(now["rank_chg20"], expected, check_names=False)
+
+
+def test_home_index_by_market():
+    assert home_index("2330.TW") == "^TWII"
+    assert home_index("5274.TWO") == "^TWO"
+    assert home_index("NVDA", "^SOX") == "^SOX"
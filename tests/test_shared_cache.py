@@ -0,0 +1,81 @@
+# 跨行程共用快取：single-flight、過期時先給舊值、等待逾時改自己算、算失敗不覆蓋舊值
+import threading
+import time
+
+import pytest
+
+from shared_cache import FileCacheBackend, MemoryCacheBackend, SharedCache
+
+
+def _slow(value, started, release, calls):
+    def compute():
+        calls.append(value)
+        started.set()
+        release.wait(5)
+        return value
+    return compute
+
+
+def test_one_refresher_others_get_stale():
+    backend = MemoryCacheBackend()
+    backend.set("k", "old", stored_at=time.time() - 7200)
+    cache = SharedCache(backend, ttl=3600)
+    started, release, calls, out = threading.Event(), threading.Event(), [], {}
+    t = threading.Thread(target=lambda: out.setdefault("a", cache.get_or_refresh("k", _slow("new", started, release, calls))))
+    t.start()
+    assert started.wait(5)
+    assert cache.get_or_refresh("k", lambda: calls.append("b") or "other") == "old"      # 別人正在更新 → 舊值
+    release.set()
+    t.join(5)
+    assert out["a"] == "new" and calls == ["new"]
+    assert cache.stale == 1 and cache.refreshes == 1
+    assert cache.get_or_refresh("k", lambda: "unused") == "new"
+
+
+def test_cold_start_waiter_gets_the_refreshed_value():
+    cache = SharedCache(MemoryCacheBackend(), ttl=3600, poll_interval=0.01)
+    started, release, calls, out = threading.Event(), threading.Event(), [], {}
+    t = threading.Thread(target=lambda: out.setdefault("a", cache.get_or_refresh("k", _slow("new", started, release, calls))))
+    t.start()
+    assert started.wait(5)
+    threading.Timer(0.1, release.set).start()
+    assert cache.get_or_refresh("k", lambda: calls.append("b") or "other") == "new"
+    t.join(5)
+    assert calls == ["new"]
+
+
+def test_waiter_computes_itself_after_timeout():
+    backend = MemoryCacheBackend()
+    backend.try_lock("k")                     # 持有者卡住、一直沒寫入
+    cache = SharedCache(backend, ttl=3600, wait_timeout=0.1, poll_interval=0.01)
+    assert cache.get_or_refresh("k", lambda: "mine") == "mine"
+
+
+def test_failed_refresh_keeps_serving_stale():
+    backend = MemoryCacheBackend()
+    backend.set("k", "old", stored_at=time.time() - 7200)
+    cache = SharedCache(backend, ttl=3600)
+
+    def boom(): raise RuntimeError("network down")
+    assert cache.get_or_refresh("k", boom) == "old"
+    assert backend.get("k")[0] == "old" and cache.errors == 1
+    with pytest.raises(RuntimeError): SharedCache(MemoryCacheBackend()).get_or_refresh("k", boom)
+
+
+def test_partial_result_expires_after_retry_ttl():
+    cache = SharedCache(MemoryCacheBackend(), ttl=3600, retry_ttl=0)
+    calls = []
+    compute = lambda: calls.append(1) or ("snap", ["AAA"])
+    cache.get_or_refresh("k", compute, partial=lambda r: bool(r[1]))
+    cache.get_or_refresh("k", compute, partial=lambda r: bool(r[1]))
+    assert len(calls) == 2
+    cache.get_or_refresh("j", lambda: ("snap", []), partial=lambda r: bool(r[1]))
+    assert cache.get_or_refresh("j", lambda: pytest.fail("不應重算")) == ("snap", [])
+
+
+def test_file_backend_treats_unreadable_entry_as_miss(tmp_path):
+    backend = FileCacheBackend(str(tmp_path))
+    backend.set("k", {"a": 1})
+    assert backend.get("k")[0] == {"a": 1}
+    with open(backend._path("k", ".pkl"), "wb") as f: f.write(b"\x80\x05garbage")
+    assert backend.get("k") is None
@@ -0,0 +1,32 @@
+# 盤中串流狀態：逐根增量更新後與整段批次重算 (compute_indicator_matrix) 一致
+import numpy as np
+import pandas as pd
+
+from indicators import compute_indicator_matrix
+from streaming import StreamingIndicatorState
+from synthetic import make_ohlcv
+
+COLUMNS = ["price", "ma20", "ma60", "bias", "rsi", "q_mom", "ret20", "ret60", "score", "n"]
+
+
+def _assert_same(state, close):
+    got = state.matrix()[COLUMNS].to_numpy(dtype=float)
+    expected = compute_indicator_matrix(close)[COLUMNS].to_numpy(dtype=float)
+    np.testing.assert_allclose(got, expected, rtol=1e-7, atol=1e-7, equal_nan=True)
+
+
+def test_from_close_frame_matches_batch():
+    close = make_ohlcv(n_tickers=30, years=1, fields=["Close"])["Close"]
+    _assert_same(StreamingIndicatorState.from_close_frame(close), close)
+
+
+def test_incremental_bars_match_batch():
+    # 先用前段歷史建狀態，之後每天先推一個盤中價再覆蓋成收盤價
+    close = make_ohlcv(n_tickers=30, years=1, fields=["Close"])["Close"]
+    split = len(close) - 40
+    state = StreamingIndicatorState.from_close_frame(close.iloc[:split])
+    for date, row in close.iloc[split:].iterrows():
+        keys = pd.Series(date.strftime("%Y-%m-%d"), index=close.columns)
+        state.update(keys, row * 0.97)
+        state.update(keys, row)
+    _assert_same(state, close)
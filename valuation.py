@@ -0,0 +1,113 @@
+# ==========================================
+# 估值模型：成長率推估、PEG、葛拉漢價、DCF (NumPy 向量化，可一次算整份清單)
+# ==========================================
+import numpy as np
+import pandas as pd
+
+
+def get_smart_growth_rate(stock_info, financials):
+    rates = {}
+    analyst_growth = stock_info.get('earningsGrowth', None)
+    if analyst_growth: rates['分析師預估'] = analyst_growth
+    roe = stock_info.get('returnOnEquity', None)
+    payout = stock_info.get('payoutRatio', 0)
+    if roe:
+        sgr = roe * (1 - (payout if payout else 0))
+        rates['SGR模型(內在驅動)'] = sgr
+    try:
+        if not financials.empty and 'Total Revenue' in financials.index:
+            revenues = financials.loc['Total Revenue']
+            if len(revenues) >= 3:
+                cagr = (revenues.iloc[0] / revenues.iloc[2]) ** (1/3) - 1
+                rates['歷史3年CAGR'] = cagr
+    except: pass
+    suggested_rate = 0.15
+    source_msg = "無數據，使用預設值"
+    if '分析師預估' in rates:
+        suggested_rate = rates['分析師預估']
+        source_msg = "依據：分析師預期 (Analyst)"
+    elif 'SGR模型(內在驅動)' in rates:
+        suggested_rate = rates['SGR模型(內在驅動)']
+        source_msg = "依據：SGR 模型 (ROE推算)"
+    elif '歷史3年CAGR' in rates:
+        suggested_rate = rates['歷史3年CAGR']
+        source_msg = "依據：過去營收慣性 (CAGR)"
+    return suggested_rate * 100, rates, source_msg
+
+
+def dcf_intrinsic_value(base_eps, g_rate_5y, g_rate_term, discount_rate, years=5):
+    # 前 N 年成長折現 + 永續價值折現；參數可為純量或任意可廣播的陣列 (多檔 / 參數網格 / 蒙地卡羅情境)
+    base_eps, g, g_term, r = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (base_eps, g_rate_5y, g_rate_term, discount_rate)))
+    ratio = (1 + g) / (1 + r)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # Σ ratio^i (i=1..N) 用等比級數公式，避免多一個 N 維度
+        near = np.where(np.isclose(ratio, 1), years, ratio * (1 - ratio ** years) / (1 - ratio))
+        terminal = base_eps * (1 + g) ** years * (1 + g_term) / (r - g_term) / (1 + r) ** years
+        return base_eps * near + terminal
+
+
+def graham_number(eps, book_value):
+    eps, book_value = np.asarray(eps, dtype=float), np.asarray(book_value, dtype=float)
+    ok = (eps > 0) & (book_value > 0)
+    return np.where(ok, np.sqrt(np.where(ok, 22.5 * eps * book_value, 0)), np.nan)
+
+
+def _num(info, key):
+    v = info.get(key)
+    return float(v) if isinstance(v, (int, float)) and v == v else np.nan
+
+
+def screen_valuations(funds, discount_rate=0.10, g_rate_term=0.03, names=None):
+    # funds: {代號: {"info":..., "financials":...}} (FundamentalsCache 的內容)；回傳每檔 PEG / 葛拉漢 / DCF 與評等
+    names = names or {}
+    tickers, cols = [], {k: [] for k in ("price", "eps", "pe", "peg", "bvps", "growth")}
+    for t, f in funds.items():
+        info = f["info"]
+        if info.get("quoteType") not in (None, "EQUITY"): continue   # ETF / 指數沒有盈餘可估
+        growth, _, _ = get_smart_growth_rate(info, f["financials"])
+        tickers.append(t)
+        for k, key in (("price", "currentPrice"), ("eps", "trailingEps"), ("pe", "trailingPE"), ("peg", "pegRatio"), ("bvps", "bookValue")):
+            cols[k].append(_num(info, key))
+        cols["growth"].append(growth)
+    if not tickers: return pd.DataFrame()
+    price, eps, pe, raw_peg, bvps, growth = (np.array(cols[k]) for k in ("price", "eps", "pe", "peg", "bvps", "growth"))
+    # 與單檔分頁相同：成長率夾在 0.1% ~ 100%，沒有官方 PEG 時用 PE / 成長率估算
+    growth = np.clip(growth, 0.1, 100.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        peg = np.where(raw_peg > 0, raw_peg, np.where(pe > 0, pe / growth, np.nan))
+        graham = graham_number(eps, bvps)
+        dcf = np.where(eps > 0, dcf_intrinsic_value(eps, growth / 100, g_rate_term, discount_rate), np.nan)
+        graham_up = (graham - price) / price * 100
+        dcf_up = (dcf - price) / price * 100
+    # 三個模型各投一票：便宜 +1、昂貴 -1
+    votes = ((peg < 1.0).astype(int) - (peg > 2.0) + (graham_up > 0) - (graham_up < 0) + (dcf_up > 0) - (dcf_up < 0))
+    verdict = np.where(votes >= 2, "🟢 低估", np.where(votes <= -2, "🔴 高估", "🟡 合理"))
+    verdict = np.where(np.isnan(peg) & np.isnan(graham) & np.isnan(dcf), "⚪ 數據不足", verdict)
+    return pd.DataFrame({
+        "代號": tickers, "資產名稱": [names.get(t, funds[t]["info"].get("longName", t)) for t in tickers],
+        "現價": price, "本益比": np.round(pe, 2), "成長率(%)": np.round(growth, 2), "PEG": np.round(peg, 2),
+        "葛拉漢價": np.round(graham, 2), "葛拉漢空間(%)": np.round(graham_up, 2),
+        "DCF價值": np.round(dcf, 2), "DCF空間(%)": np.round(dcf_up, 2), "模型票數": votes, "評等": verdict,
+    }).sort_values("DCF空間(%)", ascending=False, na_position="last").reset_index(drop=True)
+
+
+def dcf_sensitivity_grid(base_eps, g_rate_5y, waccs, terms):
+    # WACC × 永續成長率 敏感度矩陣 (列 = WACC、欄 = 永續成長率)；WACC 不大於永續成長率時無解 → NaN
+    r, gt = np.meshgrid(np.asarray(waccs, dtype=float), np.asarray(terms, dtype=float), indexing="ij")
+    values = np.where(r > gt, dcf_intrinsic_value(base_eps, g_rate_5y, gt, r), np.nan)
+    return pd.DataFrame(values, index=pd.Index(np.round(np.asarray(waccs) * 100, 2), name="WACC(%)"),
+                        columns=pd.Index(np.round(np.asarray(terms) * 100, 2), name="永續成長率(%)"))
+
+
+def dcf_monte_carlo(base_eps, g_rate_5y, g_rate_term, discount_rate, growth_estimates=(), n=100_000,
+                    wacc_sd=0.01, term_sd=0.005, min_growth_sd=0.02, seed=0, percentiles=(5, 25, 50, 75, 95)):
+    # 成長率以使用者設定為中心、各來源估計 (分析師 / SGR / CAGR) 的離散度為標準差抽樣；WACC 與永續成長率也加入擾動
+    rng = np.random.default_rng(seed)
+    est = np.asarray([g for g in growth_estimates if g is not None and np.isfinite(g)], dtype=float)
+    growth_sd = max(est.std() if len(est) > 1 else 0.0, min_growth_sd)
+    g = np.clip(rng.normal(g_rate_5y, growth_sd, n), -0.5, 1.0)
+    r = np.clip(rng.normal(discount_rate, wacc_sd, n), 0.01, None)
+    gt = np.minimum(rng.normal(g_rate_term, term_sd, n), r - 0.005)   # 永續成長率必須低於 WACC
+    values = dcf_intrinsic_value(base_eps, g, gt, r)
+    return {"values": values, "growth_sd": growth_sd,
+            "percentiles": dict(zip(percentiles, np.percentile(values, percentiles)))}
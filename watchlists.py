@@ -0,0 +1,101 @@
+# ==========================================
+# 觀察清單與中英文對照 (儀表板、訊號 API、排程共用)
+# 內容放在 watchlists.json (MARKET_WATCHLISTS 可改)：改檔後儀表板下一次重跑就會套用，不必重啟
+#   names: 代號 → 中文名稱；lists: 單一清單；groups: 分組清單 (風險雷達 / 資產配置每組一張表)
+#   extra_tickers: 訊號需要但不屬於任何清單的代號；panels: 「自訂清單」分頁的面板 (加面板不用改程式)
+# 一律透過 current() 取用 (不提供模組層級的清單別名，以免拿到啟動時凍結的舊版本)
+# ==========================================
+import json
+import os
+import threading
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "watchlists.json")
+# 儀表板各分頁直接取用的清單 / 分組，設定檔少了就視為格式錯誤 (沿用上一份)
+REQUIRED_LISTS = ("assets_ai_risk", "assets_tw_strategy", "assets_semi_tickers", "assets_rotation", "assets_high_price", "cnn_tickers")
+REQUIRED_GROUPS = ("assets_radar", "assets_macro")
+
+
+class Watchlists:
+    def __init__(self, config, path=None, version=None):
+        # 格式不對一律丟 ValueError，current() 會沿用上一份正確設定
+        self.path, self.version = path, version
+        _expect("設定檔", config, dict)
+        self.names = dict(_expect("names", config.get("names", {}), dict))
+        if not all(isinstance(k, str) and isinstance(v, str) for k, v in self.names.items()):
+            raise ValueError("names 必須是 代號 → 名稱 的字串對照")
+        self.lists = {k: _tickers(k, v) for k, v in _expect("lists", config.get("lists", {}), dict).items()}
+        self.groups = {k: {g: _tickers(f"{k}/{g}", v) for g, v in _expect(f"groups/{k}", groups, dict).items()}
+                       for k, groups in _expect("groups", config.get("groups", {}), dict).items()}
+        missing = [k for k in REQUIRED_LISTS if k not in self.lists] + [k for k in REQUIRED_GROUPS if k not in self.groups]
+        if missing: raise ValueError(f"缺少必要的清單: {', '.join(missing)}")
+        self.benchmark = config.get("benchmark", "SPY")
+        if not isinstance(self.benchmark, str) or not self.benchmark: raise ValueError("benchmark 必須是代號字串")
+        self.extra = _tickers("extra_tickers", config.get("extra_tickers", []))
+        self.panels = []
+        for p in _expect("panels", config.get("panels", []), list):
+            _expect("面板", p, dict)
+            if not isinstance(p.get("title"), str): raise ValueError(f"面板缺少 title: {p}")
+            for field in ("columns", "lists"):
+                if not isinstance(p.get(field, []), list) or not all(isinstance(c, str) for c in p.get(field, [])):
+                    raise ValueError(f"面板 {p['title']} 的 {field} 必須是字串陣列")
+            if not isinstance(p.get("sort", ""), str): raise ValueError(f"面板 {p['title']} 的 sort 必須是欄位名稱")
+            tickers = _tickers(p["title"], p.get("tickers", []))
+            for name in p.get("lists", []):
+                if name not in self.lists and name not in self.groups: raise ValueError(f"面板 {p['title']} 引用不存在的清單: {name}")
+                tickers = tickers + self.members(name)
+            self.panels.append(dict(p, tickers=_tickers(p["title"], list(dict.fromkeys(tickers)))))
+        # 全部需要下載的代號；排序後各行程的快取鍵一致
+        self.all_tickers = sorted(set(
+            [self.benchmark] + self.extra + [t for v in self.lists.values() for t in v] +
+            [t for groups in self.groups.values() for v in groups.values() for t in v] +
+            [t for p in self.panels for t in p["tickers"]]
+        ))
+
+    def members(self, name):
+        # 清單或分組名稱 → 代號 (分組攤平)；alerts.py 的規則也用這個展開
+        if name in self.lists: return list(self.lists[name])
+        if name in self.groups: return [t for v in self.groups[name].values() for t in v]
+        raise KeyError(f"找不到清單: {name}")
+
+
+def _expect(name, value, kind):
+    if not isinstance(value, kind): raise ValueError(f"{name} 必須是 {'物件' if kind is dict else '陣列'}")
+    return value
+
+
+def _tickers(name, value):
+    if not isinstance(value, list) or not all(isinstance(t, str) and t for t in value):
+        raise ValueError(f"清單 {name} 必須是代號字串陣列")
+    return value
+
+
+def load(path=None):
+    path = path or os.environ.get("MARKET_WATCHLISTS", CONFIG_PATH)
+    version = os.stat(path).st_mtime_ns
+    with open(path, encoding="utf-8") as f: return Watchlists(json.load(f), path, version)
+
+
+_current = None        # 第一次呼叫 current() 才載入 (import 本模組不讀檔，設定檔壞掉也不會讓 signals 等模組無法 import)
+_lock = threading.Lock()
+last_error = None       # 最近一次熱更新失敗的原因 (沿用上一份正確設定)
+
+
+def current():
+    # 依檔案 mtime 判斷是否重新載入；改到一半 (JSON 格式錯誤) 時沿用上一份，不讓儀表板掛掉
+    # 還沒有任何一份正確設定時 (第一次載入就失敗) 才把錯誤往外丟
+    global _current, last_error
+    path = _current.path if _current is not None else os.environ.get("MARKET_WATCHLISTS", CONFIG_PATH)
+    try: version = os.stat(path).st_mtime_ns
+    except OSError:
+        if _current is None: raise
+        return _current
+    if _current is None or version != _current.version:
+        with _lock:
+            if _current is None or version != _current.version:
+                try:
+                    _current, last_error = load(path), None
+                except (OSError, ValueError) as e:     # JSONDecodeError 也是 ValueError
+                    last_error = f"{type(e).__name__}: {e}"
+                    if _current is None: raise
+                    _current.version = version      # 同一份壞檔不重複解析，存檔後再試
+    return _current